@@ -0,0 +1,44 @@
+import random
+import time
+
+from rubiksolver.cube import Cube, MOVE_TABLE, all_directions, all_sides, rotate_reference
+
+
+def moves_per_second(rotate, number_moves: int = 100000):
+    """
+    measures how many moves per second the given rotate function manages on random moves
+
+    :param rotate: function that gets a side and a direction
+    :param number_moves: number of moves to execute
+    :return: moves per second
+    """
+    moves = [(random.choice(all_sides), random.choice(all_directions)) for _ in range(number_moves)]
+    start = time.perf_counter()
+    for side, direction in moves:
+        rotate(side, direction)
+    return number_moves / (time.perf_counter() - start)
+
+
+def main():
+    number_moves = 100000
+    reference_cube = Cube()
+    table_cube = Cube()
+    state = table_cube.cube.reshape(54)
+
+    def reference_rotate(side, direction):
+        reference_cube.cube = rotate_reference(reference_cube.cube, side, direction)
+
+    def flat_gather(side, direction):
+        nonlocal state
+        state = state[MOVE_TABLE[direction.value * 6 + side.value]]
+
+    before = moves_per_second(reference_rotate, number_moves)
+    after = moves_per_second(table_cube.rotate, number_moves)
+    flat = moves_per_second(flat_gather, number_moves)
+    print("reference rotate:     {:>12.0f} moves/s".format(before))
+    print("Cube.rotate (table):  {:>12.0f} moves/s  ({:.1f}x)".format(after, after / before))
+    print("flat state gather:    {:>12.0f} moves/s  ({:.1f}x)".format(flat, flat / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import time
+
+import numpy as np
+
+from rubiksolver.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+
+
+def fill(buffer, capacity: int, chunk: int = 100000):
+    states = np.random.randint(0, 6, size=(chunk, 54), dtype=np.uint8)
+    for _ in range(capacity // chunk):
+        buffer.add_batch(states, np.random.randint(0, 12, size=chunk), np.zeros(chunk), states,
+                         np.zeros(chunk, dtype=bool))
+
+
+def timed(function, repetitions: int):
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    return (time.perf_counter() - start) / repetitions
+
+
+def main():
+    capacity = 1000000
+    repetitions = 50
+    uniform = ReplayBuffer(capacity, state_shape=(54, ))
+    prioritized = PrioritizedReplayBuffer(capacity, alpha=0.6, state_shape=(54, ))
+    fill(uniform, capacity)
+    fill(prioritized, capacity)
+    print("capacity: {}, state storage: {:.0f} MB".format(capacity, 2 * uniform._obs_t.nbytes / 1e6))
+
+    for batch_size in [256, 4096]:
+        idxes = np.random.randint(0, capacity, size=batch_size)
+        priorities = np.random.random_sample(batch_size) + 1e-6
+        uniform_sample = timed(lambda: uniform.sample(batch_size), repetitions)
+        prioritized_sample = timed(lambda: prioritized.sample(batch_size, beta=0.4), repetitions)
+        update = timed(lambda: prioritized.update_priorities(idxes, priorities), repetitions)
+        print("batch {:>5}: uniform sample {:7.2f} ms ({:>10.0f} transitions/s), prioritized sample {:7.2f} ms "
+              "({:>10.0f} transitions/s), priority update {:7.2f} ms ({:>10.0f} updates/s)"
+              .format(batch_size, uniform_sample * 1e3, batch_size / uniform_sample, prioritized_sample * 1e3,
+                      batch_size / prioritized_sample, update * 1e3, batch_size / update))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import logging
+
+from rubiksolver.distributed import DistributedTrainer
+from rubiksolver.agents.dqnagent import DQNAgent
+
+
+def actor_agent():
+    return DQNAgent(buffer_size=1, epsilon=0.1, epsilon_decrease_factor=1.0)
+
+
+def main():
+
+    number_train_steps = 10000
+    logging.getLogger().setLevel(logging.INFO)
+    agent = DQNAgent(buffer_size=1, epsilon=0)
+    trainer = DistributedTrainer(actor_agent, number_actors=4, number_envs=256, buffer_size=1000000,
+                                 number_shuffles=1)
+    try:
+        stats = trainer.run_training(agent, number_train_steps, min_buffer_size=50000, logging_frequency=100)
+        logging.info(stats)
+    finally:
+        trainer.close()
+        agent.save_weights()
+
+
+if __name__ == "__main__":
+    main()
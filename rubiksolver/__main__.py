@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+import logging
+import sys
+
+from rubiksolver import batch_solve
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m rubiksolver")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve = commands.add_parser("solve", help="solves scrambles read as json lines or move strings")
+    solve.add_argument("input", nargs="?", default="-",
+                       help="input file, - for stdin. Each line is a move string like \"R U R' U2\" or a json object "
+                            "with an optional id and one of state (54 sticker colors), scramble or actions")
+    solve.add_argument("--output", default="-", help="output file for the json results, - for stdout")
+    solve.add_argument("--solver", choices=batch_solve.SOLVERS, default="two_phase")
+    solve.add_argument("--processes", type=int, default=None, help="worker processes, 0 solves in this process, "
+                                                                   "default is the number of cpus")
+    solve.add_argument("--timeout", type=float, default=10.0, help="time limit per item in seconds")
+    solve.add_argument("--window", type=int, default=None, help="maximum number of items in flight")
+    solve.add_argument("--budget", type=float, default=None,
+                       help="two_phase: seconds to improve the solution, default returns the first one")
+    solve.add_argument("--tables", default=None, help="two_phase: directory of the cached tables")
+    solve.add_argument("--pdb-directory", default=None, help="ida_star: directory of the pattern databases")
+    solve.add_argument("--weights", default=None,
+                       help="astar: path of the DQNAgent weights or of an exported .npz policy")
+    solve.add_argument("--batch-size", type=int, default=1000, help="astar: nodes expanded per iteration")
+    solve.add_argument("--weight", type=float, default=0.6, help="astar: weight of the path cost")
+    solve.add_argument("--cache", default=None,
+                       help="directory of a solution cache shared by the workers, e.g. data/cubes, solutions of "
+                            "symmetric states are reused")
+    solve.add_argument("--cache-size", type=int, default=100000, help="solutions kept in memory per worker")
+
+    serve = commands.add_parser("serve", help="serves the greedy policy of a DQNAgent over http")
+    serve.add_argument("--weights", required=True,
+                       help="path of the DQNAgent weights or of an exported .npz policy")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--max-batch-size", type=int, default=256, help="maximum number of states per forward pass")
+    serve.add_argument("--max-wait", type=float, default=0.005,
+                       help="maximum seconds a state waits for other states to share its forward pass")
+
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.INFO)
+    if args.command == "solve":
+        return batch_solve.run(args)
+    if args.command == "serve":
+        from rubiksolver.evaluation.server import PolicyServer
+        agent = batch_solve.load_policy(args.weights)
+        server = PolicyServer(agent.qvalues, args.host, args.port, args.max_batch_size, args.max_wait)
+        asyncio.run(server.serve_forever())
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
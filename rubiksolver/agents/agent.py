@@ -3,6 +3,7 @@ import abc
 
 from rubiksolver.cube import ActionSerializer
 from rubiksolver.cube import Direction, Side
+from rubiksolver.metrics import NULL_METRICS
 
 
 class Agent(abc.ABC):
@@ -11,11 +12,22 @@ class Agent(abc.ABC):
         self.reward_history = []
         self.average_reward_history = []
         self.number_turns = 0
+        # instrumentation of the agent phases, see rubiksolver.metrics.Metrics
+        self.metrics = NULL_METRICS
 
     def get_action(self, state: np.ndarray) -> (Side, Direction):
         action = self._get_action(state=state)
         return ActionSerializer.deserialize(action=action)
 
+    def get_action_code(self, state: np.ndarray) -> int:
+        """
+        returns the action number (0 to 11) for the state, the fast path of get_action without enums
+
+        :param state:
+        :return:
+        """
+        return self._get_action(state=state)
+
     @abc.abstractmethod
     def _get_action(self, state: np.ndarray) -> int:
         """
@@ -26,6 +38,41 @@ class Agent(abc.ABC):
         """
         pass
 
+    def get_actions(self, states: np.ndarray) -> np.ndarray:
+        """
+        returns the action numbers (0 to 11) for a batch of states, e.g. the states of a VectorCubeEnv
+
+        :param states: array of shape (N, 54) or (N, 6, 3, 3)
+        :return: int array of shape (N, )
+        """
+        return self._get_actions(states=states.reshape(states.shape[0], 54))
+
+    def _get_actions(self, states: np.ndarray) -> np.ndarray:
+        """
+        batched version of _get_action, agents that can decide for many states at once should override it
+
+        :param states: array of shape (N, 54)
+        :return: int array of shape (N, )
+        """
+        return np.array([self._get_action(state=state) for state in states], dtype=np.int64)
+
+    def get_weights(self) -> list:
+        """
+        returns the parameters of the policy as list of numpy arrays, agents without parameters return an empty list
+
+        :return:
+        """
+        return []
+
+    def set_weights(self, weights: list) -> None:
+        """
+        sets the parameters of the policy, the list must be structured like the one returned by get_weights
+
+        :param weights:
+        :return:
+        """
+        pass
+
     @abc.abstractmethod
     def get_feedback(self, state: np.ndarray, action: int, reward: float, next_state: np.ndarray, next_action: float,
                      finished: bool) -> None:
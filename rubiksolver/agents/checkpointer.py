@@ -0,0 +1,67 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Checkpointer:
+    """
+    Writes the weights of a network to disk in a background thread. The weights are first copied in memory into a
+    snapshot network, so training can go on while the snapshot is written. Saves are rate limited: a save is skipped
+    if the last one is still running or happened less than min_interval seconds ago.
+    """
+
+    def __init__(self, snapshot_network, save_path: str, min_interval: float = 60.0):
+        """
+
+        :param snapshot_network: a network with the same architecture as the saved ones, it holds the copied weights
+            while they are written
+        :param save_path: path in which the weights will be saved
+        :param min_interval: minimum number of seconds between two saves
+        """
+        self._snapshot_network = snapshot_network
+        self._save_path = save_path
+        self.min_interval = min_interval
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._future = None
+        self._last_save = None
+        self.number_saves = 0
+        self.number_skipped = 0
+
+    def busy(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def save(self, network, force: bool = False) -> bool:
+        """
+        copies the weights of the network and writes them asynchronously
+
+        :param network: the network whose weights will be saved
+        :param force: if True the min_interval is ignored, a running save is waited for
+        :return: True if a save was started, False if it was skipped
+        """
+        if force:
+            self.wait()
+        elif self.busy() or (self._last_save is not None and time.monotonic() - self._last_save < self.min_interval):
+            self.number_skipped += 1
+            return False
+
+        self._snapshot_network.set_weights(network.get_weights())
+        self._last_save = time.monotonic()
+        self._future = self._executor.submit(self._write)
+        return True
+
+    def wait(self):
+        """
+        blocks until the running save, if any, is written
+        """
+        if self._future is not None:
+            self._future.result()
+
+    def _write(self):
+        start = time.monotonic()
+        directory = os.path.dirname(self._save_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._snapshot_network.save_weights(self._save_path)
+        self.number_saves += 1
+        logging.debug("Saved weights to {} in {:.2f}s".format(self._save_path, time.monotonic() - start))
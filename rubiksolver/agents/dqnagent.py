@@ -1,13 +1,15 @@
 import tensorflow as tf
-from tensorflow.python.keras.layers import Dense, LSTM
+from tensorflow.keras.layers import Dense
 import os
 import logging
+from types import FunctionType
 import numpy as np
-import random
 
-from rubiksolver.replay_buffer import ReplayBuffer
+from rubiksolver.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
 from rubiksolver.agents.agent import Agent
-from rubiksolver.helpers import min_max_scaling
+from rubiksolver.agents.checkpointer import Checkpointer
+from rubiksolver.agents.numpyagent import save_policy
+from rubiksolver.metrics import Metrics
 
 
 class DQNAgent(Agent):
@@ -19,7 +21,12 @@ class DQNAgent(Agent):
     def __init__(self, epsilon: float = 0.99, gamma: float = 0.99, buffer_size: int = 100000,
                  freq_turns_train: int = 500, freq_turns_load: int = 10000,
                  save_path: str = "../data/weights/dqn/model.ckpt", name: str = "Rubik Q Learning",
-                 moving_average_length: int = 10, epsilon_decrease_factor: float = 0.999999):
+                 moving_average_length: int = 10, epsilon_decrease_factor: float = 0.999999,
+                 state_transform: FunctionType = None, prioritized_replay: bool = False,
+                 prioritized_replay_alpha: float = 0.6, prioritized_replay_beta: float = 0.4,
+                 prioritized_replay_eps: float = 1e-6, jit_compile: bool = False,
+                 trace_callback: FunctionType = None, target_update_tau: float = 1.0,
+                 freq_turns_save: int = 50000, min_save_interval: float = 60.0, metrics: Metrics = None):
         """
         Agent which implements Deep Q Learning
 
@@ -28,14 +35,34 @@ class DQNAgent(Agent):
         :param freq_turns_train: frequency in which the network will be trained
         :param freq_turns_load: frequency in which the agent newtwork will be transferred to the target network
         :param save_path: path in which the network will be saved
+        :param target_update_tau: share of the agent network weights in the target network after a transfer, 1 copies
+            the weights, smaller values give a polyak average of both networks
         :param name: name of the model
+        :param state_transform: function that transforms a batch of raw flat sticker states of shape (N, 54) into
+            the network input inside the tensorflow graph, default is one hot encoding of the sticker colors
+        :param prioritized_replay: if True transitions are sampled proportional to their last td error
+        :param prioritized_replay_alpha: how much prioritization is used (0 - no prioritization, 1 - full)
+        :param prioritized_replay_beta: to what degree importance weights correct the prioritization
+        :param prioritized_replay_eps: added to the absolute td errors so that every transition can be sampled
+        :param jit_compile: if True the train step is compiled with XLA
+        :param trace_callback: called with the agent whenever tensorflow (re-)traces the train step, which should
+            happen exactly once. trace_count counts the traces as well
+        :param freq_turns_save: frequency in which the agent network is checkpointed to save_path in the background
+        :param min_save_interval: minimum number of seconds between two checkpoints
+        :param metrics: records the time of buffer insertion, sampling, gradient steps and target syncs, the number
+            of train steps and the buffer fill. A TrainWrapper with enabled metrics hands them to the agent as well
         """
         super().__init__()
+        if metrics is not None:
+            self.metrics = metrics
         # tensorflow related stuff
         self.name = name
         self._batch_size = 4096
         self._learning_rate = 0.3
-        self.state_size = 3 * 3 * 6 * 6
+        if state_transform is None:
+            state_transform = one_hot_transform
+        self._state_transform = state_transform
+        self.state_size = int(state_transform(np.zeros((1, 54), dtype=np.uint8)).shape[-1])
         self.action_size = 12
 
         self._gamma = gamma
@@ -49,20 +76,42 @@ class DQNAgent(Agent):
         # update frequencies
         self._freq_actions_train = freq_turns_train
         self._freq_turns_load = freq_turns_load
+        self._freq_turns_save = freq_turns_save
+        self._target_update_tau = target_update_tau
 
         # configure networks
         self.network = self._configure_network()
         self.target_network = self._configure_network()
+        self.checkpointer = Checkpointer(self._configure_network(), save_path, min_interval=min_save_interval)
+        # one compiled forward pass for batches of raw sticker states of any size
+        self._predict_qvalues = tf.function(self._qvalues,
+                                            input_signature=[tf.TensorSpec(shape=(None, 54), dtype=tf.uint8)])
+        # the train step is compiled once for batches of any size, the signature matches _sample_batch. The optimizer
+        # slots are created up front, creating variables inside the tf.function would make tensorflow trace it twice
+        self.optimizer.build(self.network.trainable_variables)
+        self.trace_count = 0
+        self.trace_callback = trace_callback
+        self._train_step = tf.function(self._train_step_function, jit_compile=jit_compile, input_signature=[
+            tf.TensorSpec(shape=(None, 54), dtype=tf.uint8), tf.TensorSpec(shape=(None, ), dtype=tf.int32),
+            tf.TensorSpec(shape=(None, 54), dtype=tf.uint8), tf.TensorSpec(shape=(None, ), dtype=tf.float32),
+            tf.TensorSpec(shape=(None, ), dtype=tf.float32), tf.TensorSpec(shape=(None, ), dtype=tf.float32)])
 
         self.epsilon = epsilon
-        self.exp_buffer = ReplayBuffer(buffer_size)
+        # the buffer keeps the raw stickers, the state_transform is only applied to sampled batches
+        self._prioritized_replay_beta = prioritized_replay_beta
+        self._prioritized_replay_eps = prioritized_replay_eps
+        if prioritized_replay:
+            self.exp_buffer = PrioritizedReplayBuffer(buffer_size, alpha=prioritized_replay_alpha,
+                                                      state_shape=(54, ))
+        else:
+            self.exp_buffer = ReplayBuffer(buffer_size, state_shape=(54, ))
 
         self._save_path = save_path
         if os.path.isfile(self._save_path + ".index"):
             self.network.load_weights(self._save_path)
 
         # copy weight to target weights
-        self.load_weigths_into_target_network()
+        self.load_weigths_into_target_network(tau=1.0)
 
     def _get_action(self, state: np.ndarray):
         """
@@ -71,23 +120,100 @@ class DQNAgent(Agent):
         :param state:
         :return:
         """
-        if random.random() < self.epsilon:
-            possible_actions = list(range(12))
-            index = np.random.choice(possible_actions)
-        else:
-            state = _transform_state(state)
-            state = state.reshape(1, state.shape[0])
-            qvalues = self.network(state)
-            index = np.argmax(qvalues)
+        return int(self._get_actions(state.reshape(1, 54))[0])
+
+    def _get_actions(self, states: np.ndarray):
+        """
+        predicts the actions for a batch of states epsilon greedy with one forward pass for all exploiting states
+
+        :param states: array of shape (N, 54)
+        :return: int array of shape (N, )
+        """
+        actions = np.random.randint(0, self.action_size, size=states.shape[0])
+        exploit = np.random.random_sample(states.shape[0]) >= self.epsilon
+        if exploit.any():
+            qvalues = self._predict_qvalues(states[exploit].astype(np.uint8))
+            actions[exploit] = np.argmax(qvalues.numpy(), axis=1)
+        return actions
+
+    def cost_to_go(self, states: np.ndarray) -> np.ndarray:
+        """
+        estimated number of actions to solve a batch of states, from one forward pass of the network. With the
+        default reward of 1 for solving and 0 otherwise the value of a state n actions from solved is gamma ** (n - 1),
+        so n = 1 + log(max q value) / log(gamma). Can be used as heuristic of the BatchWeightedAStar solver
+
+        :param states: raw sticker states of shape (N, 54)
+        :return: float array of shape (N, )
+        """
+        values = np.clip(np.max(self.qvalues(states), axis=1), 1e-6, 1.0)
+        return 1.0 + np.log(values) / np.log(self._gamma)
+
+    def qvalues(self, states: np.ndarray) -> np.ndarray:
+        """
+        q values of a batch of states from one compiled forward pass of the network
+
+        :param states: raw sticker states of shape (N, 54)
+        :return: float array of shape (N, 12)
+        """
+        return self._predict_qvalues(np.asarray(states, dtype=np.uint8).reshape(-1, 54)).numpy()
+
+    def _qvalues(self, states):
+        """
+        q values of the network for a batch of raw sticker states
 
-        return int(index)
+        :param states: tensor of shape (N, 54)
+        :return: tensor of shape (N, 12)
+        """
+        return self.network(self._state_transform(states))
+
+    def load_weigths_into_target_network(self, tau: float = None):
+        """
+        assign target_network.weights variables to their respective agent.weights values in memory.
 
-    def load_weigths_into_target_network(self):
-        """ assign target_network.weights variables to their respective agent.weights values. """
+        :param tau: share of the agent weights, 1 copies them, smaller values do a polyak soft update. Default is the
+            target_update_tau of the agent
+        :return:
+        """
+        if tau is None:
+            tau = self._target_update_tau
         logging.debug("Transfer Weight!")
         logging.debug("Epsilon: {}".format(self.epsilon))
-        self.network.save_weights(self._save_path)
-        self.target_network.load_weights(self._save_path)
+        for target_variable, variable in zip(self.target_network.variables, self.network.variables):
+            if tau >= 1.0:
+                target_variable.assign(variable)
+            else:
+                target_variable.assign(tau * variable + (1.0 - tau) * target_variable)
+
+    def get_weights(self) -> list:
+        return self.network.get_weights()
+
+    def set_weights(self, weights: list):
+        self.network.set_weights(weights)
+
+    def export_policy(self, path: str, dtype: str = "float32"):
+        """
+        writes the agent network to a .npz file for NumpyAgent, which runs the policy without tensorflow. Only
+        networks on the default one hot state_transform can be exported
+
+        :param path: path of the .npz file
+        :param dtype: float32, float16 or int8 (quantized with one scale per output unit), see save_policy
+        :return:
+        """
+        if self._state_transform is not one_hot_transform:
+            raise ValueError("only agents with the one hot state_transform can be exported")
+        activations = [layer.get_config()["activation"] for layer in self.network.layers]
+        save_policy(path, self.network.get_weights(), activations, dtype=dtype, gamma=self._gamma)
+
+    def save_weights(self, wait: bool = True):
+        """
+        checkpoints the agent network to save_path, independent of the rate limit of the background checkpoints
+
+        :param wait: if True this blocks until the weights are written
+        :return:
+        """
+        self.checkpointer.save(self.network, force=True)
+        if wait:
+            self.checkpointer.wait()
 
     def _configure_network(self):
         """
@@ -106,41 +232,47 @@ class DQNAgent(Agent):
         self.optimizer = tf.optimizers.Adam(self._learning_rate)
         return network
 
-    def _train_network(self, obs, actions, next_obs, rewards, is_done):
+    def _train_network(self, obs, actions, next_obs, rewards, is_done, weights):
         """
-        defines the loss functions and optimizes the weights
+        runs one compiled train step on the batch
 
         :param obs: list of observations
         :param actions: list of actions
         :param next_obs: list of next_states
         :param rewards: list of rewards
         :param is_done: list of is_done
-        :return:
+        :param weights: list of importance weights of the samples
+        :return: loss and the td errors of the samples
         """
+        return self._train_step(obs, actions, next_obs, rewards, is_done, weights)
 
-        # Decorator autographs the function
-        @tf.function
-        def td_loss():
-            """
-            temporal differences loss which should be minimized by the optimizer
+    def _train_step_function(self, obs, actions, next_obs, rewards, is_done, weights):
+        """
+        forward pass, temporal differences loss, gradient and optimizer update. This function is compiled once with
+        a fixed input signature in __init__, python code in here only runs while tensorflow traces it
+
+        :return: loss and the td errors of the samples
+        """
+        self.trace_count += 1
+        logging.debug("Trace train step, trace count: {}".format(self.trace_count))
+        if self.trace_callback is not None:
+            self.trace_callback(self)
 
-            :return:
-            """
-            current_qvalues = self.network(obs)
+        with tf.GradientTape() as tape:
+            current_qvalues = self.network(self._state_transform(obs))
             current_action_qvalues = tf.reduce_sum(tf.one_hot(actions, self.action_size) * current_qvalues, axis=1)
 
-            next_qvalues_target = self.target_network(next_obs)
+            next_qvalues_target = self.target_network(self._state_transform(next_obs))
             next_state_values_target = tf.reduce_max(next_qvalues_target, axis=-1)
             reference_qvalues = rewards + self._gamma * next_state_values_target * (1 - is_done)
-            return tf.reduce_mean(current_action_qvalues - reference_qvalues) ** 2
-
-        with tf.GradientTape() as tape:
-            loss = td_loss()
+            td_errors = current_action_qvalues - reference_qvalues
+            # squared td error of every sample, weighted by its importance weight
+            loss = tf.reduce_mean(weights * tf.square(td_errors))
 
         grads = tape.gradient(loss, self.network.trainable_variables)
         self.optimizer.apply_gradients(zip(grads, self.network.trainable_variables))
 
-        return loss
+        return loss, td_errors
 
     def train_network(self):
         """
@@ -149,13 +281,47 @@ class DQNAgent(Agent):
         :return:
         """
         logging.debug("Train Network!")
-        loss_t = self._train_network(**self._sample_batch(batch_size=self._batch_size))
+        with self.metrics.timer("sample"):
+            batch = self._sample_batch(batch_size=self._batch_size)
+        idxes = batch.pop("idxes")
+        with self.metrics.timer("gradient_step"):
+            td_errors = self.train_on_batch(**batch)
+        if idxes is not None:
+            with self.metrics.timer("priority_update"):
+                self.exp_buffer.update_priorities(idxes, np.abs(td_errors) + self._prioritized_replay_eps)
+        if self.metrics.enabled:
+            self.metrics.count("train_steps")
+            # a TransitionDataset can replace the buffer for offline training, it has no capacity
+            if hasattr(self.exp_buffer, "capacity"):
+                self.metrics.gauge("buffer_fill", len(self.exp_buffer) / self.exp_buffer.capacity)
+            self.metrics.gauge("epsilon", self.epsilon)
+
+    def train_on_batch(self, obs: np.ndarray, actions: np.ndarray, next_obs: np.ndarray, rewards: np.ndarray,
+                       is_done: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+        """
+        runs the compiled train step on a batch of transitions that does not come from the buffer, e.g. from an
+        AutodidacticGenerator
+
+        :param obs: uint8 states of shape (N, 54)
+        :param actions: actions of shape (N, )
+        :param next_obs: uint8 next states of shape (N, 54)
+        :param rewards: rewards of shape (N, )
+        :param is_done: done flags of shape (N, )
+        :param weights: importance weights of shape (N, ), default is 1 for every transition
+        :return: td errors of shape (N, )
+        """
+        if weights is None:
+            weights = np.ones(actions.shape[0], dtype=np.float32)
+        loss_t, td_errors = self._train_network(obs.astype(np.uint8), actions.astype(np.int32),
+                                                next_obs.astype(np.uint8), rewards.astype(np.float32),
+                                                is_done.astype(np.float32), weights.astype(np.float32))
         self.td_loss_history.append(loss_t)
         self.moving_average_loss.append(np.mean([self.td_loss_history[max([0, len(self.td_loss_history) -
                                                                            self.moving_average_length]):]]))
         ma = self.moving_average_loss[-1]
         relative_ma = self.moving_average_loss[-1] / self._batch_size
         logging.info("Loss: {},     relative Loss: {}".format(ma, relative_ma))
+        return td_errors.numpy()
 
     def _sample_batch(self, batch_size):
         """
@@ -164,33 +330,44 @@ class DQNAgent(Agent):
         :param batch_size: size of the sample
         :return:
         """
-        obs_batch, act_batch, reward_batch, next_obs_batch, is_done_batch = self.exp_buffer.sample(batch_size)
-        obs_batch = min_max_scaling(obs_batch)
-        next_obs_batch = min_max_scaling(next_obs_batch)
+        if isinstance(self.exp_buffer, PrioritizedReplayBuffer):
+            obs_batch, act_batch, reward_batch, next_obs_batch, is_done_batch, weights, idxes = \
+                self.exp_buffer.sample(batch_size, beta=self._prioritized_replay_beta)
+        else:
+            obs_batch, act_batch, reward_batch, next_obs_batch, is_done_batch = self.exp_buffer.sample(batch_size)
+            weights, idxes = np.ones(batch_size, dtype=np.float32), None
+        act_batch = act_batch.astype("int32")
         is_done_batch = is_done_batch.astype("float32")
         reward_batch = reward_batch.astype("float32")
         return {"obs": obs_batch, "actions": act_batch, "rewards": reward_batch,
-                "next_obs": next_obs_batch, "is_done": is_done_batch}
+                "next_obs": next_obs_batch, "is_done": is_done_batch, "weights": weights, "idxes": idxes}
 
     def get_feedback(self, state: np.ndarray, action: int, reward: float, next_state: np.ndarray, next_action: float,
                      finished: bool):
-        state = _transform_state(state)
-        next_state = _transform_state(next_state)
-
-        self.exp_buffer.add(state, action, reward, next_state, finished)
+        with self.metrics.timer("buffer_insert"):
+            self.exp_buffer.add(state.reshape(54), action, reward, next_state.reshape(54), finished)
 
         if self.number_turns % self._freq_actions_train == 0:
             self.train_network()
 
         if self.number_turns % self._freq_turns_load == 0:
-            self.load_weigths_into_target_network()
+            with self.metrics.timer("target_sync"):
+                self.load_weigths_into_target_network()
+
+        if self.number_turns > 0 and self.number_turns % self._freq_turns_save == 0:
+            self.checkpointer.save(self.network)
 
         self.epsilon *= self._epsilon_decrease_factor
         self.number_turns += 1
 
 
-def _transform_state(state: np.ndarray):
-    state = np.eye(6)[state]
-    state = state.flatten()
-    return state
+def one_hot_transform(states):
+    """
+    one hot encodes the sticker colors of a batch of flat states inside the tensorflow graph
+
+    :param states: raw sticker states of shape (N, 54)
+    :return: float tensor of shape (N, 324)
+    """
+    states = tf.one_hot(tf.cast(states, tf.int32), 6)
+    return tf.reshape(states, (-1, 54 * 6))
 
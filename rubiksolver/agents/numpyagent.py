@@ -0,0 +1,141 @@
+import numpy as np
+
+from rubiksolver.agents.agent import Agent
+
+# forward passes of the supported activations, in place on the layer output
+ACTIVATIONS = {"relu": lambda x: np.maximum(x, 0.0, out=x), "linear": lambda x: x}
+DTYPES = ["float32", "float16", "int8"]
+# index of the first one hot input of every sticker
+_ONE_HOT_OFFSETS = np.arange(54) * 6
+
+
+def save_policy(path: str, weights: list, activations: list, dtype: str = "float32", gamma: float = 0.99):
+    """
+    writes the weights of a dense network on one hot encoded states to a .npz file that NumpyAgent loads. int8
+    quantizes every kernel symmetrically with one scale per output unit, the biases stay float32
+
+    :param path: path of the .npz file
+    :param weights: kernels and biases in the order of keras get_weights: [kernel_0, bias_0, kernel_1, bias_1, ...],
+        the first kernel has 324 rows, one per sticker and color
+    :param activations: name of the activation of every layer, see ACTIVATIONS
+    :param dtype: one of DTYPES, float16 halves and int8 quarters the size of the kernels
+    :param gamma: discount factor the network was trained with, needed for cost_to_go
+    """
+    if dtype not in DTYPES:
+        raise ValueError("Unknown dtype {}, choose one of {}".format(dtype, DTYPES))
+    if len(weights) != 2 * len(activations):
+        raise ValueError("{} weights do not fit {} layers".format(len(weights), len(activations)))
+    for activation in activations:
+        if activation not in ACTIVATIONS:
+            raise ValueError("Unsupported activation {}, choose one of {}".format(activation, list(ACTIVATIONS)))
+    arrays = {"activations": np.array(activations), "dtype": np.array(dtype), "gamma": np.array(gamma)}
+    for layer in range(len(activations)):
+        kernel = np.asarray(weights[2 * layer], dtype=np.float32)
+        arrays["bias_{}".format(layer)] = np.asarray(weights[2 * layer + 1], dtype=np.float32)
+        if dtype == "int8":
+            scale = np.abs(kernel).max(axis=0) / 127.0
+            scale[scale == 0.0] = 1.0
+            arrays["kernel_{}".format(layer)] = np.round(kernel / scale).astype(np.int8)
+            arrays["scale_{}".format(layer)] = scale.astype(np.float32)
+        else:
+            arrays["kernel_{}".format(layer)] = kernel.astype(dtype)
+    with open(path, "wb") as file:
+        np.savez(file, **arrays)
+
+
+class NumpyAgent(Agent):
+    """
+    Greedy policy of an exported DQNAgent network (see DQNAgent.export_policy) that runs on numpy alone. Importing and
+    loading it takes milliseconds instead of the seconds tensorflow needs, so actors, solve servers and evaluation
+    workers start fast. Quantized kernels are dequantized to float32 on load, the forward pass is the same for all
+    dtypes. The agent does not learn, new weights of a learner are applied with set_weights.
+    """
+
+    def __init__(self, path: str = None, epsilon: float = 0.0, weights: list = None, activations: list = None,
+                 gamma: float = 0.99):
+        """
+
+        :param path: .npz file written by save_policy, or None to build the agent from weights and activations
+        :param epsilon: exploration factor. 1 means only exploration, while 0 means no exploration
+        :param weights: see save_policy, only used without path
+        :param activations: see save_policy, only used without path
+        :param gamma: see save_policy, only used without path
+        """
+        super().__init__()
+        self.epsilon = epsilon
+        self.action_size = 12
+        if path is not None:
+            with np.load(path) as arrays:
+                activations = arrays["activations"].tolist()
+                gamma = float(arrays["gamma"])
+                weights = []
+                for layer in range(len(activations)):
+                    kernel = arrays["kernel_{}".format(layer)].astype(np.float32)
+                    if "scale_{}".format(layer) in arrays:
+                        kernel *= arrays["scale_{}".format(layer)]
+                    weights += [kernel, arrays["bias_{}".format(layer)]]
+        elif weights is None or activations is None:
+            raise ValueError("NumpyAgent needs either a path or weights and activations")
+        self._activations = [ACTIVATIONS[activation] for activation in activations]
+        self._gamma = gamma
+        self.set_weights(weights)
+
+    def qvalues(self, states: np.ndarray) -> np.ndarray:
+        """
+        q values of a batch of states, the same as DQNAgent.qvalues up to the precision of the exported weights
+
+        :param states: raw sticker states of shape (N, 54)
+        :return: float array of shape (N, 12)
+        """
+        states = np.asarray(states).reshape(-1, 54)
+        # one hot encoding: sticker i with color c sets input 6 * i + c
+        inputs = np.zeros((states.shape[0], 54 * 6), dtype=np.float32)
+        inputs[np.arange(states.shape[0])[:, None], _ONE_HOT_OFFSETS + states] = 1.0
+        for layer, activation in enumerate(self._activations):
+            inputs = activation(inputs @ self._kernels[layer] + self._biases[layer])
+        return inputs
+
+    def cost_to_go(self, states: np.ndarray) -> np.ndarray:
+        """
+        estimated number of actions to solve a batch of states, see DQNAgent.cost_to_go
+
+        :param states: raw sticker states of shape (N, 54)
+        :return: float array of shape (N, )
+        """
+        values = np.clip(np.max(self.qvalues(states), axis=1), 1e-6, 1.0)
+        return 1.0 + np.log(values) / np.log(self._gamma)
+
+    def _get_action(self, state: np.ndarray):
+        return int(self._get_actions(state.reshape(1, 54))[0])
+
+    def _get_actions(self, states: np.ndarray):
+        """
+        epsilon greedy actions with one forward pass for all exploiting states
+
+        :param states: array of shape (N, 54)
+        :return: int array of shape (N, )
+        """
+        actions = np.random.randint(0, self.action_size, size=states.shape[0])
+        exploit = np.random.random_sample(states.shape[0]) >= self.epsilon
+        if exploit.any():
+            actions[exploit] = np.argmax(self.qvalues(states[exploit]), axis=1)
+        return actions
+
+    def get_weights(self) -> list:
+        return [array for layer in zip(self._kernels, self._biases) for array in layer]
+
+    def set_weights(self, weights: list):
+        """
+        :param weights: float kernels and biases in the order of DQNAgent.get_weights
+        """
+        if len(weights) != 2 * len(self._activations):
+            raise ValueError("{} weights do not fit {} layers".format(len(weights), len(self._activations)))
+        self._kernels = [np.ascontiguousarray(kernel, dtype=np.float32) for kernel in weights[::2]]
+        self._biases = [np.asarray(bias, dtype=np.float32) for bias in weights[1::2]]
+        if self._kernels[0].shape[0] != 54 * 6:
+            raise ValueError("the first kernel needs 324 rows for the one hot encoded states, got {}".format(
+                self._kernels[0].shape[0]))
+
+    def get_feedback(self, state: np.ndarray, action: int, reward: float, next_state: np.ndarray, next_action: float,
+                     finished: bool):
+        pass
@@ -10,7 +10,10 @@ class RandomAgent(Agent):
         super().__init__()
 
     def _get_action(self, state: np.ndarray):
-        return int(np.random.choice(list(range(12))))
+        return np.random.randint(0, 12)
+
+    def _get_actions(self, states: np.ndarray):
+        return np.random.randint(0, 12, size=states.shape[0])
 
     def get_feedback(self, state: np.ndarray, action: int, reward: float, next_state: np.ndarray, next_action: float,
                      finished: bool):
@@ -0,0 +1,131 @@
+import logging
+import time
+from types import FunctionType
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+
+
+class AutodidacticGenerator:
+    """
+    Generates labeled training data by scrambling backward from the solved state (autodidactic iteration). Every
+    sampled state is expanded into its 12 children, so each batch holds all transitions of the sampled states and the
+    targets of all children come from one batched network call. Scrambling, expansion and rewards are numpy
+    operations over the whole batch, there is no python loop over the states.
+    """
+
+    def __init__(self, max_depth: int = 30, reward_function: dict = None, depth_weighting: bool = True,
+                 seed: int = None):
+        """
+
+        :param max_depth: states are scrambled with 1 to max_depth random actions, uniformly distributed
+        :param reward_function: a dictionary that supplies the rewards for specific actions, see TrainWrapper
+        :param depth_weighting: if True transitions are weighted with 1 / scramble depth, as states close to the
+            solved state are the ones the targets of all others bootstrap from
+        :param seed: seed for the random scrambles
+        """
+        if reward_function is None:
+            reward_function = {"solved": {True: 1, False: 0}}
+        self.max_depth = max_depth
+        self.depth_weighting = depth_weighting
+        self._reward_lookup = np.array([reward_function["solved"][False], reward_function["solved"][True]],
+                                       dtype=np.float32)
+        self._random = np.random.default_rng(seed)
+
+    def sample_states(self, number_states: int) -> (np.ndarray, np.ndarray):
+        """
+        scrambles solved cubes backward to random depths. An action never undoes the previous one, so the depth is
+        closer to the distance from the solved state
+
+        :param number_states:
+        :return: uint8 states of shape (N, 54) and int64 scramble depths of shape (N, )
+        """
+        depths = self._random.integers(1, self.max_depth + 1, size=number_states)
+        states = np.tile(SOLVED_STATE, (number_states, 1))
+        # the inverse of the last action, 12 stands for none
+        inverse = np.full(number_states, 12)
+        for depth in range(1, self.max_depth + 1):
+            active = np.flatnonzero(depths >= depth)
+            if active.shape[0] == 0:
+                break
+            # 11 of the 12 actions, skipping the inverse of the last action
+            actions = self._random.integers(0, 12 - (inverse[active] < 12), size=active.shape[0])
+            actions += (inverse[active] < 12) & (actions >= inverse[active])
+            states[active] = np.take_along_axis(states[active], MOVE_TABLE[actions], axis=1)
+            inverse[active] = (actions + 6) % 12
+        return states, depths
+
+    def expand(self, states: np.ndarray, depths: np.ndarray = None) -> dict:
+        """
+        all 12 transitions of every state
+
+        :param states: uint8 states of shape (N, 54)
+        :param depths: scramble depths of shape (N, ), needed for the depth weighting
+        :return: dict with obs, actions, next_obs, rewards, is_done and weights of N * 12 transitions, the keyword
+            arguments of DQNAgent.train_on_batch
+        """
+        number_states = states.shape[0]
+        next_obs = states[:, MOVE_TABLE].reshape(-1, 54)
+        is_done = np.all(next_obs == SOLVED_STATE, axis=1)
+        if self.depth_weighting and depths is not None:
+            weights = np.repeat(1.0 / depths, 12).astype(np.float32)
+        else:
+            weights = np.ones(number_states * 12, dtype=np.float32)
+        return {"obs": np.repeat(states, 12, axis=0), "actions": np.tile(np.arange(12, dtype=np.int32), number_states),
+                "next_obs": next_obs, "rewards": self._reward_lookup[is_done.view(np.uint8)],
+                "is_done": is_done.astype(np.float32), "weights": weights}
+
+    def batch(self, number_states: int) -> dict:
+        """
+        :param number_states: number of sampled states, the batch holds 12 times as many transitions
+        :return: see expand
+        """
+        return self.expand(*self.sample_states(number_states))
+
+    def targets(self, states: np.ndarray, qvalues_function: FunctionType, gamma: float = 0.99) -> \
+            (np.ndarray, np.ndarray):
+        """
+        value and policy targets of autodidactic iteration: the best one step lookahead over the 12 children. The
+        q values of all N * 12 children are computed with one call of qvalues_function
+
+        :param states: uint8 states of shape (N, 54)
+        :param qvalues_function: maps a batch of states of shape (M, 54) to q values of shape (M, 12), e.g.
+            DQNAgent.qvalues
+        :param gamma: discount factor
+        :return: float32 values of shape (N, ) and int64 best actions of shape (N, )
+        """
+        transitions = self.expand(states)
+        child_values = np.max(np.asarray(qvalues_function(transitions["next_obs"])), axis=1)
+        lookahead = transitions["rewards"] + gamma * child_values * (1 - transitions["is_done"])
+        lookahead = lookahead.reshape(-1, 12)
+        return lookahead.max(axis=1).astype(np.float32), lookahead.argmax(axis=1)
+
+    def train(self, agent, number_steps: int, states_per_step: int = 1024, freq_steps_load: int = 100,
+              logging_frequency: int = 10) -> dict:
+        """
+        streams generated batches into the train step of the agent
+
+        :param agent: DQNAgent or any agent with train_on_batch and load_weigths_into_target_network
+        :param number_steps: number of train steps
+        :param states_per_step: number of sampled states per train step, each gives 12 transitions
+        :param freq_steps_load: frequency in train steps in which the target network is updated
+        :param logging_frequency: the number of times the throughput is logged during training
+        :return: dict with the number of labeled states and the rates of generation and training
+        """
+        generate_seconds = 0.0
+        start = time.perf_counter()
+        for step in range(1, number_steps + 1):
+            generate_start = time.perf_counter()
+            batch = self.batch(states_per_step)
+            generate_seconds += time.perf_counter() - generate_start
+            agent.train_on_batch(**batch)
+            if step % freq_steps_load == 0:
+                agent.load_weigths_into_target_network()
+            if step % max(number_steps // logging_frequency, 1) == 0:
+                logging.info("Train step {}: {:.0f} labeled transitions/s".format(
+                    step, step * states_per_step * 12 / (time.perf_counter() - start)))
+        seconds = time.perf_counter() - start
+        transitions = number_steps * states_per_step * 12
+        return {"transitions": transitions, "transitions_per_second": transitions / seconds,
+                "generated_transitions_per_second": transitions / max(generate_seconds, 1e-9)}
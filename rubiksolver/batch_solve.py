@@ -0,0 +1,302 @@
+import collections
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, ActionSerializer
+
+SOLVERS = ["two_phase", "ida_star", "astar"]
+# the solver of a worker process, created once by _init_worker
+_solver = None
+
+
+def make_solver(name: str, options: dict):
+    """
+    creates a solver with a solve(state, max_time) method that returns a list of actions or None
+
+    :param name: one of SOLVERS
+    :param options: table_directory and budget for two_phase, pdb_directory for ida_star, weights, batch_size and
+        weight for astar. With cache (a directory) the solver is wrapped in a SolutionCache with cache_size entries
+        in memory
+    :return:
+    """
+    if options.get("cache"):
+        from rubiksolver.solvers.solution_cache import SolutionCache
+        return SolutionCache(make_solver(name, dict(options, cache=None)), capacity=options.get("cache_size", 100000),
+                             directory=options["cache"])
+    if name == "two_phase":
+        from rubiksolver.solvers.two_phase import TABLE_DIRECTORY, TwoPhaseSolver
+        return _TwoPhase(TwoPhaseSolver(options.get("table_directory") or TABLE_DIRECTORY), options.get("budget"))
+    if name == "ida_star":
+        from rubiksolver.solvers.ida_star import IDAStarSolver
+        from rubiksolver.solvers.pattern_database import DATA_DIRECTORY, PatternDatabaseHeuristic
+        return IDAStarSolver(PatternDatabaseHeuristic.from_directory(options.get("pdb_directory") or DATA_DIRECTORY))
+    if name == "astar":
+        from rubiksolver.solvers.batch_astar import BatchWeightedAStar
+        agent = load_policy(options["weights"])
+        return BatchWeightedAStar(agent.cost_to_go, batch_size=options.get("batch_size", 1000),
+                                  weight=options.get("weight", 0.6))
+    raise ValueError("Unknown solver {}, choose one of {}".format(name, SOLVERS))
+
+
+def load_policy(path: str):
+    """
+    :param path: .npz file of DQNAgent.export_policy, loaded without tensorflow, or a DQNAgent checkpoint
+    :return: greedy NumpyAgent or DQNAgent
+    """
+    if path.endswith(".npz"):
+        from rubiksolver.agents.numpyagent import NumpyAgent
+        return NumpyAgent(path)
+    from rubiksolver.agents.dqnagent import DQNAgent
+    return DQNAgent(epsilon=0.0, save_path=path)
+
+
+class _TwoPhase:
+    """
+    adapts TwoPhaseSolver to the common solve(state, max_time) interface: without budget the first solution is
+    returned, with a budget the best solution found within it
+    """
+
+    def __init__(self, solver, budget: float = None):
+        self.solver = solver
+        self.budget = budget
+
+    def solve(self, state: np.ndarray, max_time: float = None) -> list:
+        if self.budget is not None:
+            return self.solver.solve(state, max_time=min(self.budget, max_time or np.inf))
+        return self.solver.solve(state, max_time=max_time, target_length=np.inf)
+
+
+def parse_state(item: dict) -> np.ndarray:
+    """
+    :param item: dict with one of state (54 sticker colors), scramble (move string) or actions (action numbers)
+    :return: uint8 state of shape (54, )
+    """
+    if "state" in item:
+        state = np.asarray(item["state"], dtype=np.uint8).reshape(54)
+        if not np.array_equal(np.bincount(state, minlength=6), np.full(6, 9)):
+            raise ValueError("a state needs 9 stickers of each of the 6 colors")
+        return state
+    actions = ActionSerializer.parse_moves(item["scramble"]) if "scramble" in item else item["actions"]
+    state = SOLVED_STATE.copy()
+    for action in actions:
+        state = state[MOVE_TABLE[int(action)]]
+    return state
+
+
+def parse_item(line: str, number: int) -> dict:
+    """
+    parses one input line: either a json object with an optional id, see parse_state, or a plain move string
+
+    :param line:
+    :param number: line number, the id of items without id
+    :return: dict with id and state, or id and error
+    """
+    line = line.strip()
+    try:
+        if line.startswith("{"):
+            item = json.loads(line)
+            return {"id": item.get("id", number), "state": parse_state(item)}
+        return {"id": number, "state": parse_state({"scramble": line})}
+    except (ValueError, KeyError, TypeError, IndexError) as error:
+        return {"id": number, "error": "{}: {}".format(type(error).__name__, error)}
+
+
+def read_items(lines):
+    """
+    :param lines: iterable of input lines, blank lines are skipped
+    :return: generator of parsed items
+    """
+    for number, line in enumerate(lines):
+        if line.strip():
+            yield parse_item(line, number)
+
+
+def _init_worker(name: str, options: dict):
+    global _solver
+    _solver = make_solver(name, options)
+
+
+def _build_tables(name: str, options: dict):
+    """
+    builds the cached tables of the solver in this process, so the pool workers only memory map them instead of each
+    building them. Nothing else is loaded, e.g. the network of astar is only loaded by the workers
+    """
+    if name == "two_phase":
+        from rubiksolver.solvers.two_phase import TABLE_DIRECTORY, load_tables
+        load_tables(options.get("table_directory") or TABLE_DIRECTORY)
+
+
+def _solve_item(item_id, state: np.ndarray, timeout: float) -> dict:
+    start = time.perf_counter()
+    misses = getattr(_solver, "misses", None)
+    try:
+        actions = _solver.solve(state, max_time=timeout)
+    except Exception as error:
+        return {"id": item_id, "status": "error", "error": "{}: {}".format(type(error).__name__, error)}
+    seconds = time.perf_counter() - start
+    cached = {} if misses is None else {"cached": _solver.misses == misses}
+    if actions is None:
+        return dict({"id": item_id, "status": "timeout", "seconds": seconds}, **cached)
+    solved = state
+    for action in actions:
+        solved = solved[MOVE_TABLE[action]]
+    return dict({"id": item_id, "status": "solved" if np.array_equal(solved, SOLVED_STATE) else "invalid",
+                 "moves": ActionSerializer.format_moves(actions), "length": len(actions), "seconds": seconds}, **cached)
+
+
+def solve_stream(items, name: str = "two_phase", options: dict = None, processes: int = None,
+                 timeout: float = 10.0, window: int = None, start_method: str = "spawn"):
+    """
+    solves a stream of items on a process pool and yields the results in input order. At most window items are in
+    flight, so the memory stays bounded for inputs of any length
+
+    :param items: iterable of parsed items, see read_items
+    :param name: one of SOLVERS
+    :param options: see make_solver
+    :param processes: number of worker processes, 0 solves in this process, None uses all cpus
+    :param timeout: per item time limit in seconds, a solver that does not return within twice the limit is reported
+        as timeout as well
+    :param window: maximum number of items in flight, default is 4 per process
+    :param start_method: multiprocessing start method of the pool
+    :return: generator of result dicts
+    """
+    options = options or {}
+    if processes == 0:
+        _init_worker(name, options)
+        for item in items:
+            yield _result(item, None, timeout) if "error" in item else _solve_item(item["id"], item["state"], timeout)
+        return
+
+    _build_tables(name, options)
+    processes = processes or multiprocessing.cpu_count()
+    window = window or 4 * processes
+    pending = collections.deque()
+    context = multiprocessing.get_context(start_method)
+    with context.Pool(processes, initializer=_init_worker, initargs=(name, options)) as pool:
+        for item in items:
+            if "error" in item:
+                pending.append((item, None))
+            else:
+                pending.append((item, pool.apply_async(_solve_item, (item["id"], item["state"], timeout))))
+            while len(pending) >= window:
+                yield _result(*pending.popleft(), timeout)
+        while pending:
+            yield _result(*pending.popleft(), timeout)
+
+
+def _result(item: dict, async_result, timeout: float) -> dict:
+    if async_result is None:
+        return {"id": item["id"], "status": "error", "error": item["error"]}
+    try:
+        return async_result.get(timeout=2 * timeout + 1.0)
+    except multiprocessing.TimeoutError:
+        return {"id": item["id"], "status": "timeout", "seconds": 2 * timeout + 1.0}
+
+
+class SolveSummary:
+    """
+    Running counters of the results of a run and a fixed size reservoir sample of their latencies for the
+    percentiles, so summarizing takes bounded memory for inputs of any length. The percentiles are exact as long as
+    there are at most reservoir_size results with a latency.
+    """
+
+    def __init__(self, reservoir_size: int = 10000, seed: int = 0):
+        """
+
+        :param reservoir_size: maximum number of latencies kept
+        :param seed: seed of the reservoir sampling
+        """
+        self.reservoir_size = reservoir_size
+        self._random = random.Random(seed)
+        self.statuses = collections.Counter()
+        self.items = 0
+        self.cached = 0
+        self.total_length = 0
+        self.max_seconds = None
+        self.timed = 0
+        self._latencies = []
+
+    def add(self, result: dict):
+        """
+        :param result: result dict of solve_stream
+        """
+        self.items += 1
+        self.statuses[result["status"]] += 1
+        self.cached += bool(result.get("cached"))
+        if result["status"] == "solved":
+            self.total_length += result["length"]
+        if "seconds" in result:
+            self.timed += 1
+            self.max_seconds = max(self.max_seconds or 0.0, result["seconds"])
+            if len(self._latencies) < self.reservoir_size:
+                self._latencies.append(result["seconds"])
+            else:
+                # every latency ends up in the reservoir with probability reservoir_size / timed
+                index = self._random.randrange(self.timed)
+                if index < self.reservoir_size:
+                    self._latencies[index] = result["seconds"]
+
+    def summary(self, seconds: float) -> dict:
+        """
+        :param seconds: wall time of the whole run
+        :return: dict with counts, throughput, latency percentiles in milliseconds and the mean solution length
+        """
+        solved = self.statuses["solved"]
+        summary = {"items": self.items, "solved": solved, "timeouts": self.statuses["timeout"],
+                   "errors": self.statuses["error"], "invalid": self.statuses["invalid"], "seconds": seconds,
+                   "items_per_second": self.items / max(seconds, 1e-9),
+                   "mean_length": self.total_length / solved if solved else None, "cached": self.cached}
+        if self._latencies:
+            latencies = np.array(self._latencies) * 1e3
+            for percentile in [50, 90, 99]:
+                summary["p{}_ms".format(percentile)] = float(np.percentile(latencies, percentile))
+            summary["max_ms"] = self.max_seconds * 1e3
+        return summary
+
+
+def summarize(results: list, seconds: float) -> dict:
+    """
+    :param results: result dicts
+    :param seconds: wall time of the whole run
+    :return: see SolveSummary.summary
+    """
+    summary = SolveSummary()
+    for result in results:
+        summary.add(result)
+    return summary.summary(seconds)
+
+
+def run(args) -> int:
+    """
+    the solve command of python -m rubiksolver, reads the input, writes one json result per line in input order and
+    writes the summary as one json line to stderr
+
+    :param args: parsed arguments, see rubiksolver.__main__
+    :return: exit code
+    """
+    input_file = sys.stdin if args.input == "-" else open(args.input)
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w")
+    options = {"table_directory": args.tables, "pdb_directory": args.pdb_directory, "budget": args.budget,
+               "weights": args.weights, "batch_size": args.batch_size, "weight": args.weight, "cache": args.cache,
+               "cache_size": args.cache_size}
+    summary = SolveSummary()
+    start = time.perf_counter()
+    try:
+        for result in solve_stream(read_items(input_file), args.solver, options, processes=args.processes,
+                                   timeout=args.timeout, window=args.window):
+            output_file.write(json.dumps(result) + "\n")
+            output_file.flush()
+            summary.add(result)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    summary = summary.summary(time.perf_counter() - start)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["errors"] == 0 and summary["invalid"] == 0 else 1
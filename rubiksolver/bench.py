@@ -0,0 +1,205 @@
+"""
+benchmark harness, run with python -m rubiksolver.bench
+
+Every benchmark is repeated and the median is reported, the results are written as json and compared against a stored
+baseline: a benchmark that is slower than the baseline by more than the tolerance fails the run with exit code 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from rubiksolver.cube import Cube, all_directions, all_sides
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "benchmarks",
+                             "baseline.json")
+
+
+def _median_seconds(function, repeat: int) -> float:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def _rate(name: str, number: int, seconds: float, unit: str) -> dict:
+    return {name: {"value": number / seconds, "unit": unit, "higher_is_better": True}}
+
+
+def _latency(name: str, seconds: float) -> dict:
+    return {name: {"value": seconds * 1e3, "unit": "ms", "higher_is_better": False}}
+
+
+def bench_cube_rotate(scale: float, repeat: int) -> dict:
+    number = int(100000 * scale)
+    moves = [(random.choice(all_sides), random.choice(all_directions)) for _ in range(number)]
+    cube = Cube()
+
+    def run():
+        for side, direction in moves:
+            cube.rotate(side, direction)
+    return _rate("cube_rotate", number, _median_seconds(run, repeat), "moves/s")
+
+
+def bench_cube_solved(scale: float, repeat: int) -> dict:
+    number = int(100000 * scale)
+    cube = Cube()
+    cube.init_random_cube(1)
+
+    def run():
+        for _ in range(number):
+            cube.solved()
+    return _rate("cube_solved", number, _median_seconds(run, repeat), "checks/s")
+
+
+def bench_init_random_cube(scale: float, repeat: int) -> dict:
+    number = int(2000 * scale)
+    cube = Cube()
+
+    def run():
+        for _ in range(number):
+            cube.init_random_cube()
+    return _rate("init_random_cube", number, _median_seconds(run, repeat), "cubes/s")
+
+
+def bench_train_wrapper(scale: float, repeat: int) -> dict:
+    from rubiksolver.agents.randomagent import RandomAgent
+    from rubiksolver.train_wrapper import TrainWrapper
+    number = int(20000 * scale)
+    wrapper = TrainWrapper(number_shuffles=50, actions_reset_threshold=1000)
+    agent = RandomAgent()
+    return _rate("train_wrapper_random_agent", number,
+                 _median_seconds(lambda: wrapper.run_training(agent, number, logging_frequency=1), repeat), "steps/s")
+
+
+def bench_replay_buffer(scale: float, repeat: int) -> dict:
+    from rubiksolver.replay_buffer import ReplayBuffer
+    capacity = int(1000000 * scale)
+    buffer = ReplayBuffer(capacity, state_shape=(54, ))
+    states = np.random.randint(0, 6, size=(capacity, 54), dtype=np.uint8)
+    buffer.add_batch(states, np.random.randint(0, 12, size=capacity), np.zeros(capacity), states,
+                     np.zeros(capacity, dtype=bool))
+    results = {}
+    for batch_size in [32, 256, 4096]:
+        number = 100
+
+        def run():
+            for _ in range(number):
+                buffer.sample(batch_size)
+        results.update(_latency("replay_buffer_sample_{}".format(batch_size), _median_seconds(run, repeat) / number))
+    return results
+
+
+def bench_dqn_train_step(scale: float, repeat: int) -> dict:
+    import tempfile
+    from rubiksolver.agents.dqnagent import DQNAgent
+    batch_size = 32
+    number = max(int(100 * scale), 1)
+    with tempfile.TemporaryDirectory() as directory:
+        agent = DQNAgent(save_path=os.path.join(directory, "model.ckpt"), buffer_size=batch_size * 10)
+        states = np.random.randint(0, 6, size=(batch_size, 54), dtype=np.uint8)
+        batch = {"obs": states, "actions": np.random.randint(0, 12, size=batch_size), "next_obs": states,
+                 "rewards": np.zeros(batch_size, dtype=np.float32), "is_done": np.zeros(batch_size, dtype=np.float32)}
+        # the first call traces and compiles the train step
+        agent.train_on_batch(**batch)
+
+        def run():
+            for _ in range(number):
+                agent.train_on_batch(**batch)
+        return _latency("dqn_train_step", _median_seconds(run, repeat) / number)
+
+
+BENCHMARKS = {"cube_rotate": bench_cube_rotate, "cube_solved": bench_cube_solved,
+              "init_random_cube": bench_init_random_cube, "train_wrapper": bench_train_wrapper,
+              "replay_buffer": bench_replay_buffer, "dqn_train_step": bench_dqn_train_step}
+
+
+def run_benchmarks(names: list = None, scale: float = 1.0, repeat: int = 5, seed: int = 0) -> dict:
+    """
+    :param names: keys of BENCHMARKS to run, None runs all. A benchmark whose dependencies are missing is skipped
+    :param scale: factor on the number of operations per benchmark, smaller values give quicker but noisier results
+    :param repeat: number of repetitions, the median is reported
+    :param seed: seed of the random moves and states
+    :return: dict with the environment, the results by name and the skipped benchmarks with the reason
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    results, skipped = {}, {}
+    for name in names or BENCHMARKS:
+        try:
+            results.update(BENCHMARKS[name](scale, repeat))
+        except ImportError as error:
+            skipped[name] = str(error)
+    return {"environment": {"python": platform.python_version(), "numpy": np.__version__,
+                            "platform": platform.platform(), "processor": platform.processor(),
+                            "cpu_count": os.cpu_count()},
+            "scale": scale, "repeat": repeat, "results": results, "skipped": skipped}
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2) -> list:
+    """
+    :param report: result of run_benchmarks
+    :param baseline: earlier result of run_benchmarks
+    :param tolerance: allowed relative slowdown, 0.2 fails rates below 80 % and latencies above 120 % of the baseline
+    :return: list of regressions, dicts with name, value, baseline and relative change
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        if name not in baseline.get("results", {}):
+            continue
+        reference = baseline["results"][name]["value"]
+        change = result["value"] / reference - 1.0
+        if (result["higher_is_better"] and change < -tolerance) or \
+                (not result["higher_is_better"] and change > tolerance):
+            regressions.append({"name": name, "value": result["value"], "baseline": reference, "change": change})
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m rubiksolver.bench")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=None, help="benchmarks to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor on the work per benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="repetitions per benchmark, the median is reported")
+    parser.add_argument("--output", default=None, help="json file for the results, default is stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="json results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.only, args.scale, args.repeat)
+    for name, result in report["results"].items():
+        print("{:<28} {:>14.3f} {}".format(name, result["value"], result["unit"]), file=sys.stderr)
+    for name, reason in report["skipped"].items():
+        print("{:<28} skipped: {}".format(name, reason), file=sys.stderr)
+
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        return 0
+
+    if not os.path.isfile(args.baseline):
+        print("no baseline at {}, store one with --save-baseline".format(args.baseline), file=sys.stderr)
+        return 0
+    with open(args.baseline) as file:
+        regressions = compare(report, json.load(file), args.tolerance)
+    for regression in regressions:
+        print("REGRESSION {name}: {value:.3f} vs baseline {baseline:.3f} ({change:+.1%})".format(**regression),
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
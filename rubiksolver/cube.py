@@ -1,11 +1,12 @@
-from aenum import Enum
+from enum import Enum
+import itertools
 import numpy as np
 import random
 
 COLOR_DICT = {"white": 1, "yellow": 2, "red": 3, "blue": 4, "green": 5, "orange": 6}
 COLOR_DICT_REV = {value: key for key, value in COLOR_DICT.items()}
 # This dict is used to mark which sides are aside the key side, they are stored in clockwise direction inside the list
-NEIGHBOR_DICT = {0: [2, 4, 3, 5], 1: [2, 4, 3, 5], 2: [0, 4, 1, 5], 3: [0, 4, 1, 5], 4: [0, 3, 1, 2], 5: [0, 3, 1, 2]}
+NEIGHBOR_DICT = {0: [2, 4, 3, 5], 1: [2, 4, 3, 5], 2: [5, 1, 4, 0], 3: [5, 1, 4, 0], 4: [2, 1, 3, 0], 5: [2, 1, 3, 0]}
 # this dict is for specifying which index should be taken
 INDEX_DICT = {0: 0, 1: 2, 2: 0, 3: 2, 4: 0, 5: 2}
 # this dict marks which side is on which axis, 0 is x, 1 is y, 2 is z
@@ -13,6 +14,9 @@ AXIS_DICT = {0: 0, 1: 0, 2: 1, 3: 1, 4: 2, 5: 2}
 # this dict marks which side should turn which axis at what axis
 TRANSITION_AXIS_DICT = {0: {1: 1, 2: 2}, 1: {1: 1, 2: 2}, 2: {2: 1, 0: 2},
                         3: {2: 1, 0: 2}, 4: {0: 1, 1: 2}, 5: {0: 1, 1: 2}}
+# this dict marks whether the stickers of a side are stored as seen from outside the cube (False) or from inside (True),
+# a clockwise turn of a side that is seen from inside is a counter clockwise rotation of its array
+MIRRORED_DICT = {0: False, 1: True, 2: False, 3: True, 4: False, 5: True}
 
 
 class Side(Enum):
@@ -31,33 +35,69 @@ class Direction(Enum):
 
 all_sides = [Side.back, Side.bottom, Side.front, Side.left, Side.right, Side.top]
 all_directions = [Direction.clockwise, Direction.counter_clockwise]
+# side and direction of every action number, the enum api is only a view on the action numbers
+_ACTION_TUPLES = [(Side(action % 6), Direction(action // 6)) for action in range(12)]
 
 
 class Cube:
 
     def __init__(self):
-        self.cube = None
+        self._cube = None
+        # number of stickers that differ from the color of their side, kept up to date by every move
+        self._misplaced = 0
         self.init_cube()
 
+    @property
+    def cube(self) -> np.ndarray:
+        """
+        sticker colors of shape (6, 3, 3). Assigning a new array recounts the misplaced stickers, so the array should
+        only be changed by assignment, not in place
+        """
+        return self._cube
+
+    @cube.setter
+    def cube(self, cube: np.ndarray):
+        self._cube = cube
+        self._misplaced = int(misplaced_stickers(cube)[0])
+
+    @property
+    def misplaced(self) -> int:
+        """
+        number of stickers that do not have the color of their side, 0 for the solved cube
+        """
+        return self._misplaced
+
     def init_cube(self):
         """
         initialises a solved cube
 
         :return:
         """
-        self.cube = np.array([[[i for _ in range(3)] for _ in range(3)] for i in range(0, 6)])
+        self._cube = np.array([[[i for _ in range(3)] for _ in range(3)] for i in range(0, 6)])
+        self._misplaced = 0
 
-    def init_random_cube(self, number_rotations: int = 50):
+    def init_random_cube(self, number_rotations: int = 50, uniform: bool = False):
         """
-        initialises a solved cube
+        initialises a randomly scrambled cube. The random actions never cancel each other (see ALLOWED_ACTIONS) and
+        are applied to the flat state without going through rotate
 
+        :param number_rotations: number of random actions
+        :param uniform: if True the cube is set to a uniformly distributed random state instead, see
+            rubiksolver.scrambles.random_states, and number_rotations is ignored
         :return:
         """
-        self.init_cube()
-        sides = [random.choice(all_sides) for _ in range(number_rotations)]
-        directions = [random.choice(all_directions) for _ in range(number_rotations)]
-        for side, direc in zip(sides, directions):
-            self.rotate(side, direc)
+        if uniform:
+            from rubiksolver.scrambles import random_states
+            self.cube = random_states(1, seed=random.getrandbits(64))[0].reshape(6, 3, 3).astype(np.int64)
+            return
+        state = _SOLVED_STATE_INT.copy()
+        last, before_last = NO_ACTION, NO_ACTION
+        for _ in range(number_rotations):
+            action = random.choice(ALLOWED_ACTION_LISTS[last][before_last])
+            state = state[MOVE_TABLE[action]]
+            last, before_last = action, last
+        self._cube = state.reshape(6, 3, 3)
+        self._misplaced = np.count_nonzero(state != SOLVED_STATE)
 
     def rotate(self, side: Side, direction: Direction):
         """
@@ -67,41 +107,61 @@ class Cube:
         :param direction:
         :return:
         """
-        cube = self.cube.copy()
-        k = 1 if direction is direction.clockwise else 3
-        cube[side.value, :, :] = np.rot90(cube[side.value, :, :], k=k)
-        neighbors = NEIGHBOR_DICT[side.value]
-        if direction is Direction.counter_clockwise:
-            neighbors = list(reversed(neighbors))
-        for i, n in enumerate(neighbors):
-            side_before = get_neighbor_before(i, neighbors)
-            axis_after = AXIS_DICT[n]
-            index = INDEX_DICT[side.value]
-            axis_to_copy_to = TRANSITION_AXIS_DICT[side.value][axis_after]
-            axis_before = AXIS_DICT[side_before]
-            axix_to_copy_from = TRANSITION_AXIS_DICT[side.value][axis_before]
-            LI = [index, index, index]
-            LI[0] = n
-            LI[axis_to_copy_to] = [0, 1, 2]
-            RI = [index, index, index]
-            RI[0] = side_before
-            RI[axix_to_copy_from] = [0, 1, 2]
-
-            cube[tuple(LI)] = self.cube[tuple(RI)]
-        self.cube = cube
+        self.apply_action(direction.value * 6 + side.value)
+
+    def apply_action(self, action: int):
+        """
+        applies an action number (0 to 11, see ActionSerializer) to this cube, the fast path of rotate without enums
+
+        :param action:
+        :return:
+        """
+        state = self._cube.reshape(54)[MOVE_TABLE[action]]
+        self._cube = state.reshape(6, 3, 3)
+        # one vectorized count over all 54 stickers is cheaper than counting the 20 moved stickers before and after
+        self._misplaced = np.count_nonzero(state != SOLVED_STATE)
+
+    def apply_actions(self, actions):
+        """
+        applies a sequence of action numbers to this cube
+
+        :param actions: list or int array of action numbers
+        :return:
+        """
+        state = self._cube.reshape(54)
+        for action in actions:
+            state = state[MOVE_TABLE[action]]
+        self._cube = state.reshape(6, 3, 3)
+        self._misplaced = np.count_nonzero(state != SOLVED_STATE)
+
+    def key(self, symmetry_reduced: bool = False) -> int:
+        """
+        compact integer key of the current state, see encode_state
+
+        :param symmetry_reduced: if True the key is the same for all 48 symmetric versions of the state
+        :return:
+        """
+        if symmetry_reduced:
+            keys, _ = canonical_keys(self.cube)
+            return int(keys[0, 0]) * EDGE_KEY_RANGE + int(keys[0, 1])
+        return encode_state(self.cube)
+
+    def set_key(self, key: int):
+        """
+        sets the cube to the state of the key
+
+        :param key: key as returned by Cube.key
+        :return:
+        """
+        self.cube = decode_state(key).astype(np.int64)
 
     def solved(self):
         """
-        indicates whether the cube is solved or not
+        indicates whether the cube is solved or not, in O(1) from the running count of misplaced stickers
 
         :return:
         """
-        solved = True
-        for i in range(self.cube.shape[0]):
-            solved = solved & (np.sum(self.cube[i, :, :] == i) == 9)
-            if not solved:
-                break
-        return solved
+        return self._misplaced == 0
 
     def __str__(self):
         for i in self.cube.shape[0]:
@@ -131,6 +191,11 @@ def get_neighbor_before(index: int, neighbors: list):
         return neighbors[index - 1]
 
 
+# letters of the sides in move strings like "R U R' U2", a ' marks a counter clockwise turn, a 2 a half turn
+NOTATION_DICT = {0: "U", 1: "D", 2: "L", 3: "R", 4: "F", 5: "B"}
+NOTATION_DICT_REV = {value: key for key, value in NOTATION_DICT.items()}
+
+
 class ActionSerializer:
 
     @staticmethod
@@ -139,17 +204,477 @@ class ActionSerializer:
 
     @staticmethod
     def deserialize(action: int) -> (Side, Direction):
-        assert 11 >= action >= 0
-        assert isinstance(action, int)
-        direction = int(action / 6)
-        side = action % 6
-        assert 5 >= side >= 0
-        if direction > 0:
-            direction = Direction.counter_clockwise
+        assert isinstance(action, (int, np.integer)) and 11 >= action >= 0
+        return _ACTION_TUPLES[action]
+
+    @staticmethod
+    def parse_moves(moves: str) -> list:
+        """
+        parses a move string like "R U R' U2" into action numbers, half turns become two quarter turns
+
+        :param moves: whitespace separated moves
+        :return: list of action numbers
+        """
+        actions = []
+        for move in moves.split():
+            if move[0] not in NOTATION_DICT_REV or move[1:] not in ("", "'", "2", "2'"):
+                raise ValueError("Invalid move {} in {}".format(move, moves))
+            action = NOTATION_DICT_REV[move[0]] + (6 if move[1:] == "'" else 0)
+            actions.extend([action] * (2 if move[1:].startswith("2") else 1))
+        return actions
+
+    @staticmethod
+    def format_moves(actions: list) -> str:
+        """
+        inverse of parse_moves, two equal quarter turns in a row are written as half turn
+
+        :param actions: action numbers
+        :return: move string
+        """
+        moves = []
+        i = 0
+        while i < len(actions):
+            action = int(actions[i])
+            if i + 1 < len(actions) and int(actions[i + 1]) == action:
+                moves.append(NOTATION_DICT[action % 6] + "2")
+                i += 2
+            else:
+                moves.append(NOTATION_DICT[action % 6] + ("'" if action >= 6 else ""))
+                i += 1
+        return " ".join(moves)
+
+
+def rotate_reference(cube: np.ndarray, side: Side, direction: Direction) -> np.ndarray:
+    """
+    rotates the specified side of the given (6, 3, 3) cube array by the specified direction and returns the rotated
+    array. This is the geometric definition of a move, it is only used to compile MOVE_TABLE at import time and as
+    reference in the tests
+
+    :param cube: cube array of shape (6, 3, 3)
+    :param side:
+    :param direction:
+    :return: rotated copy of cube
+    """
+    rotated = cube.copy()
+    if MIRRORED_DICT[side.value]:
+        direction = Direction.counter_clockwise if direction is Direction.clockwise else Direction.clockwise
+    k = 1 if direction is Direction.clockwise else 3
+    rotated[side.value, :, :] = np.rot90(rotated[side.value, :, :], k=k)
+    neighbors = NEIGHBOR_DICT[side.value]
+    if direction is Direction.counter_clockwise:
+        neighbors = list(reversed(neighbors))
+    for i, n in enumerate(neighbors):
+        side_before = get_neighbor_before(i, neighbors)
+        # the end of the strip that touches side_before has to receive the end of the copied strip that touches the
+        # side before side_before, otherwise the corner stickers would be torn apart from their cubies
+        reverse = INDEX_DICT[side_before] != INDEX_DICT[get_neighbor_before(neighbors.index(side_before), neighbors)]
+        axis_after = AXIS_DICT[n]
+        index = INDEX_DICT[side.value]
+        axis_to_copy_to = TRANSITION_AXIS_DICT[side.value][axis_after]
+        axis_before = AXIS_DICT[side_before]
+        axix_to_copy_from = TRANSITION_AXIS_DICT[side.value][axis_before]
+        LI = [index, index, index]
+        LI[0] = n
+        LI[axis_to_copy_to] = [0, 1, 2]
+        RI = [index, index, index]
+        RI[0] = side_before
+        RI[axix_to_copy_from] = [2, 1, 0] if reverse else [0, 1, 2]
+
+        rotated[tuple(LI)] = cube[tuple(RI)]
+    return rotated
+
+
+def _compile_move_table() -> np.ndarray:
+    """
+    computes for each of the 12 actions the sticker permutation of the flat 54 element cube, so that
+    state[MOVE_TABLE[action]] is the state after the action was applied
+
+    :return: int array of shape (12, 54)
+    """
+    labels = np.arange(54).reshape(6, 3, 3)
+    table = np.empty((12, 54), dtype=np.intp)
+    for action in range(12):
+        side, direction = ActionSerializer.deserialize(action)
+        table[action] = rotate_reference(labels, side, direction).reshape(54)
+    table.setflags(write=False)
+    return table
+
+
+MOVE_TABLE = _compile_move_table()
+# flat 54 sticker state of the solved cube
+SOLVED_STATE = np.repeat(np.arange(6, dtype=np.uint8), 9)
+SOLVED_STATE.setflags(write=False)
+
+# stands for no action in ALLOWED_ACTIONS, e.g. at the start of a path
+NO_ACTION = 12
+
+
+def _compile_allowed_actions() -> np.ndarray:
+    """
+    move pruning on the quarter turn actions (direction * 6 + side), indexed by the last and the second to last action
+    of a path, NO_ACTION if there is none. Of the action sequences that are equal on the cube only one canonical
+    sequence is allowed:
+
+    - no action followed by its inverse
+    - a side is turned at most twice in a row, and twice only clockwise
+    - turns of opposite sides commute, the lower side (top, left, front) is turned first
+
+    :return: bool array of shape (13, 13, 12)
+    """
+    allowed = np.ones((13, 13, 12), dtype=bool)
+    for last in range(12):
+        for before_last in range(13):
+            for action in range(12):
+                side, last_side = action % 6, last % 6
+                if side == last_side:
+                    allowed[last, before_last, action] = action == last and action < 6 and \
+                        (before_last == NO_ACTION or before_last % 6 != side)
+                elif side % 2 == 0 and last_side == side + 1:
+                    allowed[last, before_last, action] = False
+    return allowed
+
+
+ALLOWED_ACTIONS = _compile_allowed_actions()
+_SOLVED_STATE_INT = SOLVED_STATE.astype(np.int64)
+# the allowed actions as lists, for loops over single cubes
+ALLOWED_ACTION_LISTS = [[np.flatnonzero(ALLOWED_ACTIONS[last, before_last]).tolist() for before_last in range(13)]
+                        for last in range(13)]
+
+
+def apply_action(state: np.ndarray, action: int) -> np.ndarray:
+    """
+    applies the action (0 to 11) to the flat 54 sticker state with a single gather
+
+    :param state: flat state of shape (54, ) or a batch of states with shape (N, 54)
+    :param action: action number as used by ActionSerializer
+    :return: new state, the given state is not modified
+    """
+    return state[..., MOVE_TABLE[action]]
+
+
+def _compile_cubie_model():
+    """
+    derives the cubies from MOVE_TABLE: a sticker is moved by the turns of exactly the sides its cubie lies on, so
+    stickers that are moved by the same sides form a cubie. Each side gets an outward normal, opposite sides opposite
+    normals, which places every sticker at (cubie position, normal) in space. The stickers of a corner are ordered
+    starting with the top/bottom sticker and going around the corner with positive orientation, the stickers of an
+    edge start with the top/bottom sticker or, for the edges between the other sides, the front/back sticker.
+
+    :return: corner stickers (8, 3), edge stickers (12, 2), center stickers (6, ), sticker positions (54, 3) and
+        sticker normals (54, 3)
+    """
+    normals = np.array([[0, 0, 1], [0, 0, -1], [-1, 0, 0], [1, 0, 0], [0, -1, 0], [0, 1, 0]])
+    sides_of_sticker = [tuple(sorted({side for side in range(6) if MOVE_TABLE[side, i] != i} | {i // 9}))
+                        for i in range(54)]
+    cubies = {}
+    for sticker, sides in enumerate(sides_of_sticker):
+        cubies.setdefault(sides, []).append(sticker)
+    corners, edges, centers = [], [], []
+    for sides in sorted(cubies):
+        stickers = cubies[sides]
+        if len(sides) == 1:
+            centers.append(stickers[0])
+            continue
+        reference = [s for s in stickers if s // 9 in (0, 1)] or [s for s in stickers if s // 9 in (4, 5)]
+        others = [s for s in stickers if s != reference[0]]
+        if len(sides) == 3:
+            if np.linalg.det(normals[[reference[0] // 9] + [s // 9 for s in others]]) < 0:
+                others = others[::-1]
+            corners.append([reference[0]] + others)
         else:
-            direction = Direction.clockwise
-        side = Side(side)
-        return side, direction
+            edges.append([reference[0]] + others)
+    positions = np.array([normals[list(sides_of_sticker[i])].sum(axis=0) for i in range(54)])
+    return np.array(corners), np.array(edges), np.array(sorted(centers)), positions, normals[np.arange(54) // 9]
+
+
+CORNER_FACELETS, EDGE_FACELETS, CENTER_FACELETS, FACELET_POSITIONS, FACELET_NORMALS = _compile_cubie_model()
+# sticker colors of each corner and edge cubie in the order of its stickers
+CORNER_COLORS = CORNER_FACELETS // 9
+EDGE_COLORS = EDGE_FACELETS // 9
+_CORNER_BY_COLORS = np.full(64, -1, dtype=np.int64)
+_CORNER_BY_COLORS[np.sum(1 << CORNER_COLORS, axis=1)] = np.arange(8)
+_EDGE_BY_COLORS = np.full(64, -1, dtype=np.int64)
+_EDGE_BY_COLORS[np.sum(1 << EDGE_COLORS, axis=1)] = np.arange(12)
+_FACTORIALS = np.array([1, 1, 2, 6, 24, 120, 720, 5040, 40320, 362880, 3628800, 39916800], dtype=np.int64)
+# number of values of the corner key (corner permutation and twist) and the edge key (edge permutation and flip)
+CORNER_KEY_RANGE = 40320 * 2187
+EDGE_KEY_RANGE = 479001600 * 2048
+
+
+def state_to_cubies(states: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    converts flat sticker states into the cubie representation. cp[i] is the corner cubie in corner slot i and co[i]
+    the position of its top/bottom sticker within the slot, ep and eo are the same for the edges
+
+    :param states: sticker states of shape (N, 54)
+    :return: cp (N, 8), co (N, 8), ep (N, 12), eo (N, 12)
+    """
+    states = np.asarray(states).reshape(-1, 54).astype(np.int64)
+    corner_colors = states[:, CORNER_FACELETS]
+    co = np.argmax(corner_colors <= 1, axis=2)
+    cp = _CORNER_BY_COLORS[np.sum(1 << corner_colors, axis=2)]
+    edge_colors = states[:, EDGE_FACELETS]
+    up_down = edge_colors <= 1
+    reference = up_down | ((edge_colors >= 4) & ~np.any(up_down, axis=2, keepdims=True))
+    eo = np.argmax(reference, axis=2)
+    ep = _EDGE_BY_COLORS[np.sum(1 << edge_colors, axis=2)]
+    return cp, co, ep, eo
+
+
+def cubies_to_state(cp: np.ndarray, co: np.ndarray, ep: np.ndarray, eo: np.ndarray) -> np.ndarray:
+    """
+    converts the cubie representation back into flat sticker states, inverse of state_to_cubies
+
+    :return: uint8 states of shape (N, 54)
+    """
+    cp, co, ep, eo = [np.asarray(a).reshape(-1, a.shape[-1]) for a in (cp, co, ep, eo)]
+    rows = np.arange(cp.shape[0])[:, None, None]
+    states = np.empty((cp.shape[0], 54), dtype=np.uint8)
+    states[:, CENTER_FACELETS] = np.arange(6)
+    corner_positions = (np.arange(3)[None, None, :] + co[:, :, None]) % 3
+    states[rows, CORNER_FACELETS[np.arange(8)[None, :, None], corner_positions]] = CORNER_COLORS[cp]
+    edge_positions = (np.arange(2)[None, None, :] + eo[:, :, None]) % 2
+    states[rows, EDGE_FACELETS[np.arange(12)[None, :, None], edge_positions]] = EDGE_COLORS[ep]
+    return states
+
+
+def _compile_cubie_moves():
+    """
+    the actions on cubie level: after action a, slot i holds the cubie that was in slot CORNER_MOVE_PERMUTATION[a, i]
+    and its orientation is increased by CORNER_MOVE_ORIENTATION[a, i], the same holds for the edges
+
+    :return: corner permutations, corner orientations, edge permutations, edge orientations, each of shape (12, n)
+    """
+    return state_to_cubies(SOLVED_STATE[MOVE_TABLE])
+
+
+CORNER_MOVE_PERMUTATION, CORNER_MOVE_ORIENTATION, EDGE_MOVE_PERMUTATION, EDGE_MOVE_ORIENTATION = \
+    _compile_cubie_moves()
+
+
+def misplaced_stickers(states: np.ndarray) -> np.ndarray:
+    """
+    number of stickers that do not have the color of their side
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int array of shape (N, )
+    """
+    return np.count_nonzero(np.asarray(states).reshape(-1, 54) != SOLVED_STATE, axis=1)
+
+
+def solved_cubies(states: np.ndarray) -> np.ndarray:
+    """
+    number of corner and edge cubies that are in their home slot with the right orientation, i.e. whose stickers all
+    have the color of their side
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int array of shape (N, ) with values from 0 to 20
+    """
+    states = np.asarray(states).reshape(-1, 54)
+    return np.count_nonzero(np.all(states[:, CORNER_FACELETS] == CORNER_COLORS, axis=2), axis=1) + \
+        np.count_nonzero(np.all(states[:, EDGE_FACELETS] == EDGE_COLORS, axis=2), axis=1)
+
+
+def face_agreement(states: np.ndarray) -> np.ndarray:
+    """
+    number of stickers on each side that have the color of the side
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int array of shape (N, 6) with values from 1 to 9
+    """
+    return np.count_nonzero(np.asarray(states).reshape(-1, 6, 9) == np.arange(6)[:, None], axis=2)
+
+
+def distance_features(states: np.ndarray) -> np.ndarray:
+    """
+    cheap features that correlate with the distance to the solved state, e.g. for reward shaping or tie breaking in
+    searches: misplaced stickers, solved cubies and the face agreement of the 6 sides
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int array of shape (N, 8)
+    """
+    states = np.asarray(states).reshape(-1, 54)
+    return np.concatenate([misplaced_stickers(states)[:, None], solved_cubies(states)[:, None],
+                           face_agreement(states)], axis=1)
+
+
+def permutation_rank(permutations: np.ndarray) -> np.ndarray:
+    """
+    lexicographic rank (Lehmer code) of a batch of permutations of 0 to n - 1
+
+    :param permutations: int array of shape (N, n)
+    :return: int64 ranks of shape (N, )
+    """
+    n = permutations.shape[1]
+    smaller_after = np.triu(permutations[:, :, None] > permutations[:, None, :], k=1).sum(axis=2)
+    return smaller_after @ _FACTORIALS[n - 1::-1]
+
+
+def permutation_unrank(ranks: np.ndarray, n: int) -> np.ndarray:
+    """
+    inverse of permutation_rank
+
+    :param ranks: int array of shape (N, )
+    :param n: length of the permutations
+    :return: int64 permutations of shape (N, n)
+    """
+    ranks = np.asarray(ranks, dtype=np.int64).copy()
+    available = np.tile(np.arange(n), (ranks.shape[0], 1))
+    permutations = np.empty((ranks.shape[0], n), dtype=np.int64)
+    rows = np.arange(ranks.shape[0])
+    for i in range(n):
+        digit, ranks = np.divmod(ranks, _FACTORIALS[n - 1 - i])
+        permutations[:, i] = available[rows, digit]
+        # remove the used element by shifting the ones behind it to the left
+        keep = np.arange(n - i)[None, :] < digit[:, None]
+        available = np.where(keep[:, :-1], available[:, :-1], available[:, 1:]) if n - i > 1 else available
+    return permutations
+
+
+def orientation_rank(orientations: np.ndarray, base: int) -> np.ndarray:
+    """
+    rank of the orientations without the last one, which is determined by the others
+
+    :param orientations: int array of shape (N, n)
+    :param base: 3 for corners, 2 for edges
+    :return: int64 ranks of shape (N, )
+    """
+    n = orientations.shape[1]
+    return orientations[:, :n - 1] @ (base ** np.arange(n - 2, -1, -1, dtype=np.int64))
+
+
+def orientation_unrank(ranks: np.ndarray, n: int, base: int) -> np.ndarray:
+    """
+    inverse of orientation_rank, the last orientation makes the sum divisible by base
+
+    :return: int64 orientations of shape (N, n)
+    """
+    ranks = np.asarray(ranks, dtype=np.int64)
+    orientations = (ranks[:, None] // base ** np.arange(n - 2, -1, -1, dtype=np.int64)[None, :]) % base
+    return np.concatenate([orientations, (-orientations.sum(axis=1, keepdims=True)) % base], axis=1)
+
+
+def state_keys(states: np.ndarray) -> np.ndarray:
+    """
+    compact keys of a batch of sticker states: the corner key ranks corner permutation and twist, the edge key ranks
+    edge permutation and flip. Together they identify a state, the solved cube has the keys (0, 0)
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int64 keys of shape (N, 2)
+    """
+    cp, co, ep, eo = state_to_cubies(states)
+    corner_keys = permutation_rank(cp) * 2187 + orientation_rank(co, 3)
+    edge_keys = permutation_rank(ep) * 2048 + orientation_rank(eo, 2)
+    return np.stack([corner_keys, edge_keys], axis=1)
+
+
+def keys_to_states(keys: np.ndarray) -> np.ndarray:
+    """
+    inverse of state_keys
+
+    :param keys: int keys of shape (N, 2)
+    :return: uint8 sticker states of shape (N, 54)
+    """
+    keys = np.asarray(keys, dtype=np.int64).reshape(-1, 2)
+    cp, co = np.divmod(keys[:, 0], 2187)
+    ep, eo = np.divmod(keys[:, 1], 2048)
+    return cubies_to_state(permutation_unrank(cp, 8), orientation_unrank(co, 8, 3),
+                           permutation_unrank(ep, 12), orientation_unrank(eo, 12, 2))
+
+
+def encode_state(state: np.ndarray) -> int:
+    """
+    single integer key of a cube state, hashable and comparable in O(1)
+
+    :param state: cube array of shape (6, 3, 3) or flat state of shape (54, )
+    :return:
+    """
+    corner_key, edge_key = state_keys(state)[0]
+    return int(corner_key) * EDGE_KEY_RANGE + int(edge_key)
+
+
+def decode_state(key: int) -> np.ndarray:
+    """
+    inverse of encode_state
+
+    :param key:
+    :return: cube array of shape (6, 3, 3)
+    """
+    corner_key, edge_key = divmod(key, EDGE_KEY_RANGE)
+    return keys_to_states(np.array([[corner_key, edge_key]])).reshape(6, 3, 3)
+
+
+def _compile_symmetries():
+    """
+    computes the 48 symmetries of the cube (24 rotations, each also mirrored) as sticker permutations plus color
+    relabelling. The symmetric version of a state is SYMMETRY_COLORS[s][state[SYMMETRY_TABLE[s]]]
+
+    :return: sticker table (48, 54), color table (48, 6) and the determinant of each symmetry (48, )
+    """
+    sticker_index = {(tuple(p), tuple(n)): i for i, (p, n) in enumerate(zip(FACELET_POSITIONS, FACELET_NORMALS))}
+    side_index = {tuple(n): i // 9 for i, n in enumerate(FACELET_NORMALS)}
+    table, colors, determinants = [], [], []
+    for axes in itertools.permutations(range(3)):
+        for signs in itertools.product([1, -1], repeat=3):
+            matrix = np.zeros((3, 3), dtype=np.int64)
+            matrix[np.arange(3), axes] = signs
+            source = np.empty(54, dtype=np.intp)
+            for i in range(54):
+                target = sticker_index[(tuple(matrix @ FACELET_POSITIONS[i]), tuple(matrix @ FACELET_NORMALS[i]))]
+                source[target] = i
+            colors.append([side_index[tuple(matrix @ FACELET_NORMALS[side * 9])] for side in range(6)])
+            table.append(source)
+            determinants.append(int(round(np.linalg.det(matrix))))
+    # the identity first
+    order = np.argsort([0 if np.array_equal(t, np.arange(54)) else 1 for t in table], kind="stable")
+    return np.array(table)[order], np.array(colors, dtype=np.uint8)[order], np.array(determinants)[order]
+
+
+_SYMMETRY_NAMES = ["SYMMETRY_TABLE", "SYMMETRY_COLORS", "SYMMETRY_DETERMINANTS"]
+_symmetries = None
+
+
+def _get_symmetries() -> tuple:
+    # the symmetries take most of the time of compiling the tables, so they are only compiled on first use
+    global _symmetries
+    if _symmetries is None:
+        _symmetries = _compile_symmetries()
+    return _symmetries
+
+
+def __getattr__(name: str):
+    # SYMMETRY_TABLE, SYMMETRY_COLORS and SYMMETRY_DETERMINANTS stay importable from this module
+    if name in _SYMMETRY_NAMES:
+        return _get_symmetries()[_SYMMETRY_NAMES.index(name)]
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+def symmetric_states(states: np.ndarray) -> np.ndarray:
+    """
+    all 48 symmetric versions of a batch of states
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: uint8 states of shape (N, 48, 54)
+    """
+    states = np.asarray(states).reshape(-1, 54)
+    symmetry_table, symmetry_colors, _ = _get_symmetries()
+    return symmetry_colors[np.arange(48)[None, :, None], states[:, symmetry_table]]
+
+
+def canonical_keys(states: np.ndarray) -> (np.ndarray, np.ndarray):
+    """
+    symmetry reduced keys: the smallest key of the 48 symmetric versions of each state. States that are symmetric to
+    each other share the same canonical key
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int64 keys of shape (N, 2) and the symmetry (N, ) that maps each state to its canonical version
+    """
+    states = np.asarray(states).reshape(-1, 54)
+    keys = state_keys(symmetric_states(states).reshape(-1, 54)).reshape(states.shape[0], 48, 2)
+    corner_keys = keys[:, :, 0]
+    edge_keys = np.where(corner_keys == corner_keys.min(axis=1, keepdims=True), keys[:, :, 1], EDGE_KEY_RANGE)
+    symmetries = np.argmin(edge_keys, axis=1)
+    return keys[np.arange(states.shape[0]), symmetries], symmetries
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "transitions")
+_MAGIC = b"RBKTRN01"
+_HEADER_SIZE = 4096
+
+
+def _columns(state_shape: tuple) -> list:
+    # name, dtype and shape of a single entry of every column, in file order
+    return [("obs", np.uint8, state_shape), ("next_obs", np.uint8, state_shape), ("actions", np.int8, ()),
+            ("rewards", np.float32, ()), ("dones", bool, ())]
+
+
+def _layout(capacity: int, state_shape: tuple) -> (dict, int):
+    # byte offset of every column, each column is one contiguous block of capacity entries, and the file size
+    offsets = {}
+    offset = _HEADER_SIZE
+    for name, dtype, shape in _columns(state_shape):
+        offsets[name] = offset
+        offset += capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        offset = (offset + 63) // 64 * 64
+    return offsets, offset
+
+
+def _read_header(path: str) -> dict:
+    with open(path, "rb") as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("{} is not a transition shard".format(path))
+        header_length = int.from_bytes(file.read(4), "little")
+        return json.loads(file.read(header_length).decode())
+
+
+def _shard_paths(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(directory, "shard_*.rbt")))
+
+
+class TransitionWriter:
+    """
+    Appends transitions to a directory of shard files. A shard has a fixed capacity and stores every field as one
+    contiguous column (states as fixed size uint8 records, then actions, rewards and done flags) behind a small json
+    header with the number of valid transitions. Transitions are staged in memory and written in chunks, the header is
+    only updated after the data of a chunk is written, so readers never see partially written transitions. Opening an
+    existing directory continues its last shard.
+    """
+
+    def __init__(self, directory: str = DATA_DIRECTORY, shard_capacity: int = 1000000, state_shape: tuple = (54, ),
+                 flush_size: int = 10000):
+        """
+
+        :param directory: directory of the shards, created if it does not exist
+        :param shard_capacity: number of transitions per shard
+        :param state_shape: shape of a single state
+        :param flush_size: number of staged transitions after which they are written to disk
+        """
+        self.directory = directory
+        self.shard_capacity = int(shard_capacity)
+        self.state_shape = tuple(state_shape)
+        self.flush_size = flush_size
+        os.makedirs(directory, exist_ok=True)
+        self._staged = {name: [] for name, _, _ in _columns(self.state_shape)}
+        self._number_staged = 0
+
+        paths = _shard_paths(directory)
+        self._shard_index = len(paths) - 1
+        self._shard_size = 0
+        if paths:
+            header = _read_header(paths[-1])
+            self.shard_capacity = header["capacity"]
+            self.state_shape = tuple(header["state_shape"])
+            self._shard_size = header["size"]
+        if not paths or self._shard_size >= self.shard_capacity:
+            self._new_shard()
+
+    @property
+    def _path(self) -> str:
+        return os.path.join(self.directory, "shard_{:06d}.rbt".format(self._shard_index))
+
+    def _new_shard(self):
+        self._shard_index += 1
+        self._shard_size = 0
+        with open(self._path, "wb") as file:
+            # the shard is allocated sparse, the file system only stores the written blocks
+            file.truncate(_layout(self.shard_capacity, self.state_shape)[1])
+        self._write_header()
+
+    def _write_header(self):
+        header = json.dumps({"capacity": self.shard_capacity, "size": self._shard_size,
+                             "state_shape": list(self.state_shape),
+                             "offsets": _layout(self.shard_capacity, self.state_shape)[0]}).encode()
+        assert len(_MAGIC) + 4 + len(header) <= _HEADER_SIZE
+        with open(self._path, "r+b") as file:
+            file.write(_MAGIC + len(header).to_bytes(4, "little") + header)
+
+    def add(self, obs_t, action, reward, obs_tp1, done):
+        """
+        stages one transition, same arguments as ReplayBuffer.add
+        """
+        self.add_batch(np.asarray(obs_t)[None], [action], [reward], np.asarray(obs_tp1)[None], [done])
+
+    def add_batch(self, obs_t, actions, rewards, obs_tp1, dones):
+        """
+        stages a batch of transitions, same arguments as ReplayBuffer.add_batch
+        """
+        number = len(actions)
+        for name, values in [("obs", obs_t), ("next_obs", obs_tp1), ("actions", actions), ("rewards", rewards),
+                             ("dones", dones)]:
+            self._staged[name].append(np.asarray(values))
+        self._number_staged += number
+        if self._number_staged >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """
+        writes the staged transitions, starting new shards when the current one is full
+        """
+        if self._number_staged == 0:
+            return
+        columns = {name: np.concatenate(values).astype(dtype).reshape((-1, ) + shape)
+                   for (name, dtype, shape), values in zip(_columns(self.state_shape), self._staged.values())}
+        self._staged = {name: [] for name in self._staged}
+        self._number_staged = 0
+        start = 0
+        number = columns["actions"].shape[0]
+        while start < number:
+            if self._shard_size >= self.shard_capacity:
+                self._new_shard()
+            count = min(number - start, self.shard_capacity - self._shard_size)
+            offsets, _ = _layout(self.shard_capacity, self.state_shape)
+            with open(self._path, "r+b") as file:
+                for name, values in columns.items():
+                    chunk = np.ascontiguousarray(values[start:start + count])
+                    file.seek(offsets[name] + self._shard_size * (chunk.nbytes // count))
+                    file.write(chunk.tobytes())
+            self._shard_size += count
+            self._write_header()
+            start += count
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TransitionDataset:
+    """
+    Read only view of a directory written by a TransitionWriter. Every column of every shard is a numpy.memmap, so
+    sampling only reads the pages of the sampled transitions and the dataset can be far larger than the memory.
+    sample has the signature of ReplayBuffer.sample, the dataset can replace the buffer of an agent for offline
+    training.
+    """
+
+    def __init__(self, directory: str = DATA_DIRECTORY, seed: int = None):
+        """
+
+        :param directory: directory of the shards
+        :param seed: seed for sampling and shuffling
+        """
+        self.directory = directory
+        self._random = np.random.default_rng(seed)
+        self._shards = []
+        for path in _shard_paths(directory):
+            header = _read_header(path)
+            if header["size"] == 0:
+                continue
+            state_shape = tuple(header["state_shape"])
+            self._shards.append({name: np.memmap(path, dtype=dtype, mode="r", offset=header["offsets"][name],
+                                                 shape=(header["size"], ) + shape)
+                                 for name, dtype, shape in _columns(state_shape)})
+        self._sizes = np.array([shard["actions"].shape[0] for shard in self._shards], dtype=np.int64)
+        self._starts = np.concatenate([[0], np.cumsum(self._sizes)])
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    def _gather(self, idxes: np.ndarray) -> tuple:
+        """
+        :param idxes: global transition indices
+        :return: obs, actions, rewards, next_obs, dones
+        """
+        idxes = np.asarray(idxes, dtype=np.int64)
+        shards = np.searchsorted(self._starts, idxes, side="right") - 1
+        columns = {name: None for name, _, _ in _columns(())}
+        for shard in np.unique(shards):
+            mask = shards == shard
+            # sorted reads touch the pages of the memory map in order
+            local = idxes[mask] - self._starts[shard]
+            order = np.argsort(local)
+            for name in columns:
+                values = np.empty((local.shape[0], ) + self._shards[shard][name].shape[1:],
+                                  dtype=self._shards[shard][name].dtype)
+                values[order] = self._shards[shard][name][local[order]]
+                if columns[name] is None:
+                    columns[name] = np.empty((idxes.shape[0], ) + values.shape[1:], dtype=values.dtype)
+                columns[name][mask] = values
+        return columns["obs"], columns["actions"], columns["rewards"], columns["next_obs"], columns["dones"]
+
+    def sample(self, batch_size: int) -> tuple:
+        """
+        samples transitions uniformly with replacement
+
+        :param batch_size:
+        :return: obs, actions, rewards, next_obs, dones like ReplayBuffer.sample
+        """
+        return self._gather(self._random.integers(0, len(self), size=batch_size))
+
+    def batches(self, batch_size: int, shuffle: bool = True):
+        """
+        iterates once over all transitions in minibatches. With shuffle the shards are visited in random order and
+        the transitions of a shard in a random permutation, so only one shard is read at a time
+
+        :param batch_size:
+        :param shuffle:
+        :return: generator of obs, actions, rewards, next_obs, dones
+        """
+        shard_order = self._random.permutation(len(self._shards)) if shuffle else np.arange(len(self._shards))
+        for shard in shard_order:
+            local = self._random.permutation(self._sizes[shard]) if shuffle else np.arange(self._sizes[shard])
+            for start in range(0, local.shape[0], batch_size):
+                yield self._gather(self._starts[shard] + local[start:start + batch_size])
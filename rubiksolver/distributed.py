@@ -0,0 +1,312 @@
+import logging
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from types import FunctionType
+
+import numpy as np
+
+from rubiksolver.agents.agent import Agent
+from rubiksolver.replay_buffer import ReplayBuffer
+from rubiksolver.vector_env import VectorCubeEnv
+
+
+def _aligned(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class SharedReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer whose arrays live in one multiprocessing shared memory block, so several actor processes can write
+    transitions while a learner process samples them. Writes and samples are guarded by a multiprocessing lock,
+    the position and size of the ring buffer are stored in the shared block as well. The buffer can be passed to
+    child processes, they attach to the block by name.
+    """
+
+    def __init__(self, size: int = 10000, state_shape: tuple = (54, ), state_dtype=np.uint8, lock=None,
+                 name: str = None):
+        """
+
+        :param size: max number of transitions to store in the buffer
+        :param state_shape: shape of a single state
+        :param state_dtype: dtype in which the states are stored
+        :param lock: multiprocessing lock, if None a new one is created
+        :param name: name of an existing block to attach to, if None a new block is created
+        """
+        self._maxsize = int(size)
+        self._state_shape = tuple(state_shape)
+        self._state_dtype = np.dtype(state_dtype)
+        self._lock = lock if lock is not None else multiprocessing.Lock()
+
+        state_bytes = self._maxsize * int(np.prod(self._state_shape)) * self._state_dtype.itemsize
+        offsets = [0, 16]
+        for nbytes in [state_bytes, state_bytes, self._maxsize, 4 * self._maxsize, self._maxsize]:
+            offsets.append(_aligned(offsets[-1] + nbytes))
+
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=offsets[-1])
+        else:
+            # actors are children of the owner and share its resource tracker. Attaching registers the block there
+            # again, which is idempotent, so the block stays tracked until the owner unlinks it
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+        buf = self._shm.buf
+        self._header = np.ndarray((2, ), dtype=np.int64, buffer=buf, offset=offsets[0])
+        self._obs_t = np.ndarray((self._maxsize, ) + self._state_shape, dtype=self._state_dtype, buffer=buf,
+                                 offset=offsets[1])
+        self._obs_tp1 = np.ndarray((self._maxsize, ) + self._state_shape, dtype=self._state_dtype, buffer=buf,
+                                   offset=offsets[2])
+        self._actions = np.ndarray((self._maxsize, ), dtype=np.int8, buffer=buf, offset=offsets[3])
+        self._rewards = np.ndarray((self._maxsize, ), dtype=np.float32, buffer=buf, offset=offsets[4])
+        self._dones = np.ndarray((self._maxsize, ), dtype=bool, buffer=buf, offset=offsets[5])
+        if self._owner:
+            self._header[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def _next_idx(self) -> int:
+        return int(self._header[0])
+
+    @_next_idx.setter
+    def _next_idx(self, value: int):
+        self._header[0] = value
+
+    @property
+    def _size(self) -> int:
+        return int(self._header[1])
+
+    @_size.setter
+    def _size(self, value: int):
+        self._header[1] = value
+
+    def add(self, *args, **kwargs):
+        with self._lock:
+            return super().add(*args, **kwargs)
+
+    def add_batch(self, *args, **kwargs):
+        with self._lock:
+            return super().add_batch(*args, **kwargs)
+
+    def sample(self, batch_size):
+        with self._lock:
+            return super().sample(batch_size)
+
+    def close(self):
+        """
+        detaches from the shared memory block, the creating process also frees it
+        """
+        for attribute in ["_header", "_obs_t", "_obs_tp1", "_actions", "_rewards", "_dones"]:
+            setattr(self, attribute, None)
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __getstate__(self):
+        return {"size": self._maxsize, "state_shape": self._state_shape, "state_dtype": self._state_dtype.str,
+                "lock": self._lock, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class SharedWeights:
+    """
+    Shared memory block that holds one version of the policy weights as flat float32 array. The learner publishes
+    new weights, actors fetch them if the version changed.
+    """
+
+    def __init__(self, shapes: list, lock=None, name: str = None):
+        """
+
+        :param shapes: list of the shapes of the weight arrays, as returned by Agent.get_weights
+        :param lock: multiprocessing lock, if None a new one is created
+        :param name: name of an existing block to attach to, if None a new block is created
+        """
+        self._shapes = [tuple(shape) for shape in shapes]
+        self._sizes = [int(np.prod(shape)) for shape in self._shapes]
+        self._lock = lock if lock is not None else multiprocessing.Lock()
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=8 + 4 * max(sum(self._sizes), 1))
+        else:
+            self._shm = shared_memory.SharedMemory(name=name, create=False)
+        self._version = np.ndarray((1, ), dtype=np.int64, buffer=self._shm.buf, offset=0)
+        self._flat = np.ndarray((sum(self._sizes), ), dtype=np.float32, buffer=self._shm.buf, offset=8)
+        if self._owner:
+            self._version[0] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def version(self) -> int:
+        return int(self._version[0])
+
+    def publish(self, weights: list) -> int:
+        """
+        writes new weights and increments the version
+
+        :param weights: list of numpy arrays with the shapes given at construction
+        :return: the new version
+        """
+        with self._lock:
+            if len(weights) > 0:
+                self._flat[:] = np.concatenate([np.asarray(weight, dtype=np.float32).ravel() for weight in weights])
+            self._version[0] += 1
+            return int(self._version[0])
+
+    def fetch(self, version: int = 0):
+        """
+        returns the weights if they are newer than the given version
+
+        :param version: version the caller already has
+        :return: None or tuple of version and list of numpy arrays
+        """
+        if self.version == version:
+            return None
+        with self._lock:
+            flat = self._flat.copy()
+            version = int(self._version[0])
+        weights = [part.reshape(shape) for part, shape in
+                   zip(np.split(flat, np.cumsum(self._sizes)[:-1]), self._shapes)]
+        return version, weights
+
+    def close(self):
+        self._version = None
+        self._flat = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __getstate__(self):
+        return {"shapes": self._shapes, "lock": self._lock, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+def _run_actor(agent_factory: FunctionType, buffer: SharedReplayBuffer, weights: SharedWeights, env_kwargs: dict,
+               refresh_steps: int, seed: int, stop_event, env_steps):
+    """
+    actor process: steps a VectorCubeEnv with the policy of its own agent, writes all transitions into the shared
+    buffer and refreshes the policy weights from the learner every refresh_steps steps
+    """
+    np.random.seed(seed)
+    agent = agent_factory()
+    env = VectorCubeEnv(seed=seed, **env_kwargs)
+    version = 0
+    step = 0
+    try:
+        while not stop_event.is_set():
+            if step % refresh_steps == 0:
+                fetched = weights.fetch(version)
+                if fetched is not None:
+                    version, new_weights = fetched
+                    agent.set_weights(new_weights)
+            states = env.states
+            actions = agent.get_actions(states)
+            next_states, rewards, done = env.step(actions)
+            buffer.add_batch(states, actions, rewards, next_states, done)
+            with env_steps.get_lock():
+                env_steps.value += env.number_envs
+            step += 1
+    finally:
+        buffer.close()
+        weights.close()
+
+
+class DistributedTrainer:
+    """
+    Actor/learner training on one machine. Several actor processes step their own VectorCubeEnvs with a periodically
+    refreshed copy of the policy and write the transitions into a shared memory replay buffer. The learner, the agent
+    passed to run_training, trains concurrently on samples of that buffer in the calling process.
+    """
+    def __init__(self, agent_factory: FunctionType, number_actors: int = 4, number_envs: int = 256,
+                 buffer_size: int = 1000000, reward_function: dict = None, number_shuffles: int = 50,
+                 actions_reset_threshold: int = 1000, refresh_steps: int = 10, start_method: str = "spawn"):
+        """
+
+        :param agent_factory: picklable callable without arguments that creates the acting agent in each actor process
+        :param number_actors: number of actor processes
+        :param number_envs: number of cubes each actor steps in parallel
+        :param buffer_size: size of the shared replay buffer
+        :param reward_function: see TrainWrapper
+        :param number_shuffles: the number of turns to be executed to init a cube
+        :param actions_reset_threshold: the number of actions after which a cube will be randomly initialised again
+        :param refresh_steps: number of environment steps after which an actor checks for new policy weights
+        :param start_method: multiprocessing start method, spawn is the safe choice once tensorflow is imported
+        """
+        self.agent_factory = agent_factory
+        self.number_actors = number_actors
+        self.refresh_steps = refresh_steps
+        self.env_kwargs = {"number_envs": number_envs, "reward_function": reward_function,
+                           "number_shuffles": number_shuffles, "actions_reset_threshold": actions_reset_threshold}
+        self._context = multiprocessing.get_context(start_method)
+        self.buffer = SharedReplayBuffer(buffer_size, state_shape=(54, ), lock=self._context.Lock())
+        self.env_steps = self._context.Value("q", 0)
+        self.train_steps = 0
+
+    def run_training(self, agent: Agent, number_train_steps: int = 100000, min_buffer_size: int = 10000,
+                     freq_train_steps_load: int = 100, freq_train_steps_publish: int = 10,
+                     logging_frequency: int = 10, seed: int = 0) -> dict:
+        """
+        starts the actors and trains the agent on the shared buffer until number_train_steps train steps are done
+
+        :param agent: the learning agent, it needs train_network and will sample from the shared buffer
+        :param number_train_steps: number of train steps of the learner
+        :param min_buffer_size: number of transitions the actors have to collect before training starts
+        :param freq_train_steps_load: frequency in train steps in which the target network is updated
+        :param freq_train_steps_publish: frequency in train steps in which the weights are published to the actors
+        :param logging_frequency: the number of times the throughput is logged during training
+        :param seed: base seed of the actors
+        :return: dict with env steps, train steps and their rates
+        """
+        agent.exp_buffer = self.buffer
+        weights = SharedWeights([weight.shape for weight in agent.get_weights()], lock=self._context.Lock())
+        weights.publish(agent.get_weights())
+        stop_event = self._context.Event()
+        actors = [self._context.Process(target=_run_actor, daemon=True,
+                                        args=(self.agent_factory, self.buffer, weights, self.env_kwargs,
+                                              self.refresh_steps, seed + i, stop_event, self.env_steps))
+                  for i in range(self.number_actors)]
+        for actor in actors:
+            actor.start()
+
+        start = time.perf_counter()
+        try:
+            while len(self.buffer) < min_buffer_size:
+                if not any(actor.is_alive() for actor in actors):
+                    raise RuntimeError("All actors stopped before the buffer was filled")
+                time.sleep(0.01)
+            train_start = time.perf_counter()
+            for step in range(1, number_train_steps + 1):
+                agent.train_network()
+                self.train_steps += 1
+                if step % freq_train_steps_load == 0:
+                    agent.load_weigths_into_target_network()
+                if step % freq_train_steps_publish == 0:
+                    weights.publish(agent.get_weights())
+                if step % max(number_train_steps // logging_frequency, 1) == 0:
+                    elapsed = time.perf_counter() - start
+                    logging.info("Train step {}: {:.0f} env steps/s, {:.1f} train steps/s, buffer fill {}"
+                                 .format(step, self.env_steps.value / elapsed,
+                                         step / (time.perf_counter() - train_start), len(self.buffer)))
+        finally:
+            stop_event.set()
+            for actor in actors:
+                actor.join(timeout=10)
+                if actor.is_alive():
+                    actor.terminate()
+            weights.close()
+
+        elapsed = time.perf_counter() - start
+        return {"env_steps": self.env_steps.value, "train_steps": self.train_steps,
+                "env_steps_per_second": self.env_steps.value / elapsed,
+                "train_steps_per_second": self.train_steps / elapsed}
+
+    def close(self):
+        self.buffer.close()
@@ -0,0 +1,255 @@
+import asyncio
+import collections
+import json
+import logging
+import time
+from types import FunctionType
+
+import numpy as np
+
+from rubiksolver.batch_solve import parse_state
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, ActionSerializer
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ServerMetrics:
+    """
+    Request latencies and batch sizes of the last window requests and batches, plus running counters
+    """
+
+    def __init__(self, window: int = 10000):
+        """
+
+        :param window: number of latencies and batch sizes the percentiles are computed over
+        """
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.states = 0
+
+    def record_request(self, seconds: float, error: bool = False):
+        self.requests += 1
+        self.errors += error
+        self.latencies.append(seconds)
+
+    def record_batch(self, size: int):
+        self.batches += 1
+        self.states += size
+        self.batch_sizes.append(size)
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict with the counters, p50 and p99 latency in milliseconds and the batch size distribution
+        """
+        snapshot = {"requests": self.requests, "errors": self.errors, "batches": self.batches, "states": self.states}
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1e3
+            snapshot.update({"p50_ms": float(np.percentile(latencies, 50)),
+                             "p99_ms": float(np.percentile(latencies, 99)), "max_ms": float(latencies.max())})
+        if self.batch_sizes:
+            batch_sizes = np.array(self.batch_sizes)
+            snapshot.update({"mean_batch_size": float(batch_sizes.mean()), "max_batch_size": int(batch_sizes.max()),
+                             "p50_batch_size": float(np.percentile(batch_sizes, 50))})
+            # histogram over power of two buckets, the key is the upper bound of the bucket
+            buckets = 2 ** np.ceil(np.log2(batch_sizes)).astype(np.int64)
+            snapshot["batch_size_histogram"] = {str(bucket): int(count)
+                                                for bucket, count in zip(*np.unique(buckets, return_counts=True))}
+        return snapshot
+
+
+class MicroBatcher:
+    """
+    Gathers the states of concurrent requests into one batch for the q value function. A batch is evaluated as soon
+    as it holds max_batch_size states or max_wait seconds after its first state arrived. The q value function runs in
+    a worker thread, so the event loop keeps accepting requests during a forward pass.
+    """
+
+    def __init__(self, qvalues_function: FunctionType, max_batch_size: int = 256, max_wait: float = 0.005,
+                 metrics: ServerMetrics = None):
+        """
+
+        :param qvalues_function: maps a batch of states of shape (N, 54) to q values of shape (N, 12), e.g.
+            DQNAgent.qvalues
+        :param max_batch_size: maximum number of states per batch, a single larger request forms a batch of its own
+        :param max_wait: maximum seconds the first state of a batch waits for more states
+        :param metrics: records the batch sizes
+        """
+        self.qvalues_function = qvalues_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics if metrics is not None else ServerMetrics()
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def qvalues(self, states: np.ndarray) -> np.ndarray:
+        """
+        :param states: states of shape (N, 54), evaluated together with the states of other requests
+        :return: q values of shape (N, 12)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((np.asarray(states, dtype=np.uint8).reshape(-1, 54), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = batch[0][0].shape[0]
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else \
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                batch.append(item)
+                size += item[0].shape[0]
+
+            self.metrics.record_batch(size)
+            try:
+                qvalues = await loop.run_in_executor(
+                    None, self.qvalues_function, np.concatenate([states for states, _ in batch]))
+                qvalues = np.asarray(qvalues)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            start = 0
+            for states, future in batch:
+                if not future.done():
+                    future.set_result(qvalues[start:start + states.shape[0]])
+                start += states.shape[0]
+
+
+class PolicyServer:
+    """
+    Local HTTP server for the greedy policy of a q value function. Every endpoint takes and returns json:
+
+    POST /action with one of state, scramble or actions (see batch_solve.parse_state), or a list of such objects as
+    states, returns the greedy action and move
+    POST /solve with a state as above and optional max_steps, follows the greedy policy until the cube is solved and
+    returns the actions, each step of all concurrent solves is one micro batch
+    GET /metrics returns the ServerMetrics snapshot
+    """
+
+    def __init__(self, qvalues_function: FunctionType, host: str = "127.0.0.1", port: int = 0,
+                 max_batch_size: int = 256, max_wait: float = 0.005, max_solve_steps: int = 50):
+        """
+
+        :param qvalues_function: see MicroBatcher
+        :param host: interface to listen on, by default only local connections are accepted
+        :param port: port to listen on, 0 picks a free one, see the port attribute after start
+        :param max_batch_size: see MicroBatcher
+        :param max_wait: see MicroBatcher
+        :param max_solve_steps: upper limit of max_steps of /solve
+        """
+        self.host = host
+        self.port = port
+        self.max_solve_steps = max_solve_steps
+        self.metrics = ServerMetrics()
+        self.batcher = MicroBatcher(qvalues_function, max_batch_size, max_wait, self.metrics)
+        self._server = None
+
+    async def start(self):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info("Policy server listening on http://{}:{}".format(self.host, self.port))
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def action(self, body: dict) -> dict:
+        if "states" in body:
+            states = np.stack([parse_state(item) for item in body["states"]])
+            actions = np.argmax(await self.batcher.qvalues(states), axis=1).tolist()
+            return {"actions": actions, "moves": [ActionSerializer.format_moves([action]) for action in actions]}
+        action = int(np.argmax((await self.batcher.qvalues(parse_state(body)))[0]))
+        return {"action": action, "move": ActionSerializer.format_moves([action])}
+
+    async def solve(self, body: dict) -> dict:
+        state = parse_state(body)
+        max_steps = min(int(body.get("max_steps", self.max_solve_steps)), self.max_solve_steps)
+        actions = []
+        solved = np.array_equal(state, SOLVED_STATE)
+        while not solved and len(actions) < max_steps:
+            action = int(np.argmax((await self.batcher.qvalues(state))[0]))
+            state = state[MOVE_TABLE[action]]
+            actions.append(action)
+            solved = np.array_equal(state, SOLVED_STATE)
+        return {"solved": solved, "actions": actions, "moves": ActionSerializer.format_moves(actions),
+                "length": len(actions)}
+
+    async def _route(self, method: str, path: str, body: bytes) -> (int, dict):
+        routes = {"/action": ("POST", self.action), "/solve": ("POST", self.solve), "/metrics": ("GET", None)}
+        if path not in routes:
+            return 404, {"error": "unknown path {}".format(path)}
+        if method != routes[path][0]:
+            return 405, {"error": "use {} for {}".format(routes[path][0], path)}
+        if path == "/metrics":
+            return 200, self.metrics.snapshot()
+        try:
+            request = json.loads(body.decode() or "{}")
+            if not isinstance(request, dict):
+                raise ValueError("the body has to be a json object")
+            return 200, await routes[path][1](request)
+        except (ValueError, KeyError, TypeError, IndexError) as error:
+            return 400, {"error": "{}: {}".format(type(error).__name__, error)}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1")
+                if line in ("\r\n", "\n", ""):
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            start = time.perf_counter()
+            if len(request_line) < 2:
+                status, response = 400, {"error": "malformed request line"}
+            else:
+                try:
+                    status, response = await self._route(request_line[0], request_line[1].split("?")[0], body)
+                except Exception as error:
+                    logging.exception("Request failed")
+                    status, response = 500, {"error": "{}: {}".format(type(error).__name__, error)}
+            if request_line[1:2] != ["/metrics"]:
+                self.metrics.record_request(time.perf_counter() - start, error=status != 200)
+
+            payload = json.dumps(response).encode()
+            writer.write("HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+                         "Connection: close\r\n\r\n".format(status, _REASONS[status], len(payload)).encode()
+                         + payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,208 @@
+import bisect
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import time
+
+# upper bounds in seconds of the histogram buckets of the timers, the last bucket is unbounded
+TIMER_BUCKETS = [1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+
+    def __init__(self, metrics, name: str):
+        self._metrics = metrics
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._metrics.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics:
+    """
+    Per phase timers with histograms, counters and gauges for the training loop. Disabled metrics cost one attribute
+    check per instrumented spot: hot loops test enabled before they read the clock, and timer returns a shared no-op
+    context manager. Enabled metrics are exported every export_interval seconds as one json line and/or as a
+    Prometheus text file, both from step. Optionally a cProfile profiler runs around a range of iterations.
+    """
+
+    def __init__(self, enabled: bool = False, jsonl_path: str = None, prometheus_path: str = None,
+                 export_interval: float = 10.0, profile_path: str = None, profile_start: int = 0,
+                 profile_iterations: int = 0):
+        """
+
+        :param enabled: if False nothing is recorded
+        :param jsonl_path: file the snapshots are appended to as json lines
+        :param prometheus_path: file that is overwritten with the latest snapshot in the Prometheus text format
+        :param export_interval: seconds between two exports
+        :param profile_path: if given the iterations profile_start to profile_start + profile_iterations are profiled
+            and the stats are dumped to this path, readable with pstats
+        :param profile_start: first profiled iteration
+        :param profile_iterations: number of profiled iterations
+        """
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.export_interval = export_interval
+        self.profile_path = profile_path
+        self.profile_start = profile_start
+        self.profile_iterations = profile_iterations
+        self._profiler = None
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.gauges = {}
+        # name: [count, total seconds, bucket counts]
+        self.timers = {}
+        self._start = time.perf_counter()
+        self._next_export = time.monotonic() + self.export_interval
+
+    def add_time(self, name: str, seconds: float):
+        """
+        records one duration of the phase name
+        """
+        if not self.enabled:
+            return
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0, [0] * (len(TIMER_BUCKETS) + 1)]
+        timer[0] += 1
+        timer[1] += seconds
+        timer[2][bisect.bisect_left(TIMER_BUCKETS, seconds)] += 1
+
+    def timer(self, name: str):
+        """
+        :param name: name of the phase
+        :return: context manager that records the time spent inside of it
+        """
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def count(self, name: str, value: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def step(self, iteration: int):
+        """
+        called once per iteration of the training loop, exports when the interval is over and starts or stops the
+        profiler
+
+        :param iteration: number of the iteration
+        """
+        if self.profile_path is not None:
+            if iteration == self.profile_start:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            elif iteration == self.profile_start + self.profile_iterations and self._profiler is not None:
+                self._stop_profiler()
+        if self.enabled and time.monotonic() >= self._next_export:
+            self.export()
+
+    def _stop_profiler(self):
+        self._profiler.disable()
+        self._profiler.dump_stats(self.profile_path)
+        summary = io.StringIO()
+        pstats.Stats(self._profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        logging.info("Profile of {} iterations:\n{}".format(self.profile_iterations, summary.getvalue()))
+        self._profiler = None
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict with the elapsed seconds, counters, per second rates of the counters, gauges and per timer
+            count, total seconds, mean milliseconds, share of the elapsed time and approximate p50 and p99 in
+            milliseconds from the histogram
+        """
+        elapsed = time.perf_counter() - self._start
+        timers = {}
+        for name, (count, total, buckets) in self.timers.items():
+            timers[name] = {"count": count, "total_seconds": total, "mean_ms": total / count * 1e3,
+                            "share": total / elapsed, "p50_ms": _bucket_percentile(buckets, count, 0.5) * 1e3,
+                            "p99_ms": _bucket_percentile(buckets, count, 0.99) * 1e3}
+        return {"timestamp": time.time(), "elapsed_seconds": elapsed, "counters": dict(self.counters),
+                "rates": {name + "_per_second": value / elapsed for name, value in self.counters.items()},
+                "gauges": dict(self.gauges), "timers": timers}
+
+    def prometheus_text(self) -> str:
+        """
+        :return: the current metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for name, value in self.counters.items():
+            lines += ["# TYPE rubiksolver_{}_total counter".format(name), "rubiksolver_{}_total {}".format(name, value)]
+        for name, value in self.gauges.items():
+            lines += ["# TYPE rubiksolver_{} gauge".format(name), "rubiksolver_{} {}".format(name, value)]
+        if self.timers:
+            lines.append("# TYPE rubiksolver_phase_seconds histogram")
+        for name, (count, total, buckets) in self.timers.items():
+            cumulative = 0
+            for bound, bucket in zip(TIMER_BUCKETS + ["+Inf"], buckets):
+                cumulative += bucket
+                lines.append('rubiksolver_phase_seconds_bucket{{phase="{}",le="{}"}} {}'.format(name, bound,
+                                                                                              cumulative))
+            lines.append('rubiksolver_phase_seconds_sum{{phase="{}"}} {}'.format(name, total))
+            lines.append('rubiksolver_phase_seconds_count{{phase="{}"}} {}'.format(name, count))
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """
+        writes the current snapshot to the configured files
+        """
+        self._next_export = time.monotonic() + self.export_interval
+        if self.jsonl_path is not None:
+            with open(self.jsonl_path, "a") as file:
+                file.write(json.dumps(self.snapshot()) + "\n")
+        if self.prometheus_path is not None:
+            # written next to the target and renamed, so a scraper never reads a partial file
+            with open(self.prometheus_path + ".tmp", "w") as file:
+                file.write(self.prometheus_text())
+            os.replace(self.prometheus_path + ".tmp", self.prometheus_path)
+
+    def close(self):
+        """
+        stops a running profiler and writes a final export
+        """
+        if self._profiler is not None:
+            self._stop_profiler()
+        if self.enabled:
+            self.export()
+
+
+def _bucket_percentile(buckets: list, count: int, quantile: float) -> float:
+    # upper bound of the bucket holding the quantile, the unbounded bucket reports the largest bound
+    rank = quantile * count
+    cumulative = 0
+    for bound, bucket in zip(TIMER_BUCKETS, buckets):
+        cumulative += bucket
+        if cumulative >= rank:
+            return bound
+    return TIMER_BUCKETS[-1]
+
+
+# shared disabled instance, the default of every instrumented class
+NULL_METRICS = Metrics(enabled=False)
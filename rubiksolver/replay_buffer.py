@@ -1,23 +1,48 @@
 import numpy as np
-import random
+
+from rubiksolver.segment_tree import MinTree, SumTree
 
 
 class ReplayBuffer:
 
-    def __init__(self, size: int = 10000):
+    def __init__(self, size: int = 10000, state_shape: tuple = None, state_dtype=np.uint8):
         """Create Replay buffer.
         Parameters
         ----------
         size: int
             Max number of transitions to store in the buffer. When the buffer
             overflows the old memories are dropped.
+        state_shape: tuple
+            Shape of a single state. If None the shape is taken from the first
+            added state and the storage is allocated then.
+        state_dtype:
+            dtype in which the states are stored, uint8 keeps sticker states compact
         """
-        self._storage = []
-        self._maxsize = size
+        self._maxsize = int(size)
+        self._state_dtype = state_dtype
         self._next_idx = 0
+        self._size = 0
+        self._obs_t = None
+        self._obs_tp1 = None
+        self._actions = np.zeros(self._maxsize, dtype=np.int8)
+        self._rewards = np.zeros(self._maxsize, dtype=np.float32)
+        self._dones = np.zeros(self._maxsize, dtype=bool)
+        if state_shape is not None:
+            self._allocate_states(tuple(state_shape))
 
     def __len__(self):
-        return len(self._storage)
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """
+        max number of transitions in the buffer
+        """
+        return self._maxsize
+
+    def _allocate_states(self, state_shape: tuple):
+        self._obs_t = np.zeros((self._maxsize, ) + state_shape, dtype=self._state_dtype)
+        self._obs_tp1 = np.zeros((self._maxsize, ) + state_shape, dtype=self._state_dtype)
 
     def add(self, obs_t, action, reward, obs_tp1, done):
         """
@@ -31,25 +56,54 @@ class ReplayBuffer:
         :param done:
         :return:
         """
-        data = (obs_t, action, reward, obs_tp1, done)
+        obs_t = np.asarray(obs_t)
+        if self._obs_t is None:
+            self._allocate_states(obs_t.shape)
+        idx = self._next_idx
+        self._obs_t[idx] = obs_t
+        self._actions[idx] = action
+        self._rewards[idx] = reward
+        self._obs_tp1[idx] = obs_tp1
+        self._dones[idx] = done
 
-        if self._next_idx >= len(self._storage):
-            self._storage.append(data)
-        else:
-            self._storage[self._next_idx] = data
         self._next_idx = (self._next_idx + 1) % self._maxsize
+        self._size = min(self._size + 1, self._maxsize)
+        return idx
+
+    def add_batch(self, obs_t, actions, rewards, obs_tp1, dones):
+        """
+        adds a batch of observations, e.g. one step of a VectorCubeEnv, to the ReplayBuffer
+
+        :param obs_t: states of shape (N, ...)
+        :param actions: actions of shape (N, )
+        :param rewards: rewards of shape (N, )
+        :param obs_tp1: next states of shape (N, ...)
+        :param dones: done flags of shape (N, )
+        :return: the indices the observations were written to
+        """
+        obs_t = np.asarray(obs_t)
+        if self._obs_t is None:
+            self._allocate_states(obs_t.shape[1:])
+        number = obs_t.shape[0]
+        if number > self._maxsize:
+            # only the newest observations would survive anyway
+            obs_t, actions, rewards = obs_t[-self._maxsize:], actions[-self._maxsize:], rewards[-self._maxsize:]
+            obs_tp1, dones = obs_tp1[-self._maxsize:], dones[-self._maxsize:]
+            number = self._maxsize
+        idxes = (self._next_idx + np.arange(number)) % self._maxsize
+        self._obs_t[idxes] = obs_t
+        self._actions[idxes] = actions
+        self._rewards[idxes] = rewards
+        self._obs_tp1[idxes] = obs_tp1
+        self._dones[idxes] = dones
+
+        self._next_idx = (self._next_idx + number) % self._maxsize
+        self._size = min(self._size + number, self._maxsize)
+        return idxes
 
     def _encode_sample(self, idxes):
-        obses_t, actions, rewards, obses_tp1, dones = [], [], [], [], []
-        for i in idxes:
-            data = self._storage[i]
-            obs_t, action, reward, obs_tp1, done = data
-            obses_t.append(np.array(obs_t, copy=False))
-            actions.append(np.array(action, copy=False))
-            rewards.append(reward)
-            obses_tp1.append(np.array(obs_tp1, copy=False))
-            dones.append(done)
-        return np.array(obses_t), np.array(actions), np.array(rewards), np.array(obses_tp1), np.array(dones)
+        return self._obs_t[idxes], self._actions[idxes], self._rewards[idxes], self._obs_tp1[idxes], \
+            self._dones[idxes]
 
     def sample(self, batch_size):
         """Sample a batch of experiences.
@@ -67,5 +121,111 @@ class ReplayBuffer:
             done_mask[i] = 1 if executing act_batch[i] resulted in
             the end of an episode and 0 otherwise.
         """
-        idxes = [random.randint(0, len(self._storage) - 1) for _ in range(batch_size)]
+        idxes = np.random.randint(0, self._size, size=batch_size)
         return self._encode_sample(idxes)
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+
+    def __init__(self, size: int = 10000, alpha: float = 0.6, state_shape: tuple = None, state_dtype=np.uint8):
+        """Create Prioritized Replay buffer.
+        Parameters
+        ----------
+        size: int
+            Max number of transitions to store in the buffer. When the buffer
+            overflows the old memories are dropped.
+        alpha: float
+            how much prioritization is used (0 - no prioritization, 1 - full prioritization)
+        state_shape: tuple
+            Shape of a single state, see ReplayBuffer
+        state_dtype:
+            dtype in which the states are stored
+        """
+        super().__init__(size, state_shape=state_shape, state_dtype=state_dtype)
+        assert alpha >= 0
+        self._alpha = alpha
+        self._it_sum = SumTree(self._maxsize)
+        self._it_min = MinTree(self._maxsize)
+        self._max_priority = 1.0
+
+    def add(self, *args, **kwargs):
+        """
+        adds a observation with the highest priority seen so far, see ReplayBuffer.add
+        """
+        idx = super().add(*args, **kwargs)
+        self._it_sum[idx] = self._max_priority ** self._alpha
+        self._it_min[idx] = self._max_priority ** self._alpha
+        return idx
+
+    def add_batch(self, *args, **kwargs):
+        """
+        adds a batch of observations with the highest priority seen so far, see ReplayBuffer.add_batch
+        """
+        idxes = super().add_batch(*args, **kwargs)
+        self._it_sum[idxes] = self._max_priority ** self._alpha
+        self._it_min[idxes] = self._max_priority ** self._alpha
+        return idxes
+
+    def _sample_proportional(self, batch_size):
+        # stratified sampling: one prefix sum out of each of batch_size equally sized segments of the total priority
+        segment = self._it_sum.sum() / batch_size
+        mass = (np.arange(batch_size) + np.random.random_sample(batch_size)) * segment
+        idxes = self._it_sum.find_prefixsum_idx(mass)
+        # floating point errors can point behind the last stored transition
+        return np.minimum(idxes, self._size - 1)
+
+    def sample(self, batch_size, beta: float = 0.4):
+        """Sample a batch of experiences.
+        compared to ReplayBuffer.sample it also returns importance weights and idxes of sampled experiences.
+
+        :param batch_size: How many transitions to sample.
+        :param beta: To what degree to use importance weights (0 - no corrections, 1 - full correction)
+
+        obs_batch: np.array
+            batch of observations
+        act_batch: np.array
+            batch of actions executed given obs_batch
+        rew_batch: np.array
+            rewards received as results of executing act_batch
+        next_obs_batch: np.array
+            next set of observations seen after executing act_batch
+        done_mask: np.array
+            done_mask[i] = 1 if executing act_batch[i] resulted in
+            the end of an episode and 0 otherwise.
+        weights: np.array
+            Array of shape (batch_size,) and dtype np.float32
+            denoting importance weight of each sampled transition
+        idxes: np.array
+            Array of shape (batch_size,) and dtype np.int64
+            idexes in buffer of sampled experiences
+        """
+        assert beta > 0
+
+        idxes = self._sample_proportional(batch_size)
+        total = self._it_sum.sum()
+        p_min = self._it_min.min() / total
+        max_weight = (p_min * self._size) ** (-beta)
+        p_sample = self._it_sum[idxes] / total
+        weights = ((p_sample * self._size) ** (-beta) / max_weight).astype(np.float32)
+        return self._encode_sample(idxes) + (weights, idxes)
+
+    def update_priorities(self, idxes, priorities):
+        """Update priorities of sampled transitions.
+        sets priority of transition at index idxes[i] in buffer
+        to priorities[i].
+
+        :param idxes: [int]
+            List of idxes of sampled transitions
+        :param priorities: [float]
+            List of updated priorities corresponding to
+            transitions at the sampled idxes denoted by
+            variable `idxes`.
+        """
+        idxes = np.asarray(idxes)
+        priorities = np.asarray(priorities, dtype=np.float64)
+        assert idxes.shape == priorities.shape
+        assert np.all(priorities > 0)
+        assert np.all((idxes >= 0) & (idxes < self._size))
+        self._it_sum[idxes] = priorities ** self._alpha
+        self._it_min[idxes] = priorities ** self._alpha
+        self._max_priority = max(self._max_priority, float(priorities.max()))
@@ -0,0 +1,169 @@
+import os
+
+import numpy as np
+
+from rubiksolver.cube import ALLOWED_ACTIONS, MOVE_TABLE, NO_ACTION, SOLVED_STATE, cubies_to_state
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "scrambles")
+# pairs (i, j) with i < j of 8 and 12 elements, for counting inversions
+_CORNER_PAIRS = np.triu_indices(8, 1)
+_EDGE_PAIRS = np.triu_indices(12, 1)
+
+
+def _random_permutations(random: np.random.Generator, number: int, n: int) -> np.ndarray:
+    return np.argsort(random.random((number, n)), axis=1)
+
+
+def _random_orientations(random: np.random.Generator, number: int, n: int, base: int) -> np.ndarray:
+    # the last orientation makes the sum divisible by base, the others are free
+    orientations = random.integers(0, base, size=(number, n))
+    orientations[:, -1] = (-orientations[:, :-1].sum(axis=1)) % base
+    return orientations
+
+
+def _parities(permutations: np.ndarray, pairs: tuple) -> np.ndarray:
+    return np.count_nonzero(permutations[:, pairs[0]] > permutations[:, pairs[1]], axis=1) % 2
+
+
+def random_states(number: int, seed=None) -> np.ndarray:
+    """
+    uniformly distributed random states of the cube group, built directly from random corner and edge permutations
+    and orientations. The corner twist and edge flip constraints fix the last orientations, the permutation parity
+    constraint is met by swapping the last two edges of states whose edge parity differs from the corner parity. The
+    swap maps the odd edge permutations one to one onto the even ones, so the result stays uniform
+
+    :param number: number of states
+    :param seed: seed or numpy Generator
+    :return: uint8 states of shape (N, 54)
+    """
+    random = np.random.default_rng(seed)
+    cp = _random_permutations(random, number, 8)
+    ep = _random_permutations(random, number, 12)
+    odd = _parities(cp, _CORNER_PAIRS) != _parities(ep, _EDGE_PAIRS)
+    ep[odd, 10], ep[odd, 11] = ep[odd, 11], ep[odd, 10]
+    return cubies_to_state(cp, _random_orientations(random, number, 8, 3), ep,
+                           _random_orientations(random, number, 12, 2))
+
+
+def scramble_actions(number: int, depth: int, seed=None) -> np.ndarray:
+    """
+    random action sequences without moves that cancel or merge with the previous ones: every action is drawn
+    uniformly from the actions ALLOWED_ACTIONS permits after the last two
+
+    :param number: number of sequences
+    :param depth: length of each sequence
+    :param seed: seed or numpy Generator
+    :return: int64 actions of shape (N, depth)
+    """
+    random = np.random.default_rng(seed)
+    actions = np.empty((number, depth), dtype=np.int64)
+    last = np.full(number, NO_ACTION)
+    before_last = np.full(number, NO_ACTION)
+    for step in range(depth):
+        # the argmax of uniform noise on the allowed actions is a uniform choice among them
+        actions[:, step] = np.argmax(random.random((number, 12)) * ALLOWED_ACTIONS[last, before_last], axis=1)
+        last, before_last = actions[:, step], last
+    return actions
+
+
+def random_scrambles(number: int, depth: int, seed=None) -> (np.ndarray, np.ndarray):
+    """
+    scrambles solved cubes with scramble_actions
+
+    :param number: number of states
+    :param depth: number of actions per state
+    :param seed: seed or numpy Generator
+    :return: uint8 states of shape (N, 54) and the actions of shape (N, depth) that lead to them
+    """
+    actions = scramble_actions(number, depth, seed)
+    states = np.tile(SOLVED_STATE, (number, 1))
+    for step in range(depth):
+        states = np.take_along_axis(states, MOVE_TABLE[actions[:, step]], axis=1)
+    return states, actions
+
+
+def pool_path(number: int, depth: int = None, directory: str = DATA_DIRECTORY) -> str:
+    """
+    :param number: number of states of the pool
+    :param depth: scramble depth, None for uniformly random states
+    :param directory:
+    :return: path of the pool file
+    """
+    name = "uniform" if depth is None else "depth_{}".format(depth)
+    return os.path.join(directory, "{}_{}.npy".format(name, number))
+
+
+class ScramblePool:
+    """
+    Pre-generated scrambled states, so resets are a lookup instead of a scramble. A pool is stored as .npy file of
+    uint8 states and memory mapped when loaded, so processes that share a pool share its pages.
+    """
+
+    def __init__(self, states: np.ndarray, seed: int = None):
+        """
+
+        :param states: uint8 states of shape (N, 54)
+        :param seed: seed for drawing states from the pool
+        """
+        self.states = states
+        self._random = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.states.shape[0]
+
+    @classmethod
+    def generate(cls, number: int, depth: int = None, seed: int = None, chunk_size: int = 100000):
+        """
+        :param number: number of states
+        :param depth: scramble depth, see random_scrambles, None for uniformly random states, see random_states
+        :param seed: seed for the generation and for drawing states
+        :param chunk_size: number of states generated per call
+        :return: pool
+        """
+        random = np.random.default_rng(seed)
+        states = np.empty((number, 54), dtype=np.uint8)
+        for start in range(0, number, chunk_size):
+            count = min(chunk_size, number - start)
+            states[start:start + count] = random_states(count, random) if depth is None else \
+                random_scrambles(count, depth, random)[0]
+        return cls(states, random)
+
+    @classmethod
+    def cached(cls, number: int, depth: int = None, seed: int = None, directory: str = DATA_DIRECTORY):
+        """
+        loads the pool from directory, it is generated and saved first if it does not exist
+
+        :param number: number of states
+        :param depth: scramble depth, None for uniformly random states
+        :param seed: seed for the generation and for drawing states
+        :param directory: directory of the pool files
+        :return: pool
+        """
+        path = pool_path(number, depth, directory)
+        if not os.path.isfile(path):
+            cls.generate(number, depth, seed).save(path)
+        return cls.load(path, seed)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # written next to the target and renamed, so a concurrent load never reads a partial pool
+        temporary = path + ".tmp.npy"
+        np.save(temporary, np.asarray(self.states, dtype=np.uint8))
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, seed: int = None):
+        return cls(np.load(path, mmap_mode="r"), seed)
+
+    def sample(self, number: int) -> np.ndarray:
+        """
+        :param number:
+        :return: copies of number states drawn uniformly with replacement, uint8 of shape (number, 54)
+        """
+        return np.asarray(self.states[np.sort(self._random.integers(0, len(self), size=number))])
+
+    def next(self) -> np.ndarray:
+        """
+        :return: copy of one random state of the pool, uint8 of shape (54, )
+        """
+        return np.array(self.states[self._random.integers(0, len(self))])
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class SegmentTree:
+    """
+    Array backed binary segment tree. The leaves are stored at positions capacity to 2 * capacity - 1, the root at
+    position 1, so the children of node i are 2 * i and 2 * i + 1. Updates and queries are vectorized over batches
+    of indices and touch O(log n) nodes per index.
+    """
+
+    def __init__(self, capacity: int, operation, neutral_element: float):
+        """
+
+        :param capacity: number of leaves, will be rounded up to the next power of two
+        :param operation: numpy ufunc that combines two children, e.g. np.add or np.minimum
+        :param neutral_element: neutral element of the operation, e.g. 0 for add and inf for minimum
+        """
+        self._capacity = 1
+        while self._capacity < capacity:
+            self._capacity *= 2
+        self._operation = operation
+        self._neutral_element = neutral_element
+        self._value = np.full(2 * self._capacity, neutral_element, dtype=np.float64)
+
+    def __len__(self):
+        return self._capacity
+
+    def __getitem__(self, idxes):
+        return self._value[np.asarray(idxes) + self._capacity]
+
+    def __setitem__(self, idxes, values):
+        leaves = np.atleast_1d(np.asarray(idxes, dtype=np.int64)) + self._capacity
+        self._value[leaves] = values
+        nodes = np.unique(leaves // 2)
+        while nodes[0] >= 1:
+            self._value[nodes] = self._operation(self._value[2 * nodes], self._value[2 * nodes + 1])
+            nodes = np.unique(nodes // 2)
+
+    def reduce(self) -> float:
+        """
+        reduces all leaves with the operation
+
+        :return: the value of the root
+        """
+        return self._value[1]
+
+
+class SumTree(SegmentTree):
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.add, 0.0)
+
+    def sum(self) -> float:
+        return self.reduce()
+
+    def find_prefixsum_idx(self, prefixsums: np.ndarray) -> np.ndarray:
+        """
+        finds for each prefix sum the highest index i, so that the sum of the leaves 0 to i - 1 is smaller or equal
+        to the prefix sum. All prefix sums descend the tree level by level together.
+
+        :param prefixsums: array of prefix sums between 0 and self.sum()
+        :return: array of leaf indices
+        """
+        prefixsums = np.array(prefixsums, dtype=np.float64)
+        idxes = np.ones(prefixsums.shape[0], dtype=np.int64)
+        while idxes[0] < self._capacity:
+            left = 2 * idxes
+            left_values = self._value[left]
+            go_right = prefixsums > left_values
+            prefixsums -= left_values * go_right
+            idxes = left + go_right
+        return idxes - self._capacity
+
+
+class MinTree(SegmentTree):
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity, np.minimum, float("inf"))
+
+    def min(self) -> float:
+        return self.reduce()
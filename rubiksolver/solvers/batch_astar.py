@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import logging
+import time
+from types import FunctionType
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, state_keys
+
+
+class BatchWeightedAStar:
+    """
+    Batch weighted A* as in DeepCubeA: every iteration pops the batch_size nodes with the lowest
+    weight * path cost + cost to go from the open list, generates all their children and evaluates the cost to go of
+    the new children with one call of the heuristic, e.g. one forward pass of a network. Visited states are kept in a
+    closed set keyed by their compact state keys. With weight < 1 the search is greedier, it finds longer solutions
+    with fewer expansions. The heuristic does not need to be admissible.
+    """
+
+    def __init__(self, heuristic: FunctionType, batch_size: int = 1000, weight: float = 0.6):
+        """
+
+        :param heuristic: function that maps a batch of sticker states of shape (N, 54) to estimated numbers of actions
+            to solve them of shape (N, ), e.g. DQNAgent.cost_to_go or a PatternDatabaseHeuristic
+        :param batch_size: number of nodes that are expanded per iteration
+        :param weight: weight of the path cost in the priority
+        """
+        self.heuristic = heuristic
+        self.batch_size = batch_size
+        self.weight = weight
+        self.stats = {}
+
+    def solve(self, state: np.ndarray, max_time: float = None, max_nodes: int = None) -> list:
+        """
+        searches a solution of the state
+
+        :param state: sticker state of shape (54, ) or (6, 3, 3)
+        :param max_time: maximum number of seconds to search, None for no limit
+        :param max_nodes: maximum number of generated nodes, None for no limit
+        :return: list of actions that solve the state or None if no solution was found within the limits. Expanded
+            and generated nodes and the nodes per second are stored in stats
+        """
+        start = time.perf_counter()
+        state = np.asarray(state, dtype=np.uint8).reshape(54)
+        root = tuple(state_keys(state[None])[0].tolist())
+        # closed set: key -> path cost, parent key, action from the parent
+        closed = {root: (0, None, None)}
+        counter = itertools.count()
+        open_list = [(0.0, next(counter), 0, root, state)]
+        self.stats = {"expanded": 0, "generated": 0, "iterations": 0}
+        solution = None if root != (0, 0) else []
+
+        while solution is None and open_list:
+            if max_time is not None and time.perf_counter() - start > max_time:
+                break
+            if max_nodes is not None and self.stats["generated"] >= max_nodes:
+                break
+            nodes = []
+            while open_list and len(nodes) < self.batch_size:
+                _, _, cost, key, node_state = heapq.heappop(open_list)
+                # skip entries that were reached with a lower path cost after they were pushed
+                if closed[key][0] == cost:
+                    nodes.append((cost, key, node_state))
+            if not nodes:
+                break
+            self.stats["iterations"] += 1
+            self.stats["expanded"] += len(nodes)
+
+            states = np.stack([node_state for _, _, node_state in nodes])
+            children = states[:, MOVE_TABLE].reshape(-1, 54)
+            self.stats["generated"] += children.shape[0]
+            children_keys = state_keys(children)
+            children_costs = np.repeat(np.array([cost for cost, _, _ in nodes]) + 1, 12)
+            # the first occurrence of a state in the batch with the lowest path cost
+            order = np.argsort(children_costs, kind="stable")
+            _, first = np.unique(children_keys[order], axis=0, return_index=True)
+            unique = order[first]
+
+            new = []
+            for i, corner_key, edge_key, cost in zip(unique.tolist(), children_keys[unique, 0].tolist(),
+                                                     children_keys[unique, 1].tolist(),
+                                                     children_costs[unique].tolist()):
+                child_key = (corner_key, edge_key)
+                previous = closed.get(child_key)
+                if previous is None or previous[0] > cost:
+                    closed[child_key] = (cost, nodes[i // 12][1], i % 12)
+                    new.append(i)
+            if (0, 0) in closed:
+                solution = self._path(closed, (0, 0))
+            elif new:
+                new = np.array(new)
+                priorities = self.weight * children_costs[new] + \
+                    np.asarray(self.heuristic(children[new]), dtype=np.float64).reshape(-1)
+                for i, priority, cost, corner_key, edge_key in zip(new.tolist(), priorities.tolist(),
+                                                                   children_costs[new].tolist(),
+                                                                   children_keys[new, 0].tolist(),
+                                                                   children_keys[new, 1].tolist()):
+                    heapq.heappush(open_list, (priority, next(counter), cost, (corner_key, edge_key), children[i]))
+
+        seconds = time.perf_counter() - start
+        self.stats.update({"seconds": seconds, "closed": len(closed),
+                           "nodes_per_second": self.stats["generated"] / max(seconds, 1e-9)})
+        logging.debug("Batch weighted A*: {}".format(self.stats))
+        return solution
+
+    @staticmethod
+    def _path(closed: dict, key: tuple) -> list:
+        actions = []
+        while closed[key][1] is not None:
+            _, key, action = closed[key]
+            actions.append(action)
+        return actions[::-1]
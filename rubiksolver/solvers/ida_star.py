@@ -0,0 +1,101 @@
+import logging
+import time
+
+import numpy as np
+
+from rubiksolver.cube import ALLOWED_ACTIONS, NO_ACTION as _NO_ACTION
+from rubiksolver.solvers.pattern_database import CUBIE_CODE_MOVES, PatternDatabaseHeuristic, cubie_codes
+
+SOLVED_CODES = np.concatenate([np.arange(8) * 3, np.arange(12) * 2])
+
+
+class IDAStarSolver:
+    """
+    Optimal solver: iterative deepening A* over the quarter turn actions with an admissible pattern database
+    heuristic. The cube is represented by the slots and orientations of its cubies (cubie_codes) and moved with
+    permutation tables. The depth first search expands a batch of nodes of the same depth at once, so the moves,
+    the move pruning and the heuristic lookups are vectorized over batch_size * 12 children.
+    """
+
+    def __init__(self, heuristic: PatternDatabaseHeuristic = None, batch_size: int = 4096, max_depth: int = 26):
+        """
+
+        :param heuristic: admissible heuristic, by default the pattern databases in data/pdb
+        :param batch_size: number of nodes that are expanded at once
+        :param max_depth: the search stops if the cost bound exceeds max_depth
+        """
+        self.heuristic = heuristic if heuristic is not None else PatternDatabaseHeuristic.from_directory()
+        self.batch_size = batch_size
+        self.max_depth = max_depth
+        self.stats = {}
+
+    def solve(self, state: np.ndarray, max_time: float = None) -> list:
+        """
+        searches an optimal solution of the state
+
+        :param state: sticker state of shape (54, ) or (6, 3, 3)
+        :param max_time: maximum number of seconds to search, None for no limit
+        :return: list of actions that solve the state or None if no solution was found within max_depth or max_time.
+            The number of expanded nodes and the nodes per second are stored in stats.
+        """
+        start = time.perf_counter()
+        deadline = start + max_time if max_time is not None else None
+        codes = cubie_codes(np.asarray(state).reshape(1, 54))
+        self.stats = {"nodes": 0, "bound": 0}
+        solution = None
+        if np.array_equal(codes[0], SOLVED_CODES):
+            solution = []
+        else:
+            # every quarter turn is a 4 cycle of corners, so the parity of the corner permutation is the parity of
+            # the length of every solution
+            parity = int(np.sum(np.tril(codes[0, :8, None] < codes[0, None, :8], k=-1))) % 2
+            bound = int(self.heuristic.from_codes(codes)[0])
+            while bound <= self.max_depth:
+                bound += (bound - parity) % 2
+                self.stats["bound"] = bound
+                solution, bound = self._search(codes, bound, deadline)
+                logging.info("Bound {}: {} nodes, {:.0f} nodes/s".format(
+                    self.stats["bound"], self.stats["nodes"], self.stats["nodes"] / (time.perf_counter() - start)))
+                if solution is not None or bound is None:
+                    break
+        self.stats["seconds"] = time.perf_counter() - start
+        self.stats["nodes_per_second"] = self.stats["nodes"] / max(self.stats["seconds"], 1e-9)
+        return solution
+
+    def _search(self, root: np.ndarray, bound: int, deadline: float) -> (list, int):
+        """
+        depth first search of all paths whose cost plus heuristic does not exceed the bound
+
+        :return: the solution or None and the next bound, which is None if the deadline passed
+        """
+        next_bound = np.inf
+        # chunks of nodes of the same depth, the depth is the length of the paths
+        stack = [(root, np.empty((1, 0), dtype=np.int8))]
+        while stack:
+            codes, paths = stack.pop()
+            if codes.shape[0] > self.batch_size:
+                stack.append((codes[self.batch_size:], paths[self.batch_size:]))
+                codes, paths = codes[:self.batch_size], paths[:self.batch_size]
+            depth = paths.shape[1]
+            last = paths[:, -1] if depth > 0 else np.full(codes.shape[0], _NO_ACTION)
+            before_last = paths[:, -2] if depth > 1 else np.full(codes.shape[0], _NO_ACTION)
+            parents, actions = np.nonzero(ALLOWED_ACTIONS[last, before_last])
+            children = np.concatenate([CUBIE_CODE_MOVES["corners"][actions[:, None], codes[parents, :8]],
+                                       CUBIE_CODE_MOVES["edges"][actions[:, None], codes[parents, 8:]]], axis=1)
+            self.stats["nodes"] += children.shape[0]
+
+            costs = depth + 1 + self.heuristic.from_codes(children).astype(np.int64)
+            exceeded = costs > bound
+            if exceeded.any():
+                next_bound = min(next_bound, int(costs[exceeded].min()))
+            children, parents, actions = children[~exceeded], parents[~exceeded], actions[~exceeded]
+            child_paths = np.concatenate([paths[parents], actions[:, None].astype(np.int8)], axis=1)
+            solved = np.all(children == SOLVED_CODES, axis=1)
+            if solved.any():
+                return child_paths[np.argmax(solved)].tolist(), bound
+            # at depth + 1 == bound only solved children are left
+            if depth + 1 < bound and children.shape[0] > 0:
+                stack.append((children, child_paths))
+            if deadline is not None and time.perf_counter() > deadline:
+                return None, None
+        return None, next_bound if next_bound < np.inf else None
@@ -0,0 +1,360 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from rubiksolver.cube import CORNER_MOVE_ORIENTATION, CORNER_MOVE_PERMUTATION, EDGE_MOVE_ORIENTATION, \
+    EDGE_MOVE_PERMUTATION, state_to_cubies
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                              "pdb")
+# corners and two disjoint edge subsets of six edges, the heuristic is the maximum of their distances
+DEFAULT_DATABASES = [("corners", tuple(range(8))), ("edges", tuple(range(6))), ("edges", tuple(range(6, 12)))]
+# number of slots and orientations of the cubie kinds
+CUBIE_KINDS = {"corners": (8, 3), "edges": (12, 2)}
+_MAGIC = b"RBKPDB01"
+_UNKNOWN = 255
+
+
+def _compile_cubie_code_moves(kind: str) -> np.ndarray:
+    """
+    a tracked cubie is encoded as slot * number_orientations + orientation. This table gives the code of the cubie
+    after each action: the cubie in slot p moves to the slot q with move_permutation[q] == p and gets the orientation
+    change of q
+
+    :param kind: corners or edges
+    :return: int64 table of shape (12, number_slots * number_orientations)
+    """
+    number_slots, number_orientations = CUBIE_KINDS[kind]
+    if kind == "corners":
+        move_permutation, move_orientation = CORNER_MOVE_PERMUTATION, CORNER_MOVE_ORIENTATION
+    else:
+        move_permutation, move_orientation = EDGE_MOVE_PERMUTATION, EDGE_MOVE_ORIENTATION
+    table = np.empty((12, number_slots * number_orientations), dtype=np.int64)
+    for action in range(12):
+        target = np.argsort(move_permutation[action])
+        for slot in range(number_slots):
+            new_slot = target[slot]
+            for orientation in range(number_orientations):
+                new_orientation = (orientation + move_orientation[action, new_slot]) % number_orientations
+                table[action, slot * number_orientations + orientation] = \
+                    new_slot * number_orientations + new_orientation
+    return table
+
+
+CUBIE_CODE_MOVES = {kind: _compile_cubie_code_moves(kind) for kind in CUBIE_KINDS}
+
+
+def _partial_permutation_counts(n: int, k: int) -> np.ndarray:
+    # number of arrangements of the remaining k - 1 - i cubies on the remaining n - 1 - i slots
+    counts = np.ones(k, dtype=np.int64)
+    for i in range(k):
+        for j in range(k - 1 - i):
+            counts[i] *= n - 1 - i - j
+    return counts
+
+
+def partial_permutation_rank(slots: np.ndarray, n: int) -> np.ndarray:
+    """
+    rank of the slots of k distinct cubies out of n slots
+
+    :param slots: int array of shape (N, k) with distinct entries between 0 and n - 1
+    :param n: number of slots
+    :return: int64 ranks between 0 and n! / (n - k)! - 1
+    """
+    k = slots.shape[1]
+    smaller_before = np.tril(slots[:, None, :] < slots[:, :, None], k=-1).sum(axis=2)
+    return (slots - smaller_before) @ _partial_permutation_counts(n, k)
+
+
+def partial_permutation_unrank(ranks: np.ndarray, n: int, k: int) -> np.ndarray:
+    """
+    inverse of partial_permutation_rank
+
+    :return: int64 slots of shape (N, k)
+    """
+    ranks = np.asarray(ranks, dtype=np.int64).copy()
+    counts = _partial_permutation_counts(n, k)
+    available = np.tile(np.arange(n), (ranks.shape[0], 1))
+    rows = np.arange(ranks.shape[0])
+    slots = np.empty((ranks.shape[0], k), dtype=np.int64)
+    for i in range(k):
+        digit, ranks = np.divmod(ranks, counts[i])
+        slots[:, i] = available[rows, digit]
+        keep = np.arange(n - i - 1)[None, :] < digit[:, None]
+        available = np.where(keep, available[:, :-1], available[:, 1:])
+    return slots
+
+
+def cubie_codes(states: np.ndarray) -> np.ndarray:
+    """
+    slot * number_orientations + orientation of every cubie, the representation the databases and the solvers move
+
+    :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+    :return: int64 codes of shape (N, 20), the 8 corners followed by the 12 edges
+    """
+    cp, co, ep, eo = state_to_cubies(states)
+    corner_slots, edge_slots = np.argsort(cp, axis=1), np.argsort(ep, axis=1)
+    return np.concatenate([corner_slots * 3 + np.take_along_axis(co, corner_slots, axis=1),
+                           edge_slots * 2 + np.take_along_axis(eo, edge_slots, axis=1)], axis=1)
+
+
+class PatternDatabase:
+    """
+    Distance to the solved state of a subset of cubies (their slots and orientations), for every arrangement of the
+    subset. The distances are stored with 4 bits per entry; a loaded database is a read only numpy.memmap, so several
+    processes share one page cached copy. Lookups are batched over many states.
+    """
+
+    def __init__(self, kind: str, cubies: tuple, table: np.ndarray):
+        """
+
+        :param kind: corners or edges
+        :param cubies: the tracked cubies
+        :param table: packed uint8 table, two distances per byte
+        """
+        self.kind = kind
+        self.cubies = tuple(int(cubie) for cubie in cubies)
+        self.number_slots, self.number_orientations = CUBIE_KINDS[kind]
+        self.table = table
+        # columns of the tracked cubies in cubie_codes
+        self.columns = list(self.cubies) if kind == "corners" else [8 + cubie for cubie in self.cubies]
+        k = len(self.cubies)
+        # the orientation of the last cubie is determined by the others if all cubies are tracked
+        self._number_free_orientations = k if k < self.number_slots else k - 1
+        self._orientation_weights = self.number_orientations ** np.arange(self._number_free_orientations - 1, -1, -1,
+                                                                           dtype=np.int64)
+        self.size = self._number_permutations() * self.number_orientations ** self._number_free_orientations
+
+    def _number_permutations(self) -> int:
+        count = 1
+        for i in range(len(self.cubies)):
+            count *= self.number_slots - i
+        return count
+
+    @property
+    def name(self) -> str:
+        return "{}_{}".format(self.kind, "-".join(str(cubie) for cubie in self.cubies))
+
+    def codes_to_indices(self, codes: np.ndarray) -> np.ndarray:
+        """
+        table indices of tracked cubie codes
+
+        :param codes: int array of shape (N, k) with slot * number_orientations + orientation of each tracked cubie
+        :return: int64 indices of shape (N, )
+        """
+        slots, orientations = np.divmod(codes, self.number_orientations)
+        orientation_ranks = orientations[:, :self._number_free_orientations] @ self._orientation_weights
+        return partial_permutation_rank(slots, self.number_slots) * \
+            self.number_orientations ** self._number_free_orientations + orientation_ranks
+
+    def indices_to_codes(self, indices: np.ndarray) -> np.ndarray:
+        """
+        inverse of codes_to_indices
+
+        :return: int64 codes of shape (N, k)
+        """
+        k = len(self.cubies)
+        permutation_ranks, orientation_ranks = np.divmod(
+            np.asarray(indices, dtype=np.int64), self.number_orientations ** self._number_free_orientations)
+        slots = partial_permutation_unrank(permutation_ranks, self.number_slots, k)
+        orientations = (orientation_ranks[:, None] // self._orientation_weights[None, :]) % self.number_orientations
+        if self._number_free_orientations < k:
+            last = (-orientations.sum(axis=1, keepdims=True)) % self.number_orientations
+            orientations = np.concatenate([orientations, last], axis=1)
+        return slots * self.number_orientations + orientations
+
+    def state_codes(self, states: np.ndarray) -> np.ndarray:
+        """
+        codes of the tracked cubies of a batch of sticker states
+
+        :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+        :return: int64 codes of shape (N, k)
+        """
+        return cubie_codes(states)[:, self.columns]
+
+    def lookup_indices(self, indices: np.ndarray) -> np.ndarray:
+        """
+        distances of table indices
+
+        :param indices: int array of any shape
+        :return: uint8 distances of the same shape
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        return (self.table[indices >> 1] >> ((indices & 1) << 2).astype(np.uint8)) & 15
+
+    def lookup(self, states: np.ndarray) -> np.ndarray:
+        """
+        distances of the tracked cubies of a batch of states to their solved arrangement, a lower bound of the
+        number of actions needed to solve the states
+
+        :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+        :return: uint8 distances of shape (N, )
+        """
+        return self.lookup_codes(cubie_codes(states))
+
+    def lookup_codes(self, codes: np.ndarray) -> np.ndarray:
+        """
+        like lookup, but for states given as cubie_codes
+
+        :param codes: int array of shape (N, 20)
+        :return: uint8 distances of shape (N, )
+        """
+        return self.lookup_indices(self.codes_to_indices(codes[:, self.columns]))
+
+    @classmethod
+    def build(cls, kind: str, cubies: tuple, chunk_size: int = 1000000):
+        """
+        breadth first search from the solved arrangement over all 12 actions
+
+        :param kind: corners or edges
+        :param cubies: the tracked cubies
+        :param chunk_size: number of frontier states that are expanded at once, bounds the memory use
+        :return: PatternDatabase
+        """
+        database = cls(kind, cubies, np.zeros(0, dtype=np.uint8))
+        code_moves = CUBIE_CODE_MOVES[kind]
+        distances = np.full(database.size, _UNKNOWN, dtype=np.uint8)
+        solved_codes = np.array([[cubie * database.number_orientations for cubie in database.cubies]])
+        frontier = database.codes_to_indices(solved_codes)
+        distances[frontier] = 0
+        depth = 0
+        start = time.perf_counter()
+        while frontier.shape[0] > 0:
+            new_frontier = []
+            for chunk_start in range(0, frontier.shape[0], chunk_size):
+                codes = database.indices_to_codes(frontier[chunk_start:chunk_start + chunk_size])
+                for action in range(12):
+                    indices = database.codes_to_indices(code_moves[action][codes])
+                    indices = np.unique(indices[distances[indices] == _UNKNOWN])
+                    distances[indices] = depth + 1
+                    new_frontier.append(indices)
+            frontier = np.concatenate(new_frontier)
+            depth += 1
+            logging.info("{}: depth {} has {} states, {:.1f}s".format(database.name, depth, frontier.shape[0],
+                                                                     time.perf_counter() - start))
+        # distances above 15 do not fit into 4 bits, cutting them keeps the heuristic admissible
+        distances = np.minimum(distances, 15)
+        if distances.shape[0] % 2:
+            distances = np.append(distances, np.uint8(0))
+        database.table = distances[0::2] | (distances[1::2] << 4)
+        return database
+
+    def save(self, path: str):
+        """
+        writes the database as small json header followed by the packed table
+
+        :param path:
+        :return:
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = json.dumps({"kind": self.kind, "cubies": list(self.cubies), "size": self.size}).encode()
+        offset = -(-(len(_MAGIC) + 4 + len(header)) // 64) * 64
+        with open(path, "wb") as file:
+            file.write(_MAGIC)
+            file.write(len(header).to_bytes(4, "little"))
+            file.write(header)
+            file.write(b"\0" * (offset - len(_MAGIC) - 4 - len(header)))
+            file.write(np.ascontiguousarray(self.table).tobytes())
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        """
+        loads a database written by save
+
+        :param path:
+        :param mmap: if True the table is memory mapped read only instead of read into memory
+        :return: PatternDatabase
+        """
+        with open(path, "rb") as file:
+            if file.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("{} is not a pattern database".format(path))
+            header_length = int.from_bytes(file.read(4), "little")
+            header = json.loads(file.read(header_length).decode())
+        offset = -(-(len(_MAGIC) + 4 + header_length) // 64) * 64
+        shape = ((header["size"] + 1) // 2, )
+        if mmap:
+            table = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=shape)
+        else:
+            table = np.fromfile(path, dtype=np.uint8, offset=offset, count=shape[0])
+        return cls(header["kind"], tuple(header["cubies"]), table)
+
+
+def database_path(kind: str, cubies: tuple, directory: str = DATA_DIRECTORY) -> str:
+    return os.path.join(directory, "{}_{}.pdb".format(kind, "-".join(str(cubie) for cubie in cubies)))
+
+
+class PatternDatabaseHeuristic:
+    """
+    admissible heuristic: the maximum of the distances of several pattern databases
+    """
+
+    def __init__(self, databases: list):
+        self.databases = databases
+
+    @classmethod
+    def from_directory(cls, directory: str = DATA_DIRECTORY, specs: list = None, build_missing: bool = False):
+        """
+        loads (memory mapped) the databases of specs from the directory
+
+        :param directory:
+        :param specs: list of (kind, cubies), default is DEFAULT_DATABASES
+        :param build_missing: if True missing databases are built and saved, otherwise a FileNotFoundError is raised
+        :return:
+        """
+        databases = []
+        for kind, cubies in specs if specs is not None else DEFAULT_DATABASES:
+            path = database_path(kind, cubies, directory)
+            if not os.path.isfile(path):
+                if not build_missing:
+                    raise FileNotFoundError("Pattern database {} does not exist, build it with python -m "
+                                            "rubiksolver.solvers.pattern_database".format(path))
+                PatternDatabase.build(kind, cubies).save(path)
+            databases.append(PatternDatabase.load(path))
+        return cls(databases)
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        """
+        :param states: sticker states of shape (N, 54) or (N, 6, 3, 3)
+        :return: uint8 lower bounds of the solution lengths of shape (N, )
+        """
+        return self.from_codes(cubie_codes(states))
+
+    def from_codes(self, codes: np.ndarray) -> np.ndarray:
+        """
+        :param codes: cubie_codes of shape (N, 20)
+        :return: uint8 lower bounds of the solution lengths of shape (N, )
+        """
+        return np.max([database.lookup_codes(codes) for database in self.databases], axis=0)
+
+
+def _parse_spec(spec: str) -> (str, tuple):
+    kind, cubies = spec.split(":")
+    if kind not in CUBIE_KINDS:
+        raise argparse.ArgumentTypeError("kind must be one of {}".format(list(CUBIE_KINDS)))
+    return kind, tuple(int(cubie) for cubie in cubies.split(","))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="builds pattern databases by breadth first search")
+    parser.add_argument("--directory", default=DATA_DIRECTORY, help="directory the databases are written to")
+    parser.add_argument("--database", dest="specs", action="append", type=_parse_spec,
+                        help="kind and cubies, e.g. corners:0,1,2,3,4,5,6,7 or edges:0,1,2,3,4,5. Can be given "
+                             "several times, default are all corners and two halves of the edges")
+    parser.add_argument("--chunk-size", type=int, default=1000000, help="states expanded at once")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.INFO)
+    for kind, cubies in args.specs or DEFAULT_DATABASES:
+        database = PatternDatabase.build(kind, cubies, chunk_size=args.chunk_size)
+        path = database_path(kind, cubies, args.directory)
+        database.save(path)
+        logging.info("Wrote {} ({} entries, {:.1f} MB)".format(path, database.size, database.table.nbytes / 1e6))
+
+
+if __name__ == "__main__":
+    main()
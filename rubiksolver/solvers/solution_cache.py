@@ -0,0 +1,195 @@
+import collections
+import os
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, canonical_keys, symmetric_states
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                              "cubes")
+_MAGIC = b"RBKSOL01"
+# a record is the corner key and the edge key (int64 each), the solution length and up to 47 actions
+_RECORD_SIZE = 64
+_MAX_LENGTH = _RECORD_SIZE - 17
+_RECORD_DTYPE = np.dtype([("corner_key", "<i8"), ("edge_key", "<i8"), ("length", "u1"),
+                          ("actions", "u1", (_MAX_LENGTH, ))])
+
+
+def _compile_symmetry_actions() -> np.ndarray:
+    """
+    how the actions transform under the 48 symmetries: applying action b and then symmetry s gives the same state as
+    applying symmetry s and then action SYMMETRY_ACTIONS[s, b]. Mirror symmetries turn clockwise into counter
+    clockwise actions
+
+    :return: int array of shape (48, 12)
+    """
+    # the solved state is invariant under all symmetries and the 12 states one action away are distinct
+    moved = symmetric_states(SOLVED_STATE[MOVE_TABLE])
+    table = np.argmax(np.all(moved[:, :, None, :] == SOLVED_STATE[MOVE_TABLE][None, None], axis=3), axis=2)
+    return table.T.copy()
+
+
+SYMMETRY_ACTIONS = _compile_symmetry_actions()
+# SYMMETRY_ACTIONS_INVERSE[s, SYMMETRY_ACTIONS[s, b]] = b
+SYMMETRY_ACTIONS_INVERSE = np.argsort(SYMMETRY_ACTIONS, axis=1)
+
+
+class _SolutionStore:
+    """
+    Append only file of fixed size records behind a 64 byte header. Records are written in append mode, so processes
+    that share the file never overwrite each other. The index from keys to records is built when the file is opened,
+    a key that was written more than once refers to its last record. Records of other processes are only seen after
+    reopening
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as file:
+                file.write(_MAGIC.ljust(_RECORD_SIZE, b"\0"))
+        self._reader = open(path, "rb")
+        if self._reader.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError("{} is not a solution store".format(path))
+        number = (os.path.getsize(path) - _RECORD_SIZE) // _RECORD_SIZE
+        if os.path.getsize(path) != _RECORD_SIZE * (number + 1):
+            # a partially written last record is dropped, so the following records stay aligned
+            os.truncate(path, _RECORD_SIZE * (number + 1))
+        self._writer = open(path, "ab")
+        self._index = {}
+        if number > 0:
+            records = np.fromfile(path, dtype=_RECORD_DTYPE, count=number, offset=_RECORD_SIZE)
+            self._index = dict(zip(zip(records["corner_key"].tolist(), records["edge_key"].tolist()),
+                                   range(number)))
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, key: tuple) -> list:
+        record = self._index.get(key)
+        if record is None:
+            return None
+        self._reader.seek(_RECORD_SIZE * (record + 1))
+        record = np.frombuffer(self._reader.read(_RECORD_SIZE), dtype=_RECORD_DTYPE)[0]
+        return record["actions"][:record["length"]].tolist()
+
+    def put(self, key: tuple, actions: list):
+        if len(actions) > _MAX_LENGTH:
+            return
+        record = np.zeros(1, dtype=_RECORD_DTYPE)
+        record["corner_key"], record["edge_key"], record["length"] = key[0], key[1], len(actions)
+        record["actions"][0, :len(actions)] = actions
+        self._writer.write(record.tobytes())
+        self._writer.flush()
+        self._index[key] = self._writer.tell() // _RECORD_SIZE - 2
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
+
+
+class SolutionCache:
+    """
+    Two tier cache of solutions: a least recently used cache in memory with a bounded number of entries and an
+    optional append only store on disk. Both are keyed by the canonical key of a state (see canonical_keys), so the 48
+    symmetric versions of a state share one entry. Solutions are stored for the canonical version of the state and
+    mapped into the orientation of the queried state with SYMMETRY_ACTIONS. With a solver the cache has the
+    solve(state, max_time) interface of the solvers and only calls the solver on misses.
+    """
+
+    def __init__(self, solver=None, capacity: int = 100000, directory: str = DATA_DIRECTORY):
+        """
+
+        :param solver: object with a solve(state, ...) method returning a list of actions or None, e.g. a
+            TwoPhaseSolver, needed for solve
+        :param capacity: maximum number of solutions in memory
+        :param directory: directory of the store on disk, None keeps the solutions only in memory
+        """
+        self.solver = solver
+        self.capacity = capacity
+        self._memory = collections.OrderedDict()
+        self._store = _SolutionStore(os.path.join(directory, "solutions.rbs")) if directory is not None else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def stats(self) -> dict:
+        """
+        :return: dict with the memory hits, disk hits, misses, evictions, the hit rate and the number of entries of
+            both tiers
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory), "disk_entries": len(self._store) if self._store else 0}
+
+    @staticmethod
+    def _canonical(state: np.ndarray) -> (tuple, int):
+        keys, symmetries = canonical_keys(np.asarray(state).reshape(1, 54))
+        return (int(keys[0, 0]), int(keys[0, 1])), int(symmetries[0])
+
+    def _remember(self, key: tuple, actions: bytes):
+        self._memory[key] = actions
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.capacity:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, state: np.ndarray) -> list:
+        """
+        :param state: sticker state of shape (54, ) or (6, 3, 3)
+        :return: cached solution of the state or None
+        """
+        key, symmetry = self._canonical(state)
+        actions = self._memory.get(key)
+        if actions is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+        else:
+            stored = self._store.get(key) if self._store is not None else None
+            if stored is None:
+                self.misses += 1
+                return None
+            actions = bytes(stored)
+            self._remember(key, actions)
+            self.disk_hits += 1
+        return SYMMETRY_ACTIONS_INVERSE[symmetry, list(actions)].tolist()
+
+    def put(self, state: np.ndarray, actions: list):
+        """
+        stores a solution, a known solution that is not longer is kept
+
+        :param state: sticker state of shape (54, ) or (6, 3, 3)
+        :param actions: action numbers that solve the state
+        """
+        key, symmetry = self._canonical(state)
+        canonical = bytes(SYMMETRY_ACTIONS[symmetry, np.asarray(actions, dtype=np.int64)].tolist())
+        known = self._memory.get(key)
+        if known is None and self._store is not None:
+            known = self._store.get(key)
+        if known is not None and len(known) <= len(canonical):
+            return
+        self._remember(key, canonical)
+        if self._store is not None:
+            self._store.put(key, list(canonical))
+
+    def solve(self, state: np.ndarray, *args, **kwargs) -> list:
+        """
+        the cached solution, or the one of the solver which is cached then
+
+        :param state: sticker state of shape (54, ) or (6, 3, 3)
+        :return: list of actions or None if the solver found no solution
+        """
+        state = np.asarray(state).reshape(54)
+        actions = self.get(state)
+        if actions is None:
+            actions = self.solver.solve(state, *args, **kwargs)
+            if actions is not None:
+                self.put(state, actions)
+        return actions
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
@@ -0,0 +1,357 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+from rubiksolver.cube import CORNER_MOVE_ORIENTATION, CORNER_MOVE_PERMUTATION, EDGE_MOVE_ORIENTATION, \
+    EDGE_MOVE_PERMUTATION, Cube, orientation_rank, orientation_unrank, permutation_rank, permutation_unrank, \
+    state_to_cubies
+from rubiksolver.solvers.ida_star import ALLOWED_ACTIONS
+
+TABLE_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                               "twophase")
+# the edges 8 to 11 do not touch the top and bottom side, they form the slice between them
+SLICE_EDGES = (8, 9, 10, 11)
+# moves of phase 2 as action sequences: quarter turns of top and bottom, half turns of the other sides. They keep
+# twist, flip and the slice edges in the slice
+PHASE2_MOVES = [(0, ), (6, ), (1, ), (7, ), (2, 2), (3, 3), (4, 4), (5, 5)]
+MAX_PHASE1_DEPTH = 20
+MAX_PHASE2_COST = 20
+
+
+def _compile_slice_ranks() -> (np.ndarray, np.ndarray):
+    # the 495 sets of 4 of 12 edge slots, as bit masks, and the rank of every 12 bit mask with 4 bits set
+    masks = np.array([mask for mask in range(4096) if bin(mask).count("1") == 4], dtype=np.int64)
+    ranks = np.full(4096, -1, dtype=np.int64)
+    ranks[masks] = np.arange(masks.shape[0])
+    return masks, ranks
+
+
+SLICE_MASKS, SLICE_RANKS = _compile_slice_ranks()
+SOLVED_SLICE = int(SLICE_RANKS[sum(1 << slot for slot in SLICE_EDGES)])
+
+
+def apply_cubie_actions(cp: np.ndarray, co: np.ndarray, ep: np.ndarray, eo: np.ndarray, actions) -> tuple:
+    """
+    applies actions to a batch of cubie arrays as returned by state_to_cubies
+
+    :return: the new cp, co, ep, eo
+    """
+    for action in actions:
+        cp, co = cp[:, CORNER_MOVE_PERMUTATION[action]], \
+            (co[:, CORNER_MOVE_PERMUTATION[action]] + CORNER_MOVE_ORIENTATION[action]) % 3
+        ep, eo = ep[:, EDGE_MOVE_PERMUTATION[action]], \
+            (eo[:, EDGE_MOVE_PERMUTATION[action]] + EDGE_MOVE_ORIENTATION[action]) % 2
+    return cp, co, ep, eo
+
+
+def phase1_coordinates(co: np.ndarray, eo: np.ndarray, ep: np.ndarray) -> tuple:
+    """
+    :return: twist, flip and the set of slots of the slice edges, all 0 but the slice SOLVED_SLICE in phase 2
+    """
+    slice_masks = np.isin(ep, SLICE_EDGES) @ (1 << np.arange(12, dtype=np.int64))
+    return orientation_rank(co, 3), orientation_rank(eo, 2), SLICE_RANKS[slice_masks]
+
+
+def phase2_coordinates(cp: np.ndarray, ep: np.ndarray) -> tuple:
+    """
+    only valid for states of phase 2, where the slice edges are in the slice
+
+    :return: rank of the corner permutation, of the permutation of the other 8 edges and of the slice edges
+    """
+    return permutation_rank(cp), permutation_rank(ep[:, :8]), permutation_rank(ep[:, 8:] - 8)
+
+
+def _move_table(cubies: tuple, coordinate, moves: list) -> np.ndarray:
+    """
+    :param cubies: cp, co, ep, eo of one representative for every coordinate value
+    :param coordinate: function of the cubies that returns the coordinate values
+    :param moves: list of action sequences
+    :return: int32 table of shape (number of values, number of moves)
+    """
+    table = np.empty((cubies[0].shape[0], len(moves)), dtype=np.int32)
+    for i, actions in enumerate(moves):
+        table[:, i] = coordinate(*apply_cubie_actions(*cubies, actions))
+    assert np.all(table >= 0)
+    return table
+
+
+def _pruning_table(move_a: np.ndarray, move_b: np.ndarray, solved: int, costs: list) -> np.ndarray:
+    """
+    search over the product of two coordinates in order of increasing cost, moves cost 1 or 2 actions
+
+    :return: uint8 number of actions to reach the solved index a * size_b + b
+    """
+    size_b = move_b.shape[0]
+    distances = np.full(move_a.shape[0] * size_b, 255, dtype=np.uint8)
+    distances[solved] = 0
+    distance = 0
+    while True:
+        frontier = np.nonzero(distances == distance)[0]
+        if frontier.shape[0] == 0 and not np.any((distances > distance) & (distances < 255)):
+            break
+        a, b = np.divmod(frontier, size_b)
+        for move, cost in enumerate(costs):
+            children = move_a[a, move] * size_b + move_b[b, move]
+            children = children[distances[children] > distance + cost]
+            distances[children] = distance + cost
+        distance += 1
+    return distances
+
+
+def build_tables() -> dict:
+    """
+    computes the coordinate move tables and the pruning tables, takes a few seconds
+
+    :return: dict of numpy arrays
+    """
+    identity_corners, identity_edges = np.arange(8), np.arange(12)
+
+    def cubies(number: int, cp=None, co=None, ep=None, eo=None) -> tuple:
+        return (cp if cp is not None else np.tile(identity_corners, (number, 1)),
+                co if co is not None else np.zeros((number, 8), dtype=np.int64),
+                ep if ep is not None else np.tile(identity_edges, (number, 1)),
+                eo if eo is not None else np.zeros((number, 12), dtype=np.int64))
+
+    phase1_moves = [(action, ) for action in range(12)]
+    slice_slots = (SLICE_MASKS[:, None] >> identity_edges[None, :]) & 1
+    # slice edges into the slots of the mask, the other edges into the remaining slots
+    slice_ep = np.argsort(slice_slots, axis=1, kind="stable")
+    slice_ep = np.argsort(slice_ep, axis=1)
+    tables = {
+        "twist_move": _move_table(cubies(2187, co=orientation_unrank(np.arange(2187), 8, 3)),
+                                  lambda cp, co, ep, eo: orientation_rank(co, 3), phase1_moves),
+        "flip_move": _move_table(cubies(2048, eo=orientation_unrank(np.arange(2048), 12, 2)),
+                                 lambda cp, co, ep, eo: orientation_rank(eo, 2), phase1_moves),
+        "slice_move": _move_table(cubies(495, ep=slice_ep),
+                                  lambda cp, co, ep, eo: phase1_coordinates(co, eo, ep)[2], phase1_moves),
+        "corner_move": _move_table(cubies(40320, cp=permutation_unrank(np.arange(40320), 8)),
+                                   lambda cp, co, ep, eo: permutation_rank(cp), PHASE2_MOVES),
+        "edge_move": _move_table(
+            cubies(40320, ep=np.concatenate([permutation_unrank(np.arange(40320), 8), np.tile(SLICE_EDGES, (40320, 1))],
+                                            axis=1)),
+            lambda cp, co, ep, eo: np.where(np.all(ep[:, 8:] >= 8, axis=1), permutation_rank(ep[:, :8]), -1),
+            PHASE2_MOVES),
+        "slice_permutation_move": _move_table(
+            cubies(24, ep=np.concatenate([np.tile(identity_edges[:8], (24, 1)),
+                                          8 + permutation_unrank(np.arange(24), 4)], axis=1)),
+            lambda cp, co, ep, eo: np.where(np.all(ep[:, 8:] >= 8, axis=1), permutation_rank(ep[:, 8:] - 8), -1),
+            PHASE2_MOVES),
+    }
+    phase1_costs = [1] * len(phase1_moves)
+    phase2_costs = [len(actions) for actions in PHASE2_MOVES]
+    tables["twist_slice_pruning"] = _pruning_table(tables["twist_move"], tables["slice_move"], SOLVED_SLICE,
+                                                   phase1_costs)
+    tables["flip_slice_pruning"] = _pruning_table(tables["flip_move"], tables["slice_move"], SOLVED_SLICE,
+                                                  phase1_costs)
+    tables["corner_slice_pruning"] = _pruning_table(tables["corner_move"], tables["slice_permutation_move"], 0,
+                                                    phase2_costs)
+    tables["edge_slice_pruning"] = _pruning_table(tables["edge_move"], tables["slice_permutation_move"], 0,
+                                                  phase2_costs)
+    return tables
+
+
+def load_tables(directory: str = TABLE_DIRECTORY) -> dict:
+    """
+    loads the tables memory mapped from the directory, they are built and saved there first if they are missing
+
+    :param directory:
+    :return: dict of read only numpy arrays
+    """
+    names = ["twist_move", "flip_move", "slice_move", "corner_move", "edge_move", "slice_permutation_move",
+             "twist_slice_pruning", "flip_slice_pruning", "corner_slice_pruning", "edge_slice_pruning"]
+    if not all(os.path.isfile(os.path.join(directory, name + ".npy")) for name in names):
+        start = time.perf_counter()
+        tables = build_tables()
+        os.makedirs(directory, exist_ok=True)
+        for name in names:
+            np.save(os.path.join(directory, name + ".npy"), tables[name])
+        logging.info("Built two phase tables in {} in {:.1f}s".format(directory, time.perf_counter() - start))
+    return {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in names}
+
+
+def simplify_actions(actions: list) -> list:
+    """
+    removes actions that are followed by their inverse and replaces three equal actions by the inverse action
+
+    :param actions:
+    :return: new list of actions
+    """
+    simplified = []
+    for action in actions:
+        if simplified and simplified[-1] == (action + 6) % 12:
+            simplified.pop()
+        elif len(simplified) >= 2 and simplified[-1] == action and simplified[-2] == action:
+            del simplified[-2:]
+            if simplified and simplified[-1] == action:
+                simplified.pop()
+            else:
+                simplified.append((action + 6) % 12)
+        else:
+            simplified.append(action)
+    return simplified
+
+
+def _compile_phase2_allowed() -> list:
+    # same pruning rules as ALLOWED_ACTIONS on the phase 2 moves, indexed by the last and the second to last move
+    allowed = [[[] for _ in range(len(PHASE2_MOVES) + 1)] for _ in range(len(PHASE2_MOVES) + 1)]
+    for last in range(len(PHASE2_MOVES) + 1):
+        for before_last in range(len(PHASE2_MOVES) + 1):
+            for move, actions in enumerate(PHASE2_MOVES):
+                side = actions[0] % 6
+                if last < len(PHASE2_MOVES):
+                    last_side = PHASE2_MOVES[last][0] % 6
+                    if side == last_side:
+                        before_last_side = PHASE2_MOVES[before_last][0] % 6 if before_last < len(PHASE2_MOVES) else None
+                        if not (move == last and len(actions) == 1 and actions[0] < 6 and before_last_side != side):
+                            continue
+                    elif side % 2 == 0 and last_side == side + 1:
+                        continue
+                allowed[last][before_last].append(move)
+    return allowed
+
+
+PHASE2_ALLOWED = _compile_phase2_allowed()
+
+
+class _TimeUp(Exception):
+    pass
+
+
+class TwoPhaseSolver:
+    """
+    Fast suboptimal solver after Kociemba. Phase 1 searches actions that bring the cube into the subgroup generated
+    by PHASE2_MOVES (no twist, no flip, slice edges in the slice), phase 2 solves it within the subgroup. Both phases
+    are iterative deepening searches on small coordinates with precomputed move and pruning tables, which are cached
+    in TABLE_DIRECTORY and memory mapped. Half turns are returned as two quarter turn actions.
+    """
+
+    def __init__(self, table_directory: str = TABLE_DIRECTORY):
+        """
+
+        :param table_directory: directory of the cached tables, they are built there on first use
+        """
+        tables = load_tables(table_directory)
+        # python lists are much faster than numpy arrays for the scalar lookups of the search
+        self._twist_move = tables["twist_move"].tolist()
+        self._flip_move = tables["flip_move"].tolist()
+        self._slice_move = tables["slice_move"].tolist()
+        self._corner_move = tables["corner_move"].tolist()
+        self._edge_move = tables["edge_move"].tolist()
+        self._slice_permutation_move = tables["slice_permutation_move"].tolist()
+        # memoryviews of the memory mapped pruning tables return python ints without copying the tables
+        self._twist_slice_pruning = memoryview(tables["twist_slice_pruning"])
+        self._flip_slice_pruning = memoryview(tables["flip_slice_pruning"])
+        self._corner_slice_pruning = memoryview(tables["corner_slice_pruning"])
+        self._edge_slice_pruning = memoryview(tables["edge_slice_pruning"])
+        self._allowed_actions = [[np.nonzero(ALLOWED_ACTIONS[last, before_last])[0].tolist()
+                                  for before_last in range(13)] for last in range(13)]
+        self._phase2_costs = [len(actions) for actions in PHASE2_MOVES]
+        self.stats = {}
+
+    def solve(self, cube, max_time: float = 1.0, target_length: int = None) -> list:
+        """
+        searches solutions of increasing phase 1 length and keeps the shortest one
+
+        :param cube: Cube or its sticker array of shape (6, 3, 3) or (54, )
+        :param max_time: number of seconds after which the best solution found so far is returned. If None the first
+            solution is returned
+        :param target_length: the search stops as soon as a solution with at most this number of actions is found
+        :return: list of actions that solve the cube, None if no solution was found in time
+        """
+        state = cube.cube if isinstance(cube, Cube) else cube
+        start = time.perf_counter()
+        self._deadline = start + max_time if max_time is not None else None
+        if target_length is None:
+            target_length = -1 if max_time is not None else np.inf
+        self._target_length = target_length
+        self._cubies = state_to_cubies(np.asarray(state).reshape(1, 54))
+        self._best = None
+        self._nodes = 0
+        cp, co, ep, eo = self._cubies
+        twist, flip, slice_ = (int(coordinate[0]) for coordinate in phase1_coordinates(co, eo, ep))
+        try:
+            depth = self._phase1_heuristic(twist, flip, slice_)
+            while depth <= MAX_PHASE1_DEPTH and (self._best is None or depth < len(self._best)):
+                self._phase1(twist, flip, slice_, depth, [])
+                depth += 1
+        except _TimeUp:
+            pass
+        seconds = time.perf_counter() - start
+        self.stats = {"nodes": self._nodes, "seconds": seconds, "nodes_per_second": self._nodes / max(seconds, 1e-9),
+                      "length": len(self._best) if self._best is not None else None}
+        return self._best
+
+    def _phase1_heuristic(self, twist: int, flip: int, slice_: int) -> int:
+        return max(self._twist_slice_pruning[twist * 495 + slice_], self._flip_slice_pruning[flip * 495 + slice_])
+
+    def _phase2_heuristic(self, corners: int, edges: int, slice_permutation: int) -> int:
+        return max(self._corner_slice_pruning[corners * 24 + slice_permutation],
+                   self._edge_slice_pruning[edges * 24 + slice_permutation])
+
+    def _check_time(self):
+        self._nodes += 1
+        if self._nodes & 1023 == 0 and self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _TimeUp()
+
+    def _phase1(self, twist: int, flip: int, slice_: int, togo: int, path: list):
+        if togo == 0:
+            self._start_phase2(path)
+            return
+        self._check_time()
+        last = path[-1] if path else 12
+        before_last = path[-2] if len(path) > 1 else 12
+        for action in self._allowed_actions[last][before_last]:
+            new_twist, new_flip = self._twist_move[twist][action], self._flip_move[flip][action]
+            new_slice = self._slice_move[slice_][action]
+            heuristic = self._phase1_heuristic(new_twist, new_flip, new_slice)
+            # a phase 1 solution that ends with a phase 2 move was already found one depth earlier
+            if heuristic < togo and not (togo == 1 and action % 6 < 2):
+                path.append(action)
+                self._phase1(new_twist, new_flip, new_slice, togo - 1, path)
+                path.pop()
+
+    def _start_phase2(self, phase1_path: list):
+        cp, _, ep, _ = apply_cubie_actions(*self._cubies, phase1_path)
+        corners, edges, slice_permutation = (int(coordinate[0]) for coordinate in phase2_coordinates(cp, ep))
+        max_cost = MAX_PHASE2_COST if self._best is None else len(self._best) - len(phase1_path) - 1
+        cost = self._phase2_heuristic(corners, edges, slice_permutation)
+        while cost <= max_cost:
+            phase2_path = self._phase2(corners, edges, slice_permutation, cost, [])
+            if phase2_path is not None:
+                solution = simplify_actions(phase1_path + [action for move in phase2_path
+                                                           for action in PHASE2_MOVES[move]])
+                if self._best is None or len(solution) < len(self._best):
+                    self._best = solution
+                    logging.debug("Two phase solution with {} actions after {} nodes".format(len(solution),
+                                                                                             self._nodes))
+                    if len(solution) <= self._target_length:
+                        raise _TimeUp()
+                return
+            cost += 1
+
+    def _phase2(self, corners: int, edges: int, slice_permutation: int, togo: int, path: list) -> list:
+        if corners == 0 and edges == 0 and slice_permutation == 0:
+            return list(path)
+        self._check_time()
+        last = path[-1] if path else len(PHASE2_MOVES)
+        before_last = path[-2] if len(path) > 1 else len(PHASE2_MOVES)
+        corner_move, edge_move = self._corner_move[corners], self._edge_move[edges]
+        slice_permutation_move = self._slice_permutation_move[slice_permutation]
+        corner_slice_pruning, edge_slice_pruning = self._corner_slice_pruning, self._edge_slice_pruning
+        for move in PHASE2_ALLOWED[last][before_last]:
+            remaining = togo - self._phase2_costs[move]
+            if remaining < 0:
+                continue
+            new_corners, new_edges = corner_move[move], edge_move[move]
+            new_slice_permutation = slice_permutation_move[move]
+            # the heuristic inlined, this is the innermost loop of the solver
+            if corner_slice_pruning[new_corners * 24 + new_slice_permutation] <= remaining and \
+                    edge_slice_pruning[new_edges * 24 + new_slice_permutation] <= remaining:
+                path.append(move)
+                solution = self._phase2(new_corners, new_edges, new_slice_permutation, remaining, path)
+                path.pop()
+                if solution is not None:
+                    return solution
+        return None
@@ -1,9 +1,15 @@
 import logging
+import time
 from types import FunctionType
 
+import numpy as np
+
 from rubiksolver.cube import Cube, Direction, Side, ActionSerializer
 from rubiksolver.agents.agent import Agent
 from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.dataset import TransitionWriter
+from rubiksolver.metrics import NULL_METRICS, Metrics
+from rubiksolver.scrambles import ScramblePool
 
 
 class TrainWrapper:
@@ -13,7 +19,9 @@ class TrainWrapper:
     and finished
     """
     def __init__(self, reward_function: dict = None, number_shuffles: int = 50, actions_reset_threshold: int = 1000,
-                 agent_callback: FunctionType = None, wrapper_callback: FunctionType = None):
+                 agent_callback: FunctionType = None, wrapper_callback: FunctionType = None,
+                 transition_writer: TransitionWriter = None, metrics: Metrics = None,
+                 scramble_pool: ScramblePool = None):
         """
 
 
@@ -23,6 +31,12 @@ class TrainWrapper:
         :param wrapper_callback: a callback that gets the wrapper
         :param agent_callback: a callback that gets the agent
         :param actions_reset_threshold: the number of actions after which the cube will be randomly initialised again
+        :param transition_writer: if given every transition is also streamed to disk, e.g. for offline training on a
+            TransitionDataset
+        :param metrics: records the time of action selection, environment steps and resets and the number of steps
+            and episodes. Enabled metrics are also handed to agents without metrics of their own
+        :param scramble_pool: if given the cube is reset to states drawn from the pool instead of being scrambled with
+            number_shuffles actions
         """
         if reward_function is None:
             reward_function = {"solved": {True: 1, False: 0}}
@@ -32,7 +46,10 @@ class TrainWrapper:
         self.number_shuffles = number_shuffles
         self.wrapper_callback = wrapper_callback
         self.agent_callback = agent_callback
-        self.cube.init_random_cube(number_shuffles)
+        self.transition_writer = transition_writer
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.scramble_pool = scramble_pool
+        self.reset_cube()
         self.actions_reset_threshold = actions_reset_threshold
         self.all_iterations = None
         self.inner_iterations = None
@@ -59,6 +76,12 @@ class TrainWrapper:
         :return:
         """
         self.init_stats()
+        metrics = self.metrics
+        # the clock is only read with enabled metrics, disabled metrics cost one check per phase
+        timed = metrics.enabled
+        stepped = timed or metrics.profile_path is not None
+        if timed and not agent.metrics.enabled:
+            agent.metrics = metrics
         i = 0
         k = 0
         cum_reward = 0
@@ -70,8 +93,18 @@ class TrainWrapper:
             last_reward = None
             last_solved = None
             while not self.cube.solved() and j < self.actions_reset_threshold:
-                action = agent.get_action(self.cube.cube)
+                if timed:
+                    start = time.perf_counter()
+                action = agent.get_action_code(self.cube.cube)
+                if timed:
+                    selected = time.perf_counter()
+                    metrics.add_time("action_selection", selected - start)
                 state, action, reward, next_state, solved = self.take_action(action)
+                if timed:
+                    metrics.add_time("env_step", time.perf_counter() - selected)
+                    metrics.count("env_steps")
+                if self.transition_writer is not None:
+                    self.transition_writer.add(state, action, reward, next_state, solved)
                 if j > 0:
                     agent.get_feedback(state=last_state, action=last_action, reward=last_reward, next_state=state,
                                        next_action=action, finished=last_solved)
@@ -95,6 +128,8 @@ class TrainWrapper:
                 if self.agent_callback is not None:
                     self.agent_callback(agent)
 
+                if stepped:
+                    metrics.step(i)
                 j += 1
                 i += 1
                 self.all_iterations = i
@@ -102,23 +137,43 @@ class TrainWrapper:
             k += 1
             self.inner_iterations = k
 
+            with metrics.timer("reset"):
+                self.reset_cube()
+            metrics.count("episodes")
+
+        if self.transition_writer is not None:
+            self.transition_writer.flush()
+        if stepped:
+            metrics.close()
+
+    def reset_cube(self):
+        """
+        initialises the cube randomly, from the scramble pool if there is one
+
+        :return:
+        """
+        if self.scramble_pool is not None:
+            self.cube.cube = self.scramble_pool.next().reshape(6, 3, 3).astype(np.int64)
+        else:
             self.cube.init_random_cube(number_rotations=self.number_shuffles)
 
     def take_action(self, action):
         """
-        Actions are decoded as the following
+        applies the action to the cube. The states of the cube are never changed in place, so the returned states
+        are not copied
 
-        :param action:
-        :return:
+        :param action: action number (0 to 11), or a (side, direction) tuple as returned by Agent.get_action
+        :return: state, action number, reward, next state and whether the cube is solved
         """
-        side, direction = action
-        state = self.cube.cube.copy()
-        self.cube.rotate(side=side, direction=direction)
+        if isinstance(action, tuple):
+            side, direction = action
+            action = ActionSerializer.serialize(direction, side)
+        state = self.cube.cube
+        self.cube.apply_action(action)
 
         solved = self.cube.solved()
         reward = self.rewards["solved"][solved]
-        action = ActionSerializer.serialize(direction, side)
-        return state, action, reward, self.cube.cube.copy(), solved
+        return state, action, reward, self.cube.cube, solved
 
 
 if __name__ == "__main__":
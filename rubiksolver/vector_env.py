@@ -0,0 +1,80 @@
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+from rubiksolver.scrambles import ScramblePool, random_scrambles
+
+
+class VectorCubeEnv:
+    """
+    Holds N cubes as one (N, 54) uint8 array of flat sticker states and steps all of them with one action per cube
+    per call. Cubes that are solved or reached the actions_reset_threshold are randomly initialised again, all
+    without a python loop over the cubes.
+    """
+    def __init__(self, number_envs: int, reward_function: dict = None, number_shuffles: int = 50,
+                 actions_reset_threshold: int = 1000, seed: int = None, scramble_pool: ScramblePool = None):
+        """
+
+        :param number_envs: number of cubes that are stepped in parallel
+        :param reward_function: a dictionary that supplies the rewards for specific actions. At the moment there is
+            only a reward for solving
+        :param number_shuffles: the number of turns to be executed to init a cube
+        :param actions_reset_threshold: the number of actions after which a cube will be randomly initialised again
+        :param seed: seed for the random scrambles
+        :param scramble_pool: if given cubes are reset to states drawn from the pool instead of being scrambled
+        """
+        if reward_function is None:
+            reward_function = {"solved": {True: 1, False: 0}}
+
+        self.number_envs = number_envs
+        self.rewards = reward_function
+        self.number_shuffles = number_shuffles
+        self.actions_reset_threshold = actions_reset_threshold
+        self.scramble_pool = scramble_pool
+        self._reward_lookup = np.array([reward_function["solved"][False], reward_function["solved"][True]],
+                                       dtype=np.float32)
+        self._random = np.random.default_rng(seed)
+
+        self.states = np.tile(SOLVED_STATE, (number_envs, 1))
+        self.steps = np.zeros(number_envs, dtype=np.int64)
+        self.truncated = np.zeros(number_envs, dtype=bool)
+        self.reset()
+
+    def reset(self, mask: np.ndarray = None) -> np.ndarray:
+        """
+        randomly initialises the cubes selected by mask with number_shuffles random actions that do not cancel each
+        other, or with states of the scramble pool
+
+        :param mask: boolean array of shape (N, ), if None all cubes are reset
+        :return: the current states of all cubes
+        """
+        if mask is None:
+            index = np.arange(self.number_envs)
+        else:
+            index = np.flatnonzero(mask)
+        if self.scramble_pool is not None:
+            self.states[index] = self.scramble_pool.sample(index.shape[0])
+        else:
+            self.states[index] = random_scrambles(index.shape[0], self.number_shuffles, self._random)[0]
+        self.steps[index] = 0
+        return self.states
+
+    def step(self, actions: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray):
+        """
+        applies one action to every cube. The returned observations are the states reached by the actions, cubes that
+        are done afterwards are already reset in self.states, so self.states holds the states for the next step
+
+        :param actions: int array of shape (N, ) with action numbers between 0 and 11
+        :return: next states of shape (N, 54), rewards of shape (N, ) and done flags of shape (N, )
+        """
+        next_states = np.take_along_axis(self.states, MOVE_TABLE[actions], axis=1)
+        solved = np.all(next_states == SOLVED_STATE, axis=1)
+        rewards = self._reward_lookup[solved.view(np.uint8)]
+        self.steps += 1
+        self.truncated = ~solved & (self.steps >= self.actions_reset_threshold)
+        reset_mask = solved | self.truncated
+        if reset_mask.any():
+            self.states = next_states.copy()
+            self.reset(reset_mask)
+        else:
+            self.states = next_states
+        return next_states, rewards, solved
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.autodidactic import AutodidacticGenerator
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+
+
+class RecordingAgent:
+
+    def __init__(self):
+        self.batches = []
+        self.target_updates = 0
+
+    def train_on_batch(self, **batch):
+        self.batches.append(batch)
+
+    def load_weigths_into_target_network(self):
+        self.target_updates += 1
+
+
+class AutodidacticGeneratorTester(unittest.TestCase):
+
+    def test_scramble_depths(self):
+        states, depths = AutodidacticGenerator(max_depth=4, seed=0).sample_states(1000)
+        self.assertEqual(states.shape, (1000, 54))
+        self.assertEqual(states.dtype, np.uint8)
+        self.assertEqual(set(depths.tolist()), {1, 2, 3, 4})
+        # backward scrambles never undo their last action, so no state of depth 2 is solved
+        self.assertFalse(np.any(np.all(states[depths == 2] == SOLVED_STATE, axis=1)))
+        one_action = states[depths == 1]
+        self.assertTrue(np.all(np.any(np.all(one_action[:, MOVE_TABLE] == SOLVED_STATE, axis=2), axis=1)))
+
+    def test_expand_all_children(self):
+        generator = AutodidacticGenerator(max_depth=1, seed=1)
+        batch = generator.batch(10)
+        self.assertEqual(batch["obs"].shape, (120, 54))
+        self.assertTrue(np.array_equal(batch["next_obs"],
+                                       np.take_along_axis(batch["obs"], MOVE_TABLE[batch["actions"]], axis=1)))
+        # every state of depth 1 has exactly one solving action
+        self.assertTrue(np.array_equal(batch["rewards"].reshape(10, 12).sum(axis=1), np.ones(10)))
+        self.assertTrue(np.array_equal(batch["is_done"], batch["rewards"]))
+        self.assertTrue(np.allclose(batch["weights"], 1.0))
+
+    def test_targets(self):
+        generator = AutodidacticGenerator(max_depth=1, seed=2)
+        states, _ = generator.sample_states(20)
+        values, policies = generator.targets(states, lambda children: np.zeros((children.shape[0], 12)))
+        self.assertTrue(np.allclose(values, 1.0))
+        solved = np.take_along_axis(states, MOVE_TABLE[policies], axis=1)
+        self.assertTrue(np.all(solved == SOLVED_STATE))
+
+    def test_train_streams_batches(self):
+        agent = RecordingAgent()
+        stats = AutodidacticGenerator(max_depth=3, seed=3).train(agent, number_steps=4, states_per_step=8,
+                                                                 freq_steps_load=2)
+        self.assertEqual(len(agent.batches), 4)
+        self.assertEqual(agent.target_updates, 2)
+        self.assertEqual(stats["transitions"], 4 * 8 * 12)
+        self.assertTrue(all(batch["obs"].shape == (96, 54) for batch in agent.batches))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+from rubiksolver.solvers.batch_astar import BatchWeightedAStar
+
+
+def _apply(state: np.ndarray, actions: list) -> np.ndarray:
+    for action in actions:
+        state = state[MOVE_TABLE[action]]
+    return state
+
+
+def _misplaced_stickers(states: np.ndarray) -> np.ndarray:
+    # each action moves 20 stickers, so this is a (weak) lower bound
+    return np.sum(states != SOLVED_STATE, axis=1) / 20
+
+
+class BatchWeightedAStarTester(unittest.TestCase):
+
+    def test_solved_state(self):
+        self.assertEqual(BatchWeightedAStar(_misplaced_stickers).solve(SOLVED_STATE), [])
+
+    def test_uniform_cost_search_is_optimal(self):
+        solver = BatchWeightedAStar(lambda states: np.zeros(states.shape[0]), batch_size=1, weight=1.0)
+        state = _apply(SOLVED_STATE, [0, 3, 3, 10])
+        self.assertEqual(len(solver.solve(state)), 4)
+        self.assertEqual(solver.stats["generated"], 12 * solver.stats["expanded"])
+
+    def test_batched_search_solves_scrambles(self):
+        scramble = [0, 3, 4, 1, 8, 2, 5]
+        state = _apply(SOLVED_STATE, scramble)
+        for batch_size in [1, 64]:
+            solver = BatchWeightedAStar(_misplaced_stickers, batch_size=batch_size, weight=0.5)
+            solution = solver.solve(state)
+            self.assertTrue(np.array_equal(_apply(state, solution), SOLVED_STATE))
+            self.assertGreaterEqual(solver.stats["iterations"] * batch_size, solver.stats["expanded"])
+
+    def test_node_limit(self):
+        solver = BatchWeightedAStar(lambda states: np.zeros(states.shape[0]), batch_size=10)
+        state = _apply(SOLVED_STATE, [0, 3, 4, 1, 8, 2, 5, 9, 0, 10])
+        self.assertIsNone(solver.solve(state, max_nodes=1000))
+        self.assertLess(solver.stats["generated"], 1200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver import batch_solve
+from rubiksolver.batch_solve import SolveSummary, parse_item, read_items, solve_stream, summarize
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, ActionSerializer
+
+
+class BatchSolveTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_notation_round_trip(self):
+        self.assertEqual(ActionSerializer.parse_moves("R U' F2 D2'"), [3, 6, 4, 4, 1, 1])
+        self.assertEqual(ActionSerializer.format_moves([3, 6, 4, 4, 1, 1]), "R U' F2 D2")
+        with self.assertRaises(ValueError):
+            ActionSerializer.parse_moves("R X")
+
+    def test_parse_item(self):
+        expected = SOLVED_STATE[MOVE_TABLE[3]][MOVE_TABLE[6]]
+        for line in ["R U'", json.dumps({"scramble": "R U'"}), json.dumps({"actions": [3, 6]}),
+                     json.dumps({"state": expected.tolist()})]:
+            item = parse_item(line, 7)
+            np.testing.assert_array_equal(item["state"], expected)
+            self.assertEqual(item["id"], 7)
+        self.assertEqual(parse_item(json.dumps({"id": "a", "scramble": "R"}), 0)["id"], "a")
+        self.assertEqual(parse_item("R Q\n", 0)["error"], "ValueError: Invalid move Q in R Q")
+        self.assertIn("error", parse_item(json.dumps({"state": [0] * 54}), 0))
+
+    def test_results_in_input_order(self):
+        random = np.random.default_rng(0)
+        lines = [ActionSerializer.format_moves(random.integers(0, 12, size=20)) for _ in range(6)]
+        lines.insert(2, "not a scramble")
+        batch_solve._solver = None
+        results = list(solve_stream(read_items(lines), "two_phase", {"table_directory": self.directory.name},
+                                    processes=2, timeout=30.0, window=3))
+        # only the workers create a solver, the parent just builds the tables
+        self.assertIsNone(batch_solve._solver)
+        self.assertEqual([result["id"] for result in results], list(range(7)))
+        self.assertEqual(results[2]["status"], "error")
+        for line, result in zip(lines[:2] + lines[3:], results[:2] + results[3:]):
+            self.assertEqual(result["status"], "solved")
+            state = parse_item(line, 0)["state"]
+            for action in ActionSerializer.parse_moves(result["moves"]):
+                state = state[MOVE_TABLE[action]]
+            np.testing.assert_array_equal(state, SOLVED_STATE)
+
+        summary = summarize(results, 1.0)
+        self.assertEqual(summary["solved"], 6)
+        self.assertEqual(summary["errors"], 1)
+        self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+
+    def test_solve_in_process(self):
+        results = list(solve_stream(read_items(["R U", "R Q"]), "two_phase", {"table_directory": self.directory.name},
+                                    processes=0, timeout=30.0))
+        self.assertEqual([result["status"] for result in results], ["solved", "error"])
+        self.assertEqual(summarize(results, 1.0)["errors"], 1)
+
+    def test_summary_memory_is_bounded(self):
+        summary = SolveSummary(reservoir_size=100)
+        for number in range(1000):
+            summary.add({"status": "solved", "length": 20, "seconds": number / 1000, "cached": number % 4 == 0})
+        summary.add({"status": "error", "error": "ValueError: bad"})
+        self.assertEqual(len(summary._latencies), 100)
+        result = summary.summary(2.0)
+        self.assertEqual((result["items"], result["solved"], result["errors"], result["cached"]), (1001, 1000, 1, 250))
+        self.assertEqual(result["mean_length"], 20)
+        self.assertAlmostEqual(result["max_ms"], 999.0)
+        # the percentiles of the reservoir are close to the ones of all latencies
+        self.assertAlmostEqual(result["p50_ms"], 500.0, delta=150.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
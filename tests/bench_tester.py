@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+import unittest
+
+from rubiksolver.bench import compare, main, run_benchmarks
+
+
+class BenchTester(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        report = run_benchmarks(["cube_rotate", "replay_buffer"], scale=0.01, repeat=1)
+        self.assertEqual(set(report["results"]), {"cube_rotate", "replay_buffer_sample_32",
+                                                  "replay_buffer_sample_256", "replay_buffer_sample_4096"})
+        self.assertTrue(report["results"]["cube_rotate"]["higher_is_better"])
+        self.assertFalse(report["results"]["replay_buffer_sample_32"]["higher_is_better"])
+        self.assertGreater(report["results"]["cube_rotate"]["value"], 0)
+
+    def test_compare(self):
+        baseline = {"results": {"rate": {"value": 100.0, "higher_is_better": True},
+                                "latency": {"value": 10.0, "higher_is_better": False}}}
+        report = {"results": {"rate": {"value": 85.0, "higher_is_better": True},
+                              "latency": {"value": 11.0, "higher_is_better": False},
+                              "new": {"value": 1.0, "higher_is_better": True}}}
+        self.assertEqual(compare(report, baseline, tolerance=0.2), [])
+        report["results"]["rate"]["value"] = 70.0
+        report["results"]["latency"]["value"] = 13.0
+        self.assertEqual([regression["name"] for regression in compare(report, baseline, tolerance=0.2)],
+                         ["rate", "latency"])
+
+    def test_regression_fails(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            output = os.path.join(directory, "output.json")
+            arguments = ["--only", "cube_solved", "--scale", "0.01", "--repeat", "1", "--output", output,
+                         "--baseline", baseline]
+            self.assertEqual(main(arguments + ["--save-baseline"]), 0)
+            with open(baseline) as file:
+                stored = json.load(file)
+            stored["results"]["cube_solved"]["value"] *= 100
+            with open(baseline, "w") as file:
+                json.dump(stored, file)
+            self.assertEqual(main(arguments), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 import itertools
+import subprocess
+import sys
 import unittest
-from rubiksolver.cube import Cube, Side, Direction
+from rubiksolver.cube import ActionSerializer, Cube, Side, Direction, rotate_reference, MOVE_TABLE, SOLVED_STATE, \
+    canonical_keys, distance_features, keys_to_states, state_keys, state_to_cubies, symmetric_states
 import random
 import copy
 import numpy as np
@@ -12,10 +15,20 @@ all_directions = [Direction.clockwise, Direction.counter_clockwise]
 # There seems to be an error if different sides are involved
 
 
+class ReferenceCube(Cube):
+    """
+    cube that rotates with the geometric reference implementation instead of the compiled move table
+    """
+
+    def rotate(self, side: Side, direction: Direction):
+        self.cube = rotate_reference(self.cube, side, direction)
+
+
 class CubeTester(unittest.TestCase):
+    cube_class = Cube
 
     def test_naive(self):
-        cube = Cube()
+        cube = self.cube_class()
         initial_cube = copy.deepcopy(cube)
         number_rotations = 2000
 
@@ -57,7 +70,7 @@ class CubeTester(unittest.TestCase):
             sides = [side, side]
         else:
             sides = [side] + list(args)
-        cube = Cube()
+        cube = self.cube_class()
         initial_cube = copy.deepcopy(cube)
 
         reverse_directions = {Direction.counter_clockwise: Direction.clockwise,
@@ -75,6 +88,118 @@ class CubeTester(unittest.TestCase):
         self.assertTrue(cube.solved())
         self.assertTrue(np.array_equal(cube.cube, initial_cube.cube))
 
+    def test_misplaced_count_tracks_moves(self):
+        cube = self.cube_class()
+        self.assertTrue(cube.solved())
+        for _ in range(200):
+            cube.rotate(random.choice(all_sides), random.choice(all_directions))
+            self.assertEqual(cube.misplaced, np.count_nonzero(cube.cube.reshape(54) != SOLVED_STATE))
+            self.assertEqual(cube.solved(), np.array_equal(cube.cube.reshape(54), SOLVED_STATE))
+        cube.rotate(Side.left, Direction.clockwise)
+        cube.rotate(Side.left, Direction.counter_clockwise)
+        cube.cube = SOLVED_STATE.reshape(6, 3, 3).astype(np.int64)
+        self.assertTrue(cube.solved())
+        cube.rotate(Side.left, Direction.clockwise)
+        self.assertEqual(cube.misplaced, 12)
+        cube.rotate(Side.left, Direction.counter_clockwise)
+        self.assertTrue(cube.solved())
+
+    def test_move_table_matches_reference(self):
+        cube = Cube()
+        reference = ReferenceCube()
+        for _ in range(500):
+            side, direction = random.choice(all_sides), random.choice(all_directions)
+            cube.rotate(side, direction)
+            reference.rotate(side, direction)
+            self.assertTrue(np.array_equal(cube.cube, reference.cube))
+
+
+class ReferenceCubeTester(CubeTester):
+    cube_class = ReferenceCube
+
+
+class CubeEncodingTester(unittest.TestCase):
+
+    @staticmethod
+    def _random_states(number: int, number_rotations: int = 40):
+        states = np.tile(SOLVED_STATE, (number, 1))
+        for _ in range(number_rotations):
+            states = np.take_along_axis(states, MOVE_TABLE[np.random.randint(0, 12, size=number)], axis=1)
+        return states
+
+    def test_moves_are_physical(self):
+        # two clockwise turns of adjacent sides have order 105, a clockwise and a counter clockwise turn order 63
+        for first, second, expected_order in [(0, 3, 105), (2, 4, 105), (5, 1 + 6, 63), (4, 0 + 6, 63)]:
+            permutation = MOVE_TABLE[first][MOVE_TABLE[second]]
+            state, order = permutation, 1
+            while not np.array_equal(state, np.arange(54)):
+                state, order = state[permutation], order + 1
+            self.assertEqual(order, expected_order)
+
+    def test_cubie_invariants(self):
+        cp, co, ep, eo = state_to_cubies(self._random_states(500))
+        self.assertTrue(np.all(np.sort(cp, axis=1) == np.arange(8)))
+        self.assertTrue(np.all(np.sort(ep, axis=1) == np.arange(12)))
+        self.assertTrue(np.all(co.sum(axis=1) % 3 == 0))
+        self.assertTrue(np.all(eo.sum(axis=1) % 2 == 0))
+
+    def test_key_round_trip(self):
+        states = self._random_states(500)
+        keys = state_keys(states)
+        self.assertTrue(np.array_equal(keys_to_states(keys), states))
+        self.assertTrue(np.array_equal(state_keys(SOLVED_STATE[None]), [[0, 0]]))
+        cube = Cube()
+        cube.init_random_cube(20)
+        key = cube.key()
+        other = Cube()
+        other.set_key(key)
+        self.assertTrue(np.array_equal(cube.cube, other.cube))
+
+    def test_distance_features(self):
+        features = distance_features(np.stack([SOLVED_STATE, SOLVED_STATE[MOVE_TABLE[4]]]))
+        self.assertTrue(np.array_equal(features[0], [0, 20, 9, 9, 9, 9, 9, 9]))
+        # a front turn moves 8 cubies and 12 stickers of the 4 neighbouring sides, 3 on each
+        self.assertTrue(np.array_equal(features[1], [12, 12, 6, 6, 6, 6, 9, 9]))
+        states = self._random_states(100)
+        features = distance_features(states)
+        self.assertTrue(np.array_equal(features[:, 0], 54 - features[:, 2:].sum(axis=1)))
+        cp, co, ep, eo = state_to_cubies(states)
+        self.assertTrue(np.array_equal(features[:, 1], np.sum((cp == np.arange(8)) & (co == 0), axis=1) +
+                                       np.sum((ep == np.arange(12)) & (eo == 0), axis=1)))
+
+    def test_action_numbers(self):
+        for action in range(12):
+            side, direction = ActionSerializer.deserialize(action)
+            self.assertEqual(ActionSerializer.serialize(direction, side), action)
+            self.assertEqual(ActionSerializer.deserialize(np.int64(action)), (side, direction))
+            cube, other = Cube(), Cube()
+            cube.init_random_cube(5)
+            other.cube = cube.cube
+            cube.rotate(side, direction)
+            other.apply_action(action)
+            self.assertTrue(np.array_equal(cube.cube, other.cube))
+            self.assertEqual(cube.misplaced, other.misplaced)
+        cube = Cube()
+        cube.apply_actions(np.array([3, 0, 9, 6]))
+        self.assertFalse(cube.solved())
+        cube.apply_actions([0, 3, 6, 9])
+        self.assertTrue(cube.solved())
+
+    def test_lightweight_import(self):
+        code = "import sys, rubiksolver.train_wrapper, rubiksolver.agents.randomagent; " \
+               "print(sorted({'tensorflow', 'aenum', 'rubiksolver.agents.dqnagent'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_symmetry_reduction(self):
+        states = self._random_states(20)
+        keys, symmetries = canonical_keys(states)
+        for state, key, symmetry in zip(states, keys, symmetries):
+            versions = symmetric_states(state[None])[0]
+            self.assertTrue(np.array_equal(state_keys(versions[symmetry][None])[0], key))
+            symmetric_keys, _ = canonical_keys(versions)
+            self.assertTrue(np.all(symmetric_keys == key))
+
 
 if __name__ == "__main__":
     CubeTester().test_naive()
\ No newline at end of file
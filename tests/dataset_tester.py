@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.cube import MOVE_TABLE
+from rubiksolver.dataset import TransitionDataset, TransitionWriter
+from rubiksolver.train_wrapper import TrainWrapper
+
+
+def _transitions(number: int, first: int = 0) -> tuple:
+    states = np.repeat(((np.arange(number) + first) % 251).astype(np.uint8)[:, None], 54, axis=1)
+    actions = (np.arange(number) + first) % 12
+    return states, actions, actions / 10.0, states + 1, actions == 0
+
+
+class TransitionDatasetTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shards_and_resume(self):
+        with TransitionWriter(self.directory.name, shard_capacity=100, flush_size=30) as writer:
+            writer.add_batch(*_transitions(250))
+        with TransitionWriter(self.directory.name, flush_size=30) as writer:
+            for i in range(20):
+                states, actions, rewards, next_states, dones = _transitions(1, 250 + i)
+                writer.add(states[0], actions[0], rewards[0], next_states[0], dones[0])
+        dataset = TransitionDataset(self.directory.name)
+        self.assertEqual(len(dataset), 270)
+        self.assertEqual(len(dataset._shards), 3)
+        obs, actions, rewards, next_obs, dones = dataset._gather(np.arange(270))
+        expected = _transitions(270)
+        self.assertTrue(np.array_equal(obs, expected[0]))
+        self.assertTrue(np.array_equal(actions, expected[1]))
+        self.assertTrue(np.allclose(rewards, expected[2]))
+        self.assertTrue(np.array_equal(next_obs, expected[3]))
+        self.assertTrue(np.array_equal(dones, expected[4]))
+        self.assertIsInstance(dataset._shards[0]["obs"], np.memmap)
+
+    def test_unflushed_transitions_are_invisible(self):
+        writer = TransitionWriter(self.directory.name, flush_size=1000)
+        writer.add_batch(*_transitions(10))
+        self.assertEqual(len(TransitionDataset(self.directory.name)), 0)
+        writer.close()
+        self.assertEqual(len(TransitionDataset(self.directory.name)), 10)
+
+    def test_shuffled_batches_and_samples(self):
+        with TransitionWriter(self.directory.name, shard_capacity=64) as writer:
+            writer.add_batch(*_transitions(200))
+        dataset = TransitionDataset(self.directory.name, seed=0)
+        seen = []
+        for obs, actions, rewards, next_obs, dones in dataset.batches(32):
+            self.assertLessEqual(actions.shape[0], 32)
+            self.assertTrue(np.array_equal(next_obs, obs + 1))
+            seen.extend(obs[:, 0].tolist())
+        self.assertEqual(sorted(seen), sorted((np.arange(200) % 251).tolist()))
+        self.assertNotEqual(seen, sorted(seen))
+        obs, actions, rewards, next_obs, dones = dataset.sample(500)
+        self.assertEqual(obs.shape, (500, 54))
+        self.assertTrue(np.array_equal(actions, obs[:, 0] % 12))
+
+    def test_train_wrapper_streams_transitions(self):
+        writer = TransitionWriter(self.directory.name, flush_size=7)
+        wrapper = TrainWrapper(number_shuffles=3, actions_reset_threshold=20, transition_writer=writer)
+        wrapper.run_training(RandomAgent(), 50, logging_frequency=1)
+        dataset = TransitionDataset(self.directory.name)
+        self.assertEqual(len(dataset), wrapper.all_iterations)
+        obs, actions, rewards, next_obs, dones = dataset._gather(np.arange(len(dataset)))
+        self.assertTrue(np.array_equal(next_obs, np.take_along_axis(obs, MOVE_TABLE[actions], axis=1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.cube import MOVE_TABLE
+from rubiksolver.distributed import DistributedTrainer, SharedReplayBuffer, SharedWeights
+
+
+def _fill_buffer(buffer: SharedReplayBuffer, weights: SharedWeights):
+    states = np.repeat(np.arange(5, dtype=np.uint8)[:, None], 54, axis=1)
+    buffer.add_batch(states, np.arange(5), np.ones(5), states, np.zeros(5, dtype=bool))
+    weights.publish([np.full((2, 3), 7.0), np.arange(4)])
+    buffer.close()
+    weights.close()
+
+
+class SamplingLearner(RandomAgent):
+    """
+    learner that only samples from its buffer and checks the sampled transitions
+    """
+
+    def train_network(self):
+        obs, actions, rewards, next_obs, dones = self.exp_buffer.sample(32)
+        assert np.array_equal(next_obs, np.take_along_axis(obs, MOVE_TABLE[actions], axis=1))
+
+    def load_weigths_into_target_network(self):
+        pass
+
+
+class DistributedTester(unittest.TestCase):
+
+    def test_shared_buffer_and_weights_across_processes(self):
+        context = multiprocessing.get_context("spawn")
+        buffer = SharedReplayBuffer(8, lock=context.Lock())
+        weights = SharedWeights([(2, 3), (4, )], lock=context.Lock())
+        try:
+            process = context.Process(target=_fill_buffer, args=(buffer, weights))
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+            self.assertEqual(len(buffer), 5)
+            obs, actions, rewards, next_obs, dones = buffer.sample(20)
+            self.assertTrue(np.array_equal(obs[:, 0], actions))
+            version, fetched = weights.fetch(0)
+            self.assertEqual(version, 1)
+            self.assertTrue(np.array_equal(fetched[0], np.full((2, 3), 7.0)))
+            self.assertTrue(np.array_equal(fetched[1], np.arange(4)))
+            self.assertIsNone(weights.fetch(version))
+        finally:
+            buffer.close()
+            weights.close()
+
+    def test_actors_fill_buffer_while_learner_trains(self):
+        trainer = DistributedTrainer(RandomAgent, number_actors=2, number_envs=16, buffer_size=1000,
+                                     number_shuffles=3)
+        try:
+            stats = trainer.run_training(SamplingLearner(), number_train_steps=20, min_buffer_size=100)
+        finally:
+            trainer.close()
+        self.assertEqual(stats["train_steps"], 20)
+        self.assertGreaterEqual(stats["env_steps"], 100)
+
+    def test_no_resource_tracker_errors(self):
+        # actors attach to the shared blocks of the learner, the tracker must still know them when they are unlinked
+        code = "from rubiksolver.agents.randomagent import RandomAgent\n" \
+               "from rubiksolver.distributed import DistributedTrainer\n" \
+               "from tests.distributed_tester import SamplingLearner\n" \
+               "trainer = DistributedTrainer(RandomAgent, number_actors=2, number_envs=16, buffer_size=1000)\n" \
+               "try:\n" \
+               "    trainer.run_training(SamplingLearner(), number_train_steps=20, min_buffer_size=100)\n" \
+               "finally:\n" \
+               "    trainer.close()\n"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+        self.assertNotIn("resource_tracker", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
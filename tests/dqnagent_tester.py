@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import tensorflow as tf
+
+from rubiksolver.agents.dqnagent import DQNAgent
+from rubiksolver.agents.numpyagent import NumpyAgent
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+from rubiksolver.dataset import TransitionDataset, TransitionWriter
+from rubiksolver.metrics import Metrics
+from rubiksolver.replay_buffer import PrioritizedReplayBuffer
+from rubiksolver.scrambles import random_states
+
+
+def _transitions(number: int, seed: int = 0) -> tuple:
+    random = np.random.default_rng(seed)
+    obs = random.integers(0, 6, size=(number, 54), dtype=np.uint8)
+    actions = random.integers(0, 12, size=number)
+    next_obs = np.take_along_axis(obs, MOVE_TABLE[actions], axis=1)
+    rewards = random.integers(0, 2, size=number).astype(np.float32)
+    return obs, actions, rewards, next_obs, rewards == 1
+
+
+class DQNAgentTester(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _agent(self, **kwargs) -> DQNAgent:
+        agent = DQNAgent(save_path=os.path.join(self.directory.name, "model.ckpt"), buffer_size=1000, **kwargs)
+        agent._batch_size = 64
+        return agent
+
+    def test_train_step_traced_once(self):
+        agent = self._agent()
+        for number in [70, 130, 400]:
+            agent.exp_buffer.add_batch(*_transitions(number, seed=number))
+            agent.train_network()
+        for batch_size in [7, 33]:
+            obs, actions, rewards, next_obs, dones = _transitions(batch_size)
+            agent.train_on_batch(obs, actions, next_obs, rewards, dones)
+        self.assertEqual(agent.trace_count, 1)
+
+    def test_loss_is_weighted_squared_td_error(self):
+        agent = self._agent()
+        obs, actions, rewards, next_obs, dones = _transitions(50)
+        weights = np.random.default_rng(1).random(50).astype(np.float32)
+        td_errors = agent.train_on_batch(obs, actions, next_obs, rewards, dones, weights)
+        self.assertTrue(np.isclose(float(agent.td_loss_history[-1]), np.mean(weights * td_errors ** 2), rtol=1e-4))
+
+    def test_train_from_transition_dataset(self):
+        dataset_directory = os.path.join(self.directory.name, "dataset")
+        with TransitionWriter(dataset_directory, flush_size=50) as writer:
+            writer.add_batch(*_transitions(300))
+        for metrics in [None, Metrics(enabled=True)]:
+            agent = self._agent(metrics=metrics)
+            agent.exp_buffer = TransitionDataset(dataset_directory, seed=0)
+            agent.train_network()
+            agent.train_network()
+        self.assertEqual(metrics.counters["train_steps"], 2)
+        self.assertNotIn("buffer_fill", metrics.gauges)
+
+    def test_buffer_fill_gauge(self):
+        metrics = Metrics(enabled=True)
+        agent = self._agent(metrics=metrics)
+        agent.exp_buffer.add_batch(*_transitions(250))
+        agent.train_network()
+        self.assertEqual(metrics.gauges["buffer_fill"], 0.25)
+
+    def test_batched_actions(self):
+        agent = self._agent(epsilon=0.0)
+        states = _transitions(20)[0]
+        qvalues = agent.qvalues(states)
+        self.assertEqual(qvalues.shape, (20, 12))
+        self.assertTrue(np.array_equal(agent.get_actions(states), np.argmax(qvalues, axis=1)))
+        self.assertEqual(agent.get_action_code(SOLVED_STATE), int(np.argmax(agent.qvalues(SOLVED_STATE))))
+
+    def test_polyak_target_update(self):
+        agent = self._agent(target_update_tau=0.25)
+        target = [weights.copy() for weights in agent.target_network.get_weights()]
+        random = np.random.default_rng(0)
+        network = [random.normal(size=weights.shape).astype(np.float32) for weights in target]
+        agent.set_weights(network)
+        agent.load_weigths_into_target_network()
+        for updated, old, new in zip(agent.target_network.get_weights(), target, network):
+            self.assertTrue(np.allclose(updated, 0.25 * new + 0.75 * old, atol=1e-6))
+        agent.load_weigths_into_target_network(tau=1.0)
+        for updated, new in zip(agent.target_network.get_weights(), network):
+            self.assertTrue(np.array_equal(updated, new))
+
+    def test_prioritized_replay_updates_priorities(self):
+        agent = self._agent(prioritized_replay=True, prioritized_replay_alpha=0.5)
+        self.assertIsInstance(agent.exp_buffer, PrioritizedReplayBuffer)
+        agent.exp_buffer.add_batch(*_transitions(200))
+        recorded = {}
+        sample, train_on_batch = agent.exp_buffer.sample, agent.train_on_batch
+
+        def recording_sample(*args, **kwargs):
+            batch = sample(*args, **kwargs)
+            recorded["idxes"] = batch[-1]
+            return batch
+
+        def recording_train_on_batch(**batch):
+            recorded["td_errors"] = train_on_batch(**batch)
+            return recorded["td_errors"]
+
+        agent.exp_buffer.sample, agent.train_on_batch = recording_sample, recording_train_on_batch
+        agent.train_network()
+        # a transition sampled more than once keeps the priority of its last td error
+        idxes, positions = np.unique(recorded["idxes"][::-1], return_index=True)
+        expected = (np.abs(recorded["td_errors"][::-1][positions]) + 1e-6) ** 0.5
+        self.assertTrue(np.allclose(agent.exp_buffer._it_sum[idxes], expected, rtol=1e-5))
+
+    def test_export_policy(self):
+        agent = self._agent(epsilon=0.0, gamma=0.9)
+        # a train step moves the weights away from the initialization, whose biases are all zero
+        obs, actions, rewards, next_obs, dones = _transitions(64)
+        agent.train_on_batch(obs, actions, next_obs, rewards, dones)
+        states = random_states(200, seed=0)
+        qvalues = agent.qvalues(states)
+        for dtype, tolerance in [("float32", 1e-5), ("float16", 1e-2), ("int8", 5e-2)]:
+            path = os.path.join(self.directory.name, "policy_{}.npz".format(dtype))
+            agent.export_policy(path, dtype)
+            error = np.abs(NumpyAgent(path).qvalues(states) - qvalues).max()
+            self.assertLess(error, tolerance * np.abs(qvalues).max(), dtype)
+        exported = NumpyAgent(os.path.join(self.directory.name, "policy_float32.npz"))
+        self.assertTrue(np.array_equal(exported.get_actions(states), agent.get_actions(states)))
+        self.assertTrue(np.allclose(exported.cost_to_go(states), agent.cost_to_go(states), atol=1e-3))
+        other = DQNAgent(save_path=os.path.join(self.directory.name, "other.ckpt"),
+                         state_transform=lambda states: tf.cast(states, tf.float32))
+        with self.assertRaises(ValueError):
+            other.export_policy(os.path.join(self.directory.name, "other.npz"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, state_keys
+from rubiksolver.solvers.ida_star import IDAStarSolver
+from rubiksolver.solvers.pattern_database import PatternDatabase, PatternDatabaseHeuristic
+
+
+def _apply(state: np.ndarray, actions: list) -> np.ndarray:
+    for action in actions:
+        state = state[MOVE_TABLE[action]]
+    return state
+
+
+def _distance(state: np.ndarray, max_depth: int) -> int:
+    # breadth first search, only feasible for short distances
+    frontier = state[None]
+    for depth in range(max_depth + 1):
+        if np.any(np.all(state_keys(frontier) == 0, axis=1)):
+            return depth
+        frontier = frontier[:, MOVE_TABLE].reshape(-1, 54)
+        _, unique = np.unique(state_keys(frontier), axis=0, return_index=True)
+        frontier = frontier[unique]
+    return None
+
+
+class IDAStarTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        databases = [PatternDatabase.build("corners", (0, 1, 2, 3)), PatternDatabase.build("corners", (4, 5, 6, 7))]
+        databases += [PatternDatabase.build("edges", cubies) for cubies in [(0, 1, 2, 3), (4, 5, 6, 7), (8, 9, 10, 11)]]
+        cls.solver = IDAStarSolver(PatternDatabaseHeuristic(databases))
+
+    def test_solved_and_single_action(self):
+        self.assertEqual(self.solver.solve(SOLVED_STATE), [])
+        for action in range(12):
+            self.assertEqual(self.solver.solve(SOLVED_STATE[MOVE_TABLE[action]]), [(action + 6) % 12])
+
+    def test_solutions_are_optimal(self):
+        np.random.seed(3)
+        for _ in range(5):
+            state = _apply(SOLVED_STATE, np.random.randint(0, 12, 5))
+            solution = self.solver.solve(state)
+            self.assertTrue(np.array_equal(_apply(state, solution), SOLVED_STATE))
+            self.assertEqual(len(solution), _distance(state, 5))
+            self.assertGreater(self.solver.stats["nodes_per_second"], 0)
+
+    def test_deeper_scramble(self):
+        scramble = [0, 3, 4, 1, 8, 2, 5, 9, 0, 10]
+        state = _apply(SOLVED_STATE, scramble)
+        solution = self.solver.solve(state)
+        self.assertLessEqual(len(solution), len(scramble))
+        self.assertTrue(np.array_equal(_apply(state, solution), SOLVED_STATE))
+
+    def test_time_limit(self):
+        state = _apply(SOLVED_STATE, [0, 3, 4, 1, 8, 2, 5, 9, 0, 10, 3, 7, 4, 2, 11, 1])
+        self.assertIsNone(self.solver.solve(state, max_time=0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.metrics import Metrics
+from rubiksolver.train_wrapper import TrainWrapper
+
+
+class MetricsTester(unittest.TestCase):
+
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics()
+        with metrics.timer("phase"):
+            pass
+        metrics.add_time("phase", 1.0)
+        metrics.count("steps")
+        metrics.gauge("fill", 0.5)
+        self.assertEqual((metrics.timers, metrics.counters, metrics.gauges), ({}, {}, {}))
+
+    def test_timers_and_histogram(self):
+        metrics = Metrics(enabled=True)
+        for seconds in [2e-6] * 98 + [0.3, 0.3]:
+            metrics.add_time("phase", seconds)
+        with metrics.timer("context"):
+            pass
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["timers"]["phase"]["count"], 100)
+        self.assertAlmostEqual(snapshot["timers"]["phase"]["total_seconds"], 0.600196)
+        self.assertAlmostEqual(snapshot["timers"]["phase"]["p50_ms"], 2.5e-3)
+        self.assertAlmostEqual(snapshot["timers"]["phase"]["p99_ms"], 500.0)
+        self.assertEqual(snapshot["timers"]["context"]["count"], 1)
+
+        text = metrics.prometheus_text()
+        self.assertIn('rubiksolver_phase_seconds_bucket{phase="phase",le="2.5e-06"} 98', text)
+        self.assertIn('rubiksolver_phase_seconds_bucket{phase="phase",le="+Inf"} 100', text)
+        self.assertIn('rubiksolver_phase_seconds_count{phase="phase"} 100', text)
+
+    def test_train_wrapper_metrics(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, name) for name in ["metrics.jsonl", "metrics.prom", "profile.out"]]
+            metrics = Metrics(enabled=True, jsonl_path=paths[0], prometheus_path=paths[1], export_interval=0.0,
+                              profile_path=paths[2], profile_start=10, profile_iterations=20)
+            wrapper = TrainWrapper(number_shuffles=2, actions_reset_threshold=20, metrics=metrics)
+            agent = RandomAgent()
+            wrapper.run_training(agent, 100, logging_frequency=1)
+
+            self.assertIs(agent.metrics, metrics)
+            self.assertEqual(metrics.counters["env_steps"], wrapper.all_iterations)
+            self.assertEqual(metrics.counters["episodes"], wrapper.inner_iterations)
+            self.assertEqual(metrics.timers["action_selection"][0], wrapper.all_iterations)
+            with open(paths[0]) as file:
+                snapshots = [json.loads(line) for line in file]
+            self.assertGreater(len(snapshots), 1)
+            self.assertEqual(snapshots[-1]["counters"]["env_steps"], wrapper.all_iterations)
+            self.assertIn("env_steps_per_second", snapshots[-1]["rates"])
+            with open(paths[1]) as file:
+                self.assertIn("rubiksolver_env_steps_total {}".format(wrapper.all_iterations), file.read())
+            self.assertGreater(pstats.Stats(paths[2]).total_calls, 0)
+
+    def test_disabled_train_wrapper(self):
+        wrapper = TrainWrapper(number_shuffles=2, actions_reset_threshold=20)
+        agent = RandomAgent()
+        wrapper.run_training(agent, 50, logging_frequency=1)
+        self.assertFalse(agent.metrics.enabled)
+        self.assertEqual(wrapper.metrics.counters, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
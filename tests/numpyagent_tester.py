@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver.agents.numpyagent import NumpyAgent, save_policy
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+
+
+def _random_weights(seed: int = 0) -> list:
+    random = np.random.default_rng(seed)
+    shapes = [(324, 64), (64, ), (64, 32), (32, ), (32, 12), (12, )]
+    return [random.normal(0.0, 0.2, size=shape).astype(np.float32) for shape in shapes]
+
+
+def _reference_qvalues(weights: list, states: np.ndarray) -> np.ndarray:
+    inputs = np.eye(6, dtype=np.float32)[states].reshape(-1, 324)
+    for layer in range(3):
+        inputs = inputs @ weights[2 * layer] + weights[2 * layer + 1]
+        if layer < 2:
+            inputs = np.maximum(inputs, 0.0)
+    return inputs
+
+
+class NumpyAgentTester(unittest.TestCase):
+
+    def setUp(self):
+        self.weights = _random_weights()
+        self.activations = ["relu", "relu", "linear"]
+        self.states = np.stack([SOLVED_STATE[MOVE_TABLE[action]] for action in range(12)] + [SOLVED_STATE])
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _load(self, dtype: str) -> NumpyAgent:
+        path = os.path.join(self.directory.name, "policy_{}.npz".format(dtype))
+        save_policy(path, self.weights, self.activations, dtype=dtype, gamma=0.9)
+        return NumpyAgent(path)
+
+    def test_forward_pass(self):
+        agent = self._load("float32")
+        expected = _reference_qvalues(self.weights, self.states)
+        self.assertTrue(np.allclose(agent.qvalues(self.states), expected, atol=1e-5))
+        self.assertTrue(np.array_equal(agent.get_actions(self.states), np.argmax(expected, axis=1)))
+        self.assertEqual(agent.get_action_code(self.states[0]), int(np.argmax(expected[0])))
+        values = np.clip(expected.max(axis=1), 1e-6, 1.0)
+        self.assertTrue(np.allclose(agent.cost_to_go(self.states), 1.0 + np.log(values) / np.log(0.9), atol=1e-3))
+
+    def test_quantized_policies(self):
+        expected = _reference_qvalues(self.weights, self.states)
+        for dtype, tolerance in [("float16", 1e-2), ("int8", 5e-2)]:
+            agent = self._load(dtype)
+            error = np.abs(agent.qvalues(self.states) - expected).max()
+            self.assertLess(error, tolerance * np.abs(expected).max(), dtype)
+        sizes = {dtype: os.path.getsize(os.path.join(self.directory.name, "policy_{}.npz".format(dtype)))
+                 for dtype in ["float16", "int8"]}
+        self.assertLess(sizes["int8"], sizes["float16"])
+
+    def test_set_weights(self):
+        agent = NumpyAgent(weights=self.weights, activations=self.activations)
+        other = _random_weights(1)
+        agent.set_weights(other)
+        self.assertTrue(np.allclose(agent.qvalues(self.states), _reference_qvalues(other, self.states), atol=1e-5))
+        self.assertTrue(all(np.array_equal(a, b) for a, b in zip(agent.get_weights(), other)))
+        with self.assertRaises(ValueError):
+            agent.set_weights(other[:4])
+        with self.assertRaises(ValueError):
+            NumpyAgent(weights=self.weights)
+        with self.assertRaises(ValueError):
+            save_policy(os.path.join(self.directory.name, "bad.npz"), self.weights, self.activations, dtype="int4")
+
+    def test_exploration(self):
+        agent = NumpyAgent(weights=self.weights, activations=self.activations, epsilon=1.0)
+        actions = agent.get_actions(np.tile(SOLVED_STATE, (500, 1)))
+        self.assertGreater(len(np.unique(actions)), 6)
+
+    def test_runs_without_tensorflow(self):
+        path = os.path.join(self.directory.name, "policy.npz")
+        save_policy(path, self.weights, self.activations)
+        code = "import sys; from rubiksolver.agents.numpyagent import NumpyAgent; NumpyAgent(sys.argv[1]); " \
+               "print('tensorflow' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+from rubiksolver.solvers.pattern_database import PatternDatabase, PatternDatabaseHeuristic, \
+    partial_permutation_rank, partial_permutation_unrank
+
+
+class PatternDatabaseTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.edges = PatternDatabase.build("edges", (0, 1, 2, 3))
+        cls.corners = PatternDatabase.build("corners", (0, 1, 2, 3))
+
+    def test_partial_permutation_rank_round_trip(self):
+        ranks = np.arange(12 * 11 * 10 * 9)
+        slots = partial_permutation_unrank(ranks, 12, 4)
+        self.assertEqual(len(set(map(tuple, slots.tolist()))), ranks.shape[0])
+        self.assertTrue(np.array_equal(partial_permutation_rank(slots, 12), ranks))
+
+    def test_codes_round_trip(self):
+        indices = np.arange(self.corners.size)
+        self.assertTrue(np.array_equal(self.corners.codes_to_indices(self.corners.indices_to_codes(indices)), indices))
+
+    def test_all_entries_reached(self):
+        for database in [self.edges, self.corners]:
+            distances = database.lookup_indices(np.arange(database.size))
+            self.assertEqual(np.count_nonzero(distances == 0), 1)
+            self.assertLess(distances.max(), 15)
+
+    def test_heuristic_is_admissible_and_consistent(self):
+        heuristic = PatternDatabaseHeuristic([self.edges, self.corners])
+        states = np.tile(SOLVED_STATE, (200, 1))
+        self.assertTrue(np.array_equal(heuristic(states), np.zeros(200)))
+        for depth in range(1, 12):
+            before = heuristic(states).astype(int)
+            states = np.take_along_axis(states, MOVE_TABLE[np.random.randint(0, 12, 200)], axis=1)
+            after = heuristic(states).astype(int)
+            self.assertTrue(np.all(after <= depth))
+            self.assertTrue(np.all(np.abs(after - before) <= 1))
+
+    def test_save_and_memmap_load(self):
+        states = np.tile(SOLVED_STATE, (50, 1))
+        for _ in range(20):
+            states = np.take_along_axis(states, MOVE_TABLE[np.random.randint(0, 12, 50)], axis=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "edges.pdb")
+            self.edges.save(path)
+            loaded = PatternDatabase.load(path)
+            self.assertIsInstance(loaded.table, np.memmap)
+            self.assertEqual(loaded.cubies, self.edges.cubies)
+            self.assertTrue(np.array_equal(loaded.lookup(states), self.edges.lookup(states)))
+            del loaded
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.replay_buffer import ReplayBuffer, PrioritizedReplayBuffer
+from rubiksolver.segment_tree import MinTree, SumTree
+
+
+class ReplayBufferTester(unittest.TestCase):
+
+    def test_ring_buffer_overwrites_oldest(self):
+        buffer = ReplayBuffer(4)
+        for i in range(6):
+            buffer.add(np.full(54, i), i, float(i), np.full(54, i + 1), i % 2 == 0)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.capacity, 4)
+        obs, actions, rewards, next_obs, dones = buffer.sample(100)
+        self.assertEqual(obs.dtype, np.uint8)
+        self.assertEqual(obs.shape, (100, 54))
+        self.assertTrue(set(actions.tolist()) <= {2, 3, 4, 5})
+        self.assertTrue(np.array_equal(obs[:, 0], actions))
+        self.assertTrue(np.array_equal(next_obs[:, 0], actions + 1))
+        self.assertTrue(np.array_equal(rewards, actions.astype(np.float32)))
+        self.assertTrue(np.array_equal(dones, actions % 2 == 0))
+
+    def test_add_batch(self):
+        buffer = ReplayBuffer(10, state_shape=(54, ))
+        states = np.repeat(np.arange(7, dtype=np.uint8)[:, None], 54, axis=1)
+        actions = np.arange(7)
+        buffer.add_batch(states, actions, np.zeros(7), states, np.zeros(7, dtype=bool))
+        self.assertEqual(len(buffer), 7)
+        buffer.add_batch(states, actions, np.zeros(7), states, np.zeros(7, dtype=bool))
+        self.assertEqual(len(buffer), 10)
+        obs, actions, _, _, _ = buffer.sample(1000)
+        self.assertTrue(np.array_equal(obs[:, 0], actions))
+        # the oldest entries of the first batch have been overwritten
+        self.assertEqual(sorted(buffer._actions.tolist()), [0, 1, 2, 3, 4, 4, 5, 5, 6, 6])
+
+    def test_sum_and_min_tree(self):
+        # values above the minimum set below, independent of the global random state
+        values = np.random.default_rng(0).uniform(0.01, 1.0, size=13)
+        sum_tree, min_tree = SumTree(13), MinTree(13)
+        sum_tree[np.arange(13)] = values
+        min_tree[np.arange(13)] = values
+        self.assertAlmostEqual(sum_tree.sum(), values.sum())
+        self.assertAlmostEqual(min_tree.min(), values.min())
+        sum_tree[4] = 10.0
+        min_tree[4] = 1e-3
+        values[4] = 10.0
+        self.assertAlmostEqual(sum_tree.sum(), values.sum())
+        self.assertAlmostEqual(min_tree.min(), 1e-3)
+        prefixsums = np.array([0.0, values[0] + 1e-9, values[:4].sum() + 5.0, values.sum() - 1e-9])
+        self.assertEqual(sum_tree.find_prefixsum_idx(prefixsums).tolist(), [0, 1, 4, 12])
+
+    def test_prioritized_sampling(self):
+        buffer = PrioritizedReplayBuffer(8, alpha=1.0)
+        for i in range(8):
+            buffer.add(np.full(54, i), i, 0.0, np.full(54, i), False)
+        priorities = np.full(8, 1 / 70)
+        priorities[5] = 1.0
+        buffer.update_priorities(np.arange(8), priorities)
+        obs, actions, rewards, next_obs, dones, weights, idxes = buffer.sample(64, beta=1.0)
+        self.assertTrue(np.array_equal(actions, idxes))
+        # stratified sampling draws index 5 from 58 of the 64 segments
+        self.assertTrue(57 <= np.sum(idxes == 5) <= 59)
+        self.assertTrue(np.allclose(weights[idxes != 5], 1.0))
+        self.assertTrue(np.allclose(weights[idxes == 5], 1 / 70))
+
+
+if __name__ == "__main__":
+    unittest.main()
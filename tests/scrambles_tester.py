@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, Cube, keys_to_states, state_keys, state_to_cubies
+from rubiksolver.scrambles import ScramblePool, pool_path, random_scrambles, random_states, scramble_actions
+from rubiksolver.train_wrapper import TrainWrapper
+from rubiksolver.vector_env import VectorCubeEnv
+
+
+def _parity(permutations: np.ndarray) -> np.ndarray:
+    n = permutations.shape[1]
+    return np.array([sum(p[i] > p[j] for i in range(n) for j in range(i + 1, n)) % 2 for p in permutations])
+
+
+class ScramblesTester(unittest.TestCase):
+
+    def test_random_states_are_valid(self):
+        states = random_states(2000, seed=0)
+        cp, co, ep, eo = state_to_cubies(states)
+        self.assertTrue(np.all(np.sort(cp, axis=1) == np.arange(8)))
+        self.assertTrue(np.all(np.sort(ep, axis=1) == np.arange(12)))
+        self.assertTrue(np.all(co.sum(axis=1) % 3 == 0))
+        self.assertTrue(np.all(eo.sum(axis=1) % 2 == 0))
+        self.assertTrue(np.array_equal(_parity(cp), _parity(ep)))
+        # reachable states survive the round trip through the keys
+        self.assertTrue(np.array_equal(keys_to_states(state_keys(states)), states))
+        self.assertTrue(np.array_equal(random_states(5, seed=1), random_states(5, seed=1)))
+
+    def test_random_states_are_uniform(self):
+        cp, co, ep, eo = state_to_cubies(random_states(12000, seed=2))
+        self.assertAlmostEqual(_parity(cp[:2000]).mean(), 0.5, delta=0.05)
+        for values, n in [(cp[:, 0], 8), (ep[:, 11], 12), (co[:, 7], 3), (eo[:, 11], 2)]:
+            frequencies = np.bincount(values, minlength=n) / values.shape[0]
+            self.assertTrue(np.allclose(frequencies, 1 / n, atol=0.02))
+
+    def test_scrambles_do_not_cancel(self):
+        states, actions = random_scrambles(500, 20, seed=3)
+        self.assertFalse(np.any(actions[:, 1:] == (actions[:, :-1] + 6) % 12))
+        self.assertFalse(np.any((actions[:, 2:] == actions[:, 1:-1]) & (actions[:, 1:-1] == actions[:, :-2])))
+        replayed = np.tile(SOLVED_STATE, (500, 1))
+        for step in range(20):
+            replayed = np.take_along_axis(replayed, MOVE_TABLE[actions[:, step]], axis=1)
+        self.assertTrue(np.array_equal(states, replayed))
+        self.assertEqual(scramble_actions(3, 0).shape, (3, 0))
+        # a single quarter turn never leaves the cube solved
+        self.assertFalse(np.any(np.all(random_scrambles(100, 1, seed=4)[0] == SOLVED_STATE, axis=1)))
+
+    def test_cube_resets(self):
+        cube = Cube()
+        for _ in range(20):
+            cube.init_random_cube(3)
+            self.assertFalse(cube.solved())
+            self.assertEqual(cube.misplaced, np.count_nonzero(cube.cube.reshape(54) != SOLVED_STATE))
+        cube.init_random_cube(uniform=True)
+        self.assertEqual(cube.cube.shape, (6, 3, 3))
+        self.assertTrue(np.array_equal(keys_to_states(state_keys(cube.cube))[0], cube.cube.reshape(54)))
+
+    def test_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pool = ScramblePool.cached(1000, depth=5, seed=5, directory=directory)
+            self.assertTrue(os.path.isfile(pool_path(1000, 5, directory)))
+            self.assertIsInstance(pool.states, np.memmap)
+            again = ScramblePool.cached(1000, depth=5, directory=directory)
+            self.assertTrue(np.array_equal(pool.states, again.states))
+            samples = pool.sample(64)
+            self.assertEqual(samples.shape, (64, 54))
+            self.assertEqual(pool.next().shape, (54, ))
+
+            env = VectorCubeEnv(32, scramble_pool=pool, seed=6)
+            pool_keys = {tuple(key) for key in state_keys(np.asarray(pool.states))}
+            self.assertTrue(all(tuple(key) in pool_keys for key in state_keys(env.states)))
+
+            wrapper = TrainWrapper(actions_reset_threshold=10, scramble_pool=pool)
+            self.assertIn(tuple(state_keys(wrapper.cube.cube)[0]), pool_keys)
+            wrapper.run_training(RandomAgent(), 50, logging_frequency=1)
+            del pool, again, env, wrapper
+
+
+if __name__ == '__main__':
+    unittest.main()
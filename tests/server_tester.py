@@ -0,0 +1,83 @@
+import asyncio
+import json
+import time
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE
+from rubiksolver.evaluation.server import PolicyServer
+
+
+def _one_step_qvalues(states: np.ndarray) -> np.ndarray:
+    # q value 1 for every action that solves the state, like a perfect network for states one action from solved
+    time.sleep(0.02)
+    return np.all(states[:, MOVE_TABLE] == SOLVED_STATE, axis=2).astype(np.float32)
+
+
+async def _request(port: int, method: str, path: str, body: dict = None) -> (int, dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    writer.write("{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n".format(
+        method, path, len(payload)).encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+
+class ServerTester(unittest.TestCase):
+
+    def _run(self, scenario, **kwargs):
+        async def main():
+            server = PolicyServer(_one_step_qvalues, **kwargs)
+            await server.start()
+            try:
+                return await scenario(server)
+            finally:
+                await server.stop()
+        return asyncio.run(main())
+
+    def test_concurrent_requests_share_batches(self):
+        async def scenario(server):
+            requests = [_request(server.port, "POST", "/action", {"actions": [action]}) for action in range(12)]
+            responses = await asyncio.gather(*requests)
+            return responses, (await _request(server.port, "GET", "/metrics"))[1]
+
+        responses, metrics = self._run(scenario, max_batch_size=64, max_wait=0.05)
+        for action, (status, response) in enumerate(responses):
+            self.assertEqual(status, 200)
+            self.assertEqual(response["action"], (action + 6) % 12)
+        self.assertEqual(metrics["requests"], 12)
+        self.assertEqual(metrics["states"], 12)
+        self.assertLess(metrics["batches"], 12)
+        self.assertGreater(metrics["max_batch_size"], 1)
+        self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+
+    def test_max_batch_size(self):
+        async def scenario(server):
+            await asyncio.gather(*[_request(server.port, "POST", "/action", {"scramble": "R"}) for _ in range(10)])
+            return server.metrics.snapshot()
+
+        self.assertLessEqual(self._run(scenario, max_batch_size=3, max_wait=0.05)["max_batch_size"], 3)
+
+    def test_solve_and_errors(self):
+        async def scenario(server):
+            return await asyncio.gather(_request(server.port, "POST", "/solve", {"scramble": "F'"}),
+                                        _request(server.port, "POST", "/action", {"states": [{"scramble": "U"},
+                                                                                             {"actions": [9]}]}),
+                                        _request(server.port, "POST", "/solve", {"scramble": "Q"}),
+                                        _request(server.port, "GET", "/solve"),
+                                        _request(server.port, "GET", "/unknown"))
+
+        solve, actions, invalid, method, unknown = self._run(scenario)
+        self.assertEqual(solve, (200, {"solved": True, "actions": [4], "moves": "F", "length": 1}))
+        self.assertEqual(actions[1]["actions"], [6, 3])
+        self.assertEqual(invalid[0], 400)
+        self.assertEqual(method[0], 405)
+        self.assertEqual(unknown[0], 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import MOVE_TABLE, SOLVED_STATE, symmetric_states
+from rubiksolver.scrambles import random_scrambles
+from rubiksolver.solvers.solution_cache import SolutionCache
+
+
+def _solves(state: np.ndarray, actions: list) -> bool:
+    for action in actions:
+        state = state[MOVE_TABLE[action]]
+    return np.array_equal(state, SOLVED_STATE)
+
+
+class _InverseSolver:
+    """
+    solves scrambles by undoing the known scramble actions
+    """
+
+    def __init__(self, states: np.ndarray, actions: np.ndarray):
+        self.solutions = {state.tobytes(): [(action + 6) % 12 for action in reversed(scramble.tolist())]
+                          for state, scramble in zip(states, actions)}
+        self.calls = 0
+
+    def solve(self, state: np.ndarray, max_time: float = None) -> list:
+        self.calls += 1
+        return self.solutions.get(np.asarray(state, dtype=np.uint8).tobytes())
+
+
+class SolutionCacheTester(unittest.TestCase):
+
+    def setUp(self):
+        self.states, self.actions = random_scrambles(20, 12, seed=0)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_symmetric_hits_are_mapped_back(self):
+        solver = _InverseSolver(self.states, self.actions)
+        cache = SolutionCache(solver, directory=None)
+        for state in self.states:
+            self.assertTrue(_solves(state, cache.solve(state)))
+        self.assertEqual(solver.calls, 20)
+        for state in self.states[:3]:
+            for symmetric in symmetric_states(state[None])[0]:
+                actions = cache.solve(symmetric)
+                self.assertIsNotNone(actions)
+                self.assertTrue(_solves(symmetric, actions))
+        self.assertEqual(solver.calls, 20)
+        self.assertEqual(cache.stats["hits"], 3 * 48)
+        self.assertEqual(cache.get(SOLVED_STATE), None)
+        cache.put(SOLVED_STATE, [])
+        self.assertEqual(cache.get(SOLVED_STATE), [])
+
+    def test_lru_eviction_and_disk_tier(self):
+        solver = _InverseSolver(self.states, self.actions)
+        cache = SolutionCache(solver, capacity=5, directory=self.directory.name)
+        for state in self.states:
+            cache.solve(state)
+        self.assertEqual(cache.stats["memory_entries"], 5)
+        self.assertEqual(cache.stats["evictions"], 15)
+        self.assertEqual(cache.stats["disk_entries"], 20)
+        # the first states were evicted from memory and come from disk
+        self.assertTrue(_solves(self.states[0], cache.solve(self.states[0])))
+        self.assertEqual(cache.disk_hits, 1)
+        cache.close()
+
+        reopened = SolutionCache(capacity=5, directory=self.directory.name)
+        self.assertEqual(reopened.stats["disk_entries"], 20)
+        for state in self.states:
+            self.assertTrue(_solves(state, reopened.get(state)))
+        self.assertEqual(reopened.disk_hits, 20)
+        reopened.close()
+
+    def test_shorter_solutions_win(self):
+        cache = SolutionCache(directory=self.directory.name)
+        state = self.states[0]
+        solution = [(action + 6) % 12 for action in reversed(self.actions[0].tolist())]
+        longer = [0, 6] + solution
+        cache.put(state, longer)
+        self.assertEqual(len(cache.get(state)), len(longer))
+        cache.put(state, solution)
+        cache.put(state, longer)
+        self.assertEqual(len(cache.get(state)), len(solution))
+        cache.close()
+        # a partially written record is ignored
+        path = os.path.join(self.directory.name, "solutions.rbs")
+        with open(path, "ab") as file:
+            file.write(b"\1" * 10)
+        reopened = SolutionCache(directory=self.directory.name)
+        self.assertEqual(len(reopened.get(state)), len(solution))
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.agents.randomagent import RandomAgent
+from rubiksolver.cube import ActionSerializer, MOVE_TABLE, SOLVED_STATE, Direction, Side
+from rubiksolver.train_wrapper import TrainWrapper
+
+
+class TrainWrapperTester(unittest.TestCase):
+
+    def test_take_action_accepts_numbers_and_enums(self):
+        wrapper = TrainWrapper(number_shuffles=0)
+        state, action, reward, next_state, solved = wrapper.take_action(3)
+        self.assertEqual(action, 3)
+        self.assertTrue(np.array_equal(state.reshape(54), SOLVED_STATE))
+        self.assertTrue(np.array_equal(next_state.reshape(54), SOLVED_STATE[MOVE_TABLE[3]]))
+        self.assertEqual((reward, solved), (0, False))
+        state, action, reward, next_state, solved = wrapper.take_action((Side.right, Direction.counter_clockwise))
+        self.assertEqual(action, ActionSerializer.serialize(Direction.counter_clockwise, Side.right))
+        self.assertEqual((reward, solved), (1, True))
+        # the returned states are not changed by later actions
+        wrapper.take_action(0)
+        self.assertTrue(np.array_equal(next_state.reshape(54), SOLVED_STATE))
+
+    def test_transitions_are_consistent(self):
+        transitions = []
+
+        class RecordingAgent(RandomAgent):
+            def get_feedback(self, state, action, reward, next_state, next_action, finished):
+                transitions.append((state, action, next_state))
+
+        wrapper = TrainWrapper(number_shuffles=3, actions_reset_threshold=10)
+        wrapper.run_training(RecordingAgent(), 200, logging_frequency=1)
+        self.assertGreater(len(transitions), 100)
+        for state, action, next_state in transitions:
+            self.assertTrue(np.array_equal(state.reshape(54)[MOVE_TABLE[action]], next_state.reshape(54)))
+
+
+if __name__ == '__main__':
+    unittest.main()
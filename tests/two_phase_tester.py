@@ -0,0 +1,59 @@
+import random
+import tempfile
+import unittest
+
+from rubiksolver.cube import ActionSerializer, Cube
+from rubiksolver.solvers.two_phase import TwoPhaseSolver, simplify_actions
+
+
+def _replay(cube: Cube, actions: list) -> Cube:
+    replayed = Cube()
+    replayed.cube = cube.cube.copy()
+    for action in actions:
+        replayed.rotate(*ActionSerializer.deserialize(action))
+    return replayed
+
+
+class TwoPhaseTester(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.solver = TwoPhaseSolver(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.solver
+        cls.directory.cleanup()
+
+    def test_simplify_actions(self):
+        self.assertEqual(simplify_actions([0, 6, 3]), [3])
+        self.assertEqual(simplify_actions([2, 2, 2]), [8])
+        self.assertEqual(simplify_actions([1, 2, 2, 2, 2, 7]), [])
+        self.assertEqual(simplify_actions([4, 3, 9, 10]), [])
+
+    def test_solved_cube(self):
+        self.assertEqual(self.solver.solve(Cube()), [])
+
+    def test_solutions_solve_random_cubes(self):
+        random.seed(1)
+        for _ in range(5):
+            cube = Cube()
+            cube.init_random_cube(100)
+            solution = self.solver.solve(cube, max_time=None)
+            self.assertTrue(_replay(cube, solution).solved())
+            self.assertLessEqual(len(solution), 50)
+
+    def test_time_budget_improves_solution(self):
+        random.seed(2)
+        cube = Cube()
+        cube.init_random_cube(100)
+        first = self.solver.solve(cube.cube, max_time=None)
+        best = self.solver.solve(cube.cube, max_time=1.0)
+        self.assertLessEqual(len(best), len(first))
+        self.assertTrue(_replay(cube, best).solved())
+        self.assertEqual(self.solver.solve(cube.cube, max_time=5.0, target_length=len(first)), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
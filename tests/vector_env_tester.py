@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from rubiksolver.cube import ActionSerializer, Cube, MOVE_TABLE, SOLVED_STATE
+from rubiksolver.vector_env import VectorCubeEnv
+
+
+class VectorCubeEnvTester(unittest.TestCase):
+
+    def test_step_matches_cube(self):
+        env = VectorCubeEnv(16, number_shuffles=5, seed=0)
+        cubes = []
+        for state in env.states:
+            cube = Cube()
+            cube.cube = state.reshape(6, 3, 3).astype(np.int64)
+            cubes.append(cube)
+        actions = np.random.randint(0, 12, size=16)
+        next_states, rewards, done = env.step(actions)
+        for cube, action, next_state in zip(cubes, actions, next_states):
+            cube.rotate(*ActionSerializer.deserialize(int(action)))
+            self.assertTrue(np.array_equal(cube.cube.reshape(54), next_state))
+
+    def test_solved_cubes_are_rewarded_and_reset(self):
+        env = VectorCubeEnv(4, number_shuffles=1, seed=1)
+        # after a single shuffle there is exactly one action that solves each cube
+        solving_actions = np.array([[np.array_equal(state[MOVE_TABLE[action]], SOLVED_STATE) for action in range(12)]
+                                    for state in env.states]).argmax(axis=1)
+        next_states, rewards, done = env.step(solving_actions)
+        self.assertTrue(done.all())
+        self.assertTrue(np.array_equal(rewards, np.ones(4)))
+        self.assertTrue(np.array_equal(next_states, np.tile(SOLVED_STATE, (4, 1))))
+        self.assertFalse(np.any(np.all(env.states == SOLVED_STATE, axis=1)))
+        self.assertTrue(np.all(env.steps == 0))
+
+    def test_threshold_resets(self):
+        env = VectorCubeEnv(8, number_shuffles=0, actions_reset_threshold=2, seed=2)
+        env.step(np.zeros(8, dtype=np.int64))
+        self.assertTrue(np.all(env.steps == 1))
+        next_states, rewards, done = env.step(np.zeros(8, dtype=np.int64))
+        self.assertFalse(done.any())
+        self.assertTrue(env.truncated.all())
+        self.assertTrue(np.all(env.steps == 0))
+
+
+if __name__ == "__main__":
+    unittest.main()